@@ -0,0 +1,107 @@
+"""
+Benchmark of the compressed output formats (adibinz/adibinxz) against raw adibin:
+compression ratio, encode and decode throughput (MB/s of raw int16 samples).
+
+usage: python benchmarks/bench_codec.py [-f FILE.adibin] [-m MINUTES] [-b BLOCK_SIZE]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from binfilepy import BinFile
+from binfilepy import CFWBINARY
+from binfilepy import CFWBCHANNEL
+from wfio import BinReader
+from wfio import CompressedBinFile
+
+
+# synthetic 240 Hz waveforms: ECG-like spikes, a pressure wave and a pleth, with noise
+def makeSyntheticData(minutes: int, fs: int = 240):
+    n = minutes * 60 * fs
+    t = np.arange(n) / fs
+    rng = np.random.default_rng(0)
+    beat = (t * 1.2) % 1.0
+    ecg = 800 * np.exp(-((beat - 0.3) / 0.015) ** 2) - 100 * np.exp(-((beat - 0.6) / 0.06) ** 2)
+    art = 1000 + 400 * np.clip(np.sin(2 * np.pi * beat), 0, None) + 100 * np.sin(2 * np.pi * t / 4.0)
+    pleth = 500 * np.sin(2 * np.pi * beat) ** 2
+    chans = [ecg, art, pleth, ecg * 0.7]
+    return [(c + rng.normal(0, 3, n)).astype(np.int16) for c in chans]
+
+
+def readAdibin(fn: str):
+    with BinReader(fn) as r:
+        block = np.array(r.readBlock(0, r.numSamples))
+        header, channels = r.header, r.channels
+    return header, channels, [block[:, i] for i in range(block.shape[1])]
+
+
+def writeFile(f, header, channels, chanData):
+    f.setHeader(header)
+    for c in channels:
+        f.addChannel(c)
+    f.writeHeader()
+    numSamples = f.writeChannelData(chanData)
+    f.updateSamplesPerChannel(numSamples, True)
+
+
+def bench(name: str, chanData, header, channels, tmpdir: str, codec: str, blockSize: int):
+    fn = os.path.join(tmpdir, "bench_{0}".format(name))
+    rawBytes = len(chanData) * len(chanData[0]) * 2
+    t0 = time.perf_counter()
+    if codec is None:
+        with BinFile(fn, "w") as f:
+            writeFile(f, header, channels, chanData)
+    else:
+        with CompressedBinFile(fn, "w", codec, blockSize=blockSize) as f:
+            writeFile(f, header, channels, chanData)
+    t1 = time.perf_counter()
+    if codec is None:
+        with BinReader(fn) as r:
+            data = np.array(r.readBlock(0, r.numSamples))
+    else:
+        with CompressedBinFile(fn, "r") as f:
+            f.readHeader()
+            data = f.readSamples(0, f.header.SamplesPerChannel)
+    t2 = time.perf_counter()
+    assert(data.shape == (len(chanData[0]), len(chanData)))
+    size = os.path.getsize(fn)
+    os.remove(fn)
+    mb = rawBytes / 1e6
+    print("{0:<10} {1:>12} {2:>8.2f} {3:>12.1f} {4:>12.1f}".format(name, size, rawBytes / size, mb / (t1 - t0), mb / (t2 - t1)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare raw adibin with the compressed output formats.")
+    parser.add_argument("-f", "--file", help="adibin file to use instead of synthetic data")
+    parser.add_argument("-m", "--minutes", type=int, default=10, help="minutes of synthetic data (default: 10)")
+    parser.add_argument("-b", "--block_size", type=int, default=240 * 60, help="samples per block")
+    args = parser.parse_args()
+
+    if args.file:
+        header, channels, chanData = readAdibin(args.file)
+    else:
+        chanData = makeSyntheticData(args.minutes)
+        header = CFWBINARY()
+        header.setValue(1.0 / 240, 2019, 3, 13, 11, 30, 8, 0, 0)
+        header.NChannels = len(chanData)
+        channels = []
+        for i in range(len(chanData)):
+            c = CFWBCHANNEL()
+            c.setValue("CH{0}".format(i), "mV", 1.0, 0.0, 0.0, 1.0)
+            channels.append(c)
+    print("{0} channels x {1} samples".format(len(chanData), len(chanData[0])))
+    print("{0:<10} {1:>12} {2:>8} {3:>12} {4:>12}".format("format", "bytes", "ratio", "enc MB/s", "dec MB/s"))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        bench("adibin", chanData, header, channels, tmpdir, None, args.block_size)
+        bench("adibinz", chanData, header, channels, tmpdir, "zlib", args.block_size)
+        bench("adibinxz", chanData, header, channels, tmpdir, "lzma", args.block_size)
+
+
+if __name__ == "__main__":
+    main()
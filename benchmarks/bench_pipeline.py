@@ -0,0 +1,81 @@
+"""
+Benchmark of the decode pipeline of the XML converters: conversion time of one (synthetic) GE XML file
+with different numbers of decode workers (decode_workers), and a check that the output is the same.
+
+usage: python benchmarks/bench_pipeline.py [-m MINUTES] [-c CHANNELS] [-w 1,2,4,8]
+"""
+
+import os
+import sys
+import time
+import base64
+import hashlib
+import argparse
+import datetime
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from xmlconvert.xml2bin_state import Xml2BinState
+from xmlconvert.xmlconverter_for_ge import XmlConverterForGE
+
+
+# one measurements (2 secs) per 2 secs, channels at 250 Hz resampled to 240 Hz
+def writeSyntheticXml(fn: str, minutes: int, numChannels: int, fs: int = 250):
+    rng = np.random.default_rng(0)
+    startDt = datetime.datetime(2019, 3, 13, 11, 30, 8)
+    with open(fn, "w") as f:
+        f.write("<?xml version=\"1.0\" encoding=\"utf-8\"?>\n<cpcArchive><cpc datetime=\"2019-03-13T11:30:08.000Z\" tzoffset=\"-07:00\"><device id=\"1\">")
+        for i in range(minutes * 30):
+            pollTime = (startDt + datetime.timedelta(seconds=2 * i)).strftime("%Y-%m-%dT%H:%M:%SZ")
+            f.write("<measurements><m name=\"POLLTIME\">{0}</m>".format(pollTime))
+            for c in range(numChannels):
+                wave = base64.b64encode(rng.integers(-2000, 2000, 2 * fs).astype("<i2").tobytes()).decode("ascii")
+                f.write("<mg name=\"CH{0}\"><m name=\"Wave\">{1}</m><m name=\"Points\">{2}</m><m name=\"PointsBytes\">2</m>"
+                        "<m name=\"Min\">-2000</m><m name=\"Max\">2000</m><m name=\"Offset\">0</m><m name=\"Gain\">1</m>"
+                        "<m name=\"Hz\">{3}</m></mg>".format(c, wave, 2 * fs, fs))
+            f.write("</measurements>")
+        f.write("</device></cpc></cpcArchive>")
+
+
+def convert(fn: str, outputDir: str, decodeWorkers: int):
+    os.mkdir(outputDir)
+    x = Xml2BinState()
+    x.setTimestampTm(datetime.datetime(2020, 1, 1))
+    converter = XmlConverterForGE(outputDir, "P1_{starttime}", "adibin", 240, None, [])
+    converter.setDecodeWorkers(decodeWorkers)
+    t0 = time.perf_counter()
+    converter.convert(fn, {}, x)
+    elapsed = time.perf_counter() - t0
+    md5 = hashlib.md5()
+    for outputFn in sorted(os.listdir(outputDir)):
+        with open(os.path.join(outputDir, outputFn), "rb") as f:
+            md5.update(f.read())
+    return elapsed, md5.hexdigest()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Conversion time with different numbers of decode workers.")
+    parser.add_argument("-m", "--minutes", type=int, default=30, help="minutes of synthetic data (default: 30)")
+    parser.add_argument("-c", "--channels", type=int, default=8, help="number of channels (default: 8)")
+    parser.add_argument("-w", "--workers", default="1,2,4,8", help="comma separated numbers of decode workers")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fn = os.path.join(tmpdir, "bench.xml")
+        writeSyntheticXml(fn, args.minutes, args.channels)
+        print("{0} ({1:.1f} MB), {2} CPUs".format(fn, os.path.getsize(fn) / 1e6, os.cpu_count()))
+        print("{0:>8} {1:>10} {2:>10} {3:>8}".format("workers", "secs", "MB/s", "speedup"))
+        baseElapsed = None
+        baseMd5 = None
+        for numWorkers in [int(w) for w in args.workers.split(",")]:
+            elapsed, md5 = convert(fn, os.path.join(tmpdir, "out{0}".format(numWorkers)), numWorkers)
+            if baseMd5 is None:
+                baseElapsed, baseMd5 = elapsed, md5
+            assert(md5 == baseMd5)
+            print("{0:>8} {1:>10.2f} {2:>10.1f} {3:>8.2f}".format(numWorkers, elapsed, os.path.getsize(fn) / 1e6 / elapsed, baseElapsed / elapsed))
+
+
+if __name__ == "__main__":
+    main()
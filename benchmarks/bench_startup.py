@@ -0,0 +1,100 @@
+"""
+Startup time of the command line tools for -h and wfshow --show_header_only, which should not
+import heavy modules (numpy, matplotlib, ...).  "cold" runs use an empty bytecode cache
+(PYTHONPYCACHEPREFIX), "warm" runs reuse it.  Exits with 1 if a warm median exceeds --max_ms, or if
+wfconvert -h, wfpretty -h or the wfshow -h / --show_header_only paths import a heavy module (other
+than binfilepy for wfshow, which reads the header with it).
+
+usage: python benchmarks/bench_startup.py [-n RUNS] [--max_ms 200]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+import statistics
+
+srcDir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, srcDir)
+
+from binfilepy import BinFile
+from binfilepy import CFWBINARY
+from binfilepy import CFWBCHANNEL
+
+HEAVY_MODULES = ["numpy", "matplotlib", "dateutil", "vitalfilepy", "sqlite3", "binfilepy"]
+
+
+def writeTestFile(fn: str):
+    header = CFWBINARY()
+    header.setValue(1.0 / 240, 2019, 3, 13, 11, 30, 8, 0, 0)
+    header.NChannels = 1
+    with BinFile(fn, "w") as f:
+        f.setHeader(header)
+        channel = CFWBCHANNEL()
+        channel.setValue("I", "mV", 1.0, 0.0, 0.0, 1.0)
+        f.addChannel(channel)
+        f.writeHeader()
+        numSamples = f.writeChannelData([list(range(240))])
+        f.updateSamplesPerChannel(numSamples, True)
+
+
+def runOnce(args: list, env: dict):
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable] + args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env)
+    return (time.perf_counter() - t0) * 1000.0
+
+
+def importedHeavyModules(args: list, env: dict):
+    result = subprocess.run([sys.executable, "-X", "importtime"] + args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, env=env)
+    names = set()
+    for line in result.stderr.decode("utf-8", errors="replace").splitlines():
+        name = line.split("|")[-1].strip()
+        if name.split(".")[0] in HEAVY_MODULES:
+            names.add(name.split(".")[0])
+    return sorted(names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure startup time of the command line tools.")
+    parser.add_argument("-n", "--runs", type=int, default=5, help="number of warm runs (default: 5)")
+    parser.add_argument("--max_ms", type=float, default=200.0, help="fail if a warm median exceeds this (default: 200)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fn = os.path.join(tmpdir, "test.adibin")
+        writeTestFile(fn)
+        # (name, args, heavy modules allowed, None if not checked)
+        cases = [("python (baseline)", ["-c", "pass"], []),
+                 ("wfconvert -h", [os.path.join(srcDir, "wfconvert.py"), "-h"], []),
+                 ("wfshow -h", [os.path.join(srcDir, "wfshow.py"), "-h"], ["binfilepy"]),
+                 ("wfshow --show_header_only", [os.path.join(srcDir, "wfshow.py"), "-f", fn, "-s", "0", "-n", "1", "--show_header_only"],
+                  ["binfilepy"]),
+                 ("wfpretty -h", [os.path.join(srcDir, "wfpretty.py"), "-h"], []),
+                 ("wfextract -h", [os.path.join(srcDir, "wfextract.py"), "-h"], None),
+                 ("wfedit -h", [os.path.join(srcDir, "wfedit.py"), "-h"], None),
+                 ("wfcatalog -h", [os.path.join(srcDir, "wfcatalog.py"), "-h"], None)]
+        print("{0:<28} {1:>9} {2:>9}  {3}".format("command", "cold ms", "warm ms", "heavy modules imported"))
+        failed = False
+        for name, cmdArgs, allowed in cases:
+            env = dict(os.environ)
+            env["PYTHONPYCACHEPREFIX"] = tempfile.mkdtemp(dir=tmpdir)
+            env.pop("PYTHONDONTWRITEBYTECODE", None)
+            cold = runOnce(cmdArgs, env)
+            warm = statistics.median([runOnce(cmdArgs, env) for i in range(args.runs)])
+            heavy = importedHeavyModules(cmdArgs, env)
+            print("{0:<28} {1:>9.0f} {2:>9.0f}  {3}".format(name, cold, warm, ",".join(heavy) if len(heavy) > 0 else "-"))
+            if warm > args.max_ms:
+                print("{0}: startup time exceeds {1:.0f} ms!".format(name, args.max_ms))
+                failed = True
+            unexpected = [m for m in heavy if m not in allowed] if allowed is not None else []
+            if len(unexpected) > 0:
+                print("{0}: imports {1}!".format(name, ",".join(unexpected)))
+                failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
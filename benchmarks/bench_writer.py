@@ -0,0 +1,107 @@
+"""
+Benchmark of writing converted segments to adibin: binfilepy's BinFile (packs sample by sample)
+against NumpyBinFile (interleaves numpy blocks and writes them from the buffer).
+
+For each writer it prints the throughput, the number of write calls and the bytes copied per output
+sample (one sample of one channel).  Bytes copied are the sizes of the objects created to hand the
+samples to the file (the bytes object of each struct.pack, or the interleaved block), measured by
+wrapping the file object.
+
+usage: python benchmarks/bench_writer.py [-s SEGMENTS] [-c CHANNELS] [--fs FS]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+from array import array
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from binfilepy import BinFile
+from binfilepy import CFWBINARY
+from binfilepy import CFWBCHANNEL
+from wfio.numpy_bin_file import NumpyBinFile
+
+
+class CountingFile:
+    """
+    file object wrapper counting the write calls and the bytes of the objects written
+    """
+    def __init__(self, f):
+        self.f = f
+        self.numWrites = 0
+        self.bytesCopied = 0
+
+    def write(self, b):
+        self.numWrites += 1
+        # a memoryview shares the buffer of the block, which is counted (once) as copied
+        self.bytesCopied += sys.getsizeof(b) if isinstance(b, bytes) else memoryview(b).nbytes
+        return self.f.write(b)
+
+    def __getattr__(self, name: str):
+        return getattr(self.f, name)
+
+
+def makeSegments(numSegments: int, numChannels: int, fs: int, asArray: bool):
+    rng = np.random.default_rng(0)
+    segments = []
+    for i in range(numSegments):
+        chanData = [rng.integers(-2000, 2000, 2 * fs).astype(np.int16) for c in range(numChannels)]
+        if asArray:
+            chanData = [array("h", d.tolist()) for d in chanData]
+        segments.append(chanData)
+    return segments
+
+
+def bench(name: str, cls: type, segments, fs: int, tmpdir: str):
+    fn = os.path.join(tmpdir, "bench_{0}.adibin".format(name))
+    header = CFWBINARY()
+    header.setValue(1.0 / fs, 2019, 3, 13, 11, 30, 8, 0, 0)
+    header.NChannels = len(segments[0])
+    t0 = time.perf_counter()
+    with cls(fn, "w") as f:
+        f.setHeader(header)
+        for i in range(header.NChannels):
+            c = CFWBCHANNEL()
+            c.setValue("CH{0}".format(i), "mV", 1.0, 0.0, 0.0, 1.0)
+            f.addChannel(c)
+        f.writeHeader()
+        f.f = CountingFile(f.f)
+        numSamples = 0
+        for chanData in segments:
+            numSamples += f.writeChannelData(chanData, fs, 0)
+        f.updateSamplesPerChannel(numSamples, True)
+        counter = f.f
+        f.f = counter.f
+    elapsed = time.perf_counter() - t0
+    with open(fn, "rb") as f:
+        content = f.read()
+    os.remove(fn)
+    numOutputSamples = numSamples * header.NChannels
+    print("{0:<24} {1:>14.0f} {2:>14.3f} {3:>14.2f}".format(name, numOutputSamples / elapsed, counter.numWrites / numOutputSamples,
+                                                         counter.bytesCopied / numOutputSamples))
+    return content
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare BinFile and NumpyBinFile writing converted segments.")
+    parser.add_argument("-s", "--segments", type=int, default=300, help="number of 2 secs segments (default: 300)")
+    parser.add_argument("-c", "--channels", type=int, default=4, help="number of channels (default: 4)")
+    parser.add_argument("--fs", type=int, default=240, help="sampling rate (default: 240)")
+    args = parser.parse_args()
+
+    print("{0} segments x {1} channels x {2} samples".format(args.segments, args.channels, 2 * args.fs))
+    print("{0:<24} {1:>14} {2:>14} {3:>14}".format("writer", "samples/s", "writes/sample", "bytes/sample"))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        segments = makeSegments(args.segments, args.channels, args.fs, True)
+        expected = bench("BinFile (array)", BinFile, segments, args.fs, tmpdir)
+        assert(bench("NumpyBinFile (array)", NumpyBinFile, segments, args.fs, tmpdir) == expected)
+        segments = makeSegments(args.segments, args.channels, args.fs, False)
+        assert(bench("NumpyBinFile (numpy)", NumpyBinFile, segments, args.fs, tmpdir) == expected)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+MIT License
+
+Copyright (c) 2019 UCSF Hu Lab
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import argparse
+from datetime import datetime
+from myutil import dtFormat
+from myutil import elapsedFormat
+from myutil import parsetime
+from wfio.catalog import Catalog
+from wfio.catalog import tsToDt
+
+g_version = "0.1"
+g_exename = "wfcatalog"
+
+
+def getArgs():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", help="Catalog database file", required=True)
+    parser.add_argument("-d", "--dir", help="Output directory of wfconvert to scan (can be repeated)", action="append")
+    parser.add_argument("--ext", help="comma separated file extensions to scan (default: adibin,vital)")
+    parser.add_argument("--output_fn_pattern", help="output filename pattern used by wfconvert, to extract id1 - id5 from filenames")
+    parser.add_argument("--num_workers", help="Number of threads for reading headers (default: 8)")
+    parser.add_argument("-q", "--query", help="Query the catalog (use with --stime, --etime, --channels, --id1...)", action="store_true")
+    parser.add_argument("--stime", help="specify start time, format: \"1/1/2019 8:00:00 AM\"")
+    parser.add_argument("--etime", help="specify end time, format: \"1/1/2019 12:00:00 PM\"")
+    parser.add_argument("-p", "--channels", help="comma separated channel labels")
+    parser.add_argument("--kind", help="bin or vital")
+    parser.add_argument("--id1", help="id1 tag in output file")
+    parser.add_argument("--id2", help="id2 tag in output file")
+    parser.add_argument("--id3", help="id3 tag in output file")
+    parser.add_argument("--id4", help="id4 tag in output file")
+    parser.add_argument("--id5", help="id5 tag in output file")
+    return parser.parse_args()
+
+
+def runApp(args):
+    exts = args.ext.split(",") if args.ext is not None else None
+    numWorkers = int(args.num_workers) if args.num_workers is not None else 8
+    with Catalog(args.db, args.output_fn_pattern) as catalog:
+        if (args.dir is not None) and (len(args.dir) > 0):
+            starttime = datetime.now()
+            numUpdated, numRemoved, numUnchanged = catalog.update(args.dir, exts, numWorkers, print_errors=True)
+            elapsedtime = datetime.now() - starttime
+            print("Files added or updated: {0}, removed: {1}, unchanged: {2}".format(numUpdated, numRemoved, numUnchanged))
+            print("Updating catalog takes {0}".format(elapsedFormat(elapsedtime.total_seconds(), totalSecondsOnly=True)))
+        if args.query:
+            stime = parsetime(args.stime) if args.stime is not None else None
+            etime = parsetime(args.etime) if args.etime is not None else None
+            channels = args.channels.split(",") if args.channels is not None else None
+            tagsDict = {"id1": args.id1, "id2": args.id2, "id3": args.id3, "id4": args.id4, "id5": args.id5}
+            result = catalog.query(stime, etime, channels, tagsDict, args.kind)
+            for info in result:
+                print("{0}\t{1}\t{2}\t{3}".format(dtFormat(tsToDt(info["start_ts"])), dtFormat(tsToDt(info["end_ts"])),
+                                                  ",".join(info["channels"]), info["path"]))
+            print("Number of files found = {0}".format(len(result)))
+    return 0
+
+
+print("{0} v{1} - Copyright(c) HuLab@UCSF 2019".format(g_exename, g_version))
+args = getArgs()
+if (not args.query) and (args.dir is None):
+    print("You must specify -d or -q option!!")
+else:
+    runApp(args)
@@ -26,6 +26,8 @@ import os
 import sys
 import re
 import yaml
+import shutil
+import tempfile
 import argparse
 from datetime import datetime
 from datetime import timedelta
@@ -34,9 +36,31 @@ from myutil import dtFormat
 from myutil import dtTimestampFormat
 from myutil import elapsedFormat
 from myutil import parsetime
-from xmlconvert import Xml2BinState
-from xmlconvert import XmlConverterForGE
-from xmlconvert import XmlConverterForBedMaster
+from xmlconvert.xml2bin_state import Xml2BinState
+from xmlconvert.xml2bin_state import DEFAULT_CHANNEL_SPLIT_THRESHOLD_SEC
+from xmlconvert.time_window import TimeWindow
+from xmlconvert.segment_index import getSegmentIndexFn
+from xmlconvert.xml_input import isXmlInputFn
+from xmlconvert.xml_input import isXmlArchiveFn
+from xmlconvert.xml_input import iterArchiveXmlInputs
+from xmlconvert.batch_controller import AdaptiveBatchController
+from xmlconvert.batch_controller import getPeakMemoryBytes
+from xmlconvert.ext_stream import ExtOutputStream
+from xmlconvert.ext_stream import ExtStreamError
+from xmlconvert.ext_stream import STREAM_OUTPUT_MODES
+from xmlconvert.ext_stream import STDOUT_OUTPUT_FN
+from xmlconvert.ext_stream import canStreamOutput
+from wfio.output_file import OUTPUT_FORMATS
+from wfio.output_file import DEFAULT_FN_EXT_BY_FORMAT
+from wfio.output_file import VITAL_FORMATS
+from wfio.output_file import VITAL_FORMAT_VITAL
+from wfio.output_file import DEFAULT_VITAL_FILE_POOL_SIZE
+from wfjobs.job_list import readJobList
+from wfjobs.job_list import JobListError
+from wfjobs.job_runner import JobRunner
+from wfjobs.job_runner import moveToDir
+from wfjobs.job_runner import STAGING_DIR_PREFIX
+from wfjobs.spool_service import SpoolService
 from typing import Dict
 
 g_version = "0.67"
@@ -44,13 +68,14 @@ g_exename = "wfconvert"
 default_config_fn = "{0}_config.yaml".format(g_exename)
 default_sampling_rate = 240
 default_fn_ext = "adibin"
+default_output_format = "adibin"
 
 
 def getArgs():
     parser = argparse.ArgumentParser()
     parser.add_argument("-f", "--file", help="Input File")
-    parser.add_argument("-d", "--dir", help="Input Directory")
-    parser.add_argument("-o", "--output_dir", help="Output Directory", required=True)
+    parser.add_argument("-d", "--dir", help="Input Directory (or zip/tar archive)")
+    parser.add_argument("-o", "--output_dir", help="Output Directory (default output_dir of jobs in job list)")
     parser.add_argument("-c", "--config_file", help="configuration file")
     parser.add_argument("-s", "--sampling_rate", help="Target sampling rate")
     parser.add_argument("-p", "--channel_patterns", help="comma separated regex pattern for channels")
@@ -60,27 +85,72 @@ def getArgs():
     parser.add_argument("--ignore_gap", help="ignore gap or overlap within a source file", action="store_const", const=False)
     parser.add_argument("--ignore_gap_between_segs", help="ignore gap or overlap between segments (or xml files)", action="store_const", const=False)
     parser.add_argument("--warning_on_gaps", help="show warning when encountering gaps or overlaps (if gaps are not ignored)", action="store_const", const=False)
+    parser.add_argument("--skip_overlapped_segments", help="skip (or trim) segments with data already converted for the same channels, before decoding",
+                        action="store_const", const=True)
+    parser.add_argument("--channel_superset_mode", help="do not start a new file when channels are temporarily absent (filled with gap value)",
+                        action="store_const", const=True)
+    parser.add_argument("--channel_split_threshold_sec",
+                        help="with channel_superset_mode, start a new file if a channel is absent for longer than this (default: 300)",
+                        type=float)
+    parser.add_argument("--decode_workers", help="number of threads decoding (and resampling) segments ahead of writing (default: 1)", type=int)
+    parser.add_argument("--segment_index", help="read only the segments needed (--stime/--etime) with an index (.segidx) of each XML file, built on first use",
+                        action="store_const", const=True)
+    parser.add_argument("--signal_stats",
+                        help="write per minute statistics (gaps, flatline, saturation, min/max/mean) of each output file to {filename}.stats.json",
+                        action="store_const", const=True)
+    parser.add_argument("--trend_secs",
+                        help="write a trend (min, max, mean of each channel per trend_secs) of each output file to {stem}.trend.adibin (default: 0, no trend)",
+                        type=float)
+    parser.add_argument("--src_fn_time_format", help="format of start time in XML filenames (-d with --stime/--etime), e.g. \"%%Y%%m%%d-%%H%%M%%S\"")
     parser.add_argument("--output_fn_pattern", help="output filename pattern")
     parser.add_argument("--output_fn_ext", help="output file extention, e.g. adibin, bin")
+    parser.add_argument("--output_format",
+                        help="output format: adibin (default), npy (directory of .npy file per channel), adibinz or adibinxz (compressed with zlib or lzma)")
     parser.add_argument("--id1", help="id1 tag in output file")
     parser.add_argument("--id2", help="id2 tag in output file")
     parser.add_argument("--id3", help="id3 tag in output file")
     parser.add_argument("--id4", help="id4 tag in output file")
     parser.add_argument("--id5", help="id5 tag in output file")
+    parser.add_argument("-j", "--job_list", help="job list (.yaml or .csv) with file or dir, output_dir, id1-id5, stime, etime for each job")
+    parser.add_argument("--num_workers", help="number of jobs to run at the same time (default: number of CPUs)", type=int)
+    parser.add_argument("--retries", help="number of retries of a failed job (default: 1)", type=int, default=1)
+    parser.add_argument("--job_log_dir", help="directory for the output of each job")
+    parser.add_argument("--spool_dir", help="run as a service, processing requests (.json) dropped in this directory")
+    parser.add_argument("--poll_interval", help="seconds between checks of spool directory (default: 1)", type=float, default=1.0)
     return parser.parse_args()
 
 
 def printOptions():
     print("Options used:")
+    if args.job_list is not None:
+        print("\tjob list: {0}".format(args.job_list))
+    if args.spool_dir is not None:
+        print("\tspool dir: {0}".format(args.spool_dir))
     if (g_file is not None) and len(g_file) > 0:
         print("\tinput file: {0}".format(g_file))
     if (g_dir is not None) and len(g_dir) > 0:
         print("\tinput dir: {0}".format(g_dir))
     print("\toutput dir: {0}".format(g_output_dir))
+    print("\toutput format: {0}".format(g_output_format))
+    if g_converter_type == "bedmaster":
+        print("\tvital format: {0}".format(g_vital_format))
+        print("\tvital file pool size: {0}".format(g_vital_file_pool_size))
     print("\tsampling rate: {0}".format(g_sampling_rate))
     print("\tignore gap: {0}".format(g_ignore_gap))
     print("\tignore_gap_between_segs: {0}".format(g_ignore_gap_between_segs))
     print("\twarning_on_gaps: {0}".format(g_warning_on_gaps))
+    print("\tskip_overlapped_segments: {0}".format(g_skip_overlapped_segments))
+    print("\tchannel_superset_mode: {0}".format(g_channel_superset_mode))
+    if g_channel_superset_mode:
+        print("\tchannel_split_threshold_sec: {0}".format(g_channel_split_threshold_sec))
+    print("\tdecode_workers: {0}".format(g_decode_workers))
+    print("\tsegment_index: {0}".format(g_segment_index))
+    print("\tsignal_stats: {0}".format(g_signal_stats))
+    print("\ttrend_secs: {0}".format(g_trend_secs))
+    if (g_stime is not None) or (g_etime is not None):
+        print("\ttime window: {0}".format(TimeWindow(g_stime, g_etime)))
+    if g_src_fn_time_format is not None:
+        print("\tsrc_fn_time_format: {0}".format(g_src_fn_time_format))
     if (g_channel_patterns is not None) and len(g_channel_patterns) > 0:
         print("\tchannel_patterns: {0}".format(",".join(g_channel_patterns)))
     else:
@@ -94,11 +164,7 @@ def getTempDir():
     return tempDir
 
 
-def execute_ext(ext_exe: str, srcFn: str, cmdParam: str, xmlOutputFn: str, startSegment: int, endSegment: int, stime: datetime, etime: datetime):
-    tempDir = getTempDir()
-    if not os.path.exists(tempDir):
-        os.mkdir(tempDir)
-    xmlOutputFullFn = Path(tempDir).joinpath(xmlOutputFn)
+def get_ext_cmd(ext_exe: str, srcFn: str, cmdParam: str, xmlOutputFullFn: str, startSegment: int, endSegment: int, stime: datetime, etime: datetime):
     cmd = "{0} \"{1}\" -o \"{2}\" {3}".format(ext_exe, srcFn, xmlOutputFullFn, cmdParam)
     if (stime is not None) and (etime is not None):
         cmd = cmd + " -stime \"{0}\"".format(stime.strftime("%m/%d/%Y %I:%M:%S %p"))
@@ -108,11 +174,176 @@ def execute_ext(ext_exe: str, srcFn: str, cmdParam: str, xmlOutputFn: str, start
             cmd = cmd + " -s {0}".format(int(startSegment))
         if endSegment >= 0:
             cmd = cmd + " -e {0}".format(int(endSegment))
+    return cmd
+
+
+def execute_ext(ext_exe: str, srcFn: str, cmdParam: str, xmlOutputFn: str, startSegment: int, endSegment: int, stime: datetime, etime: datetime):
+    tempDir = getTempDir()
+    if not os.path.exists(tempDir):
+        os.mkdir(tempDir)
+    xmlOutputFullFn = Path(tempDir).joinpath(xmlOutputFn)
+    cmd = get_ext_cmd(ext_exe, srcFn, cmdParam, xmlOutputFullFn, startSegment, endSegment, stime, etime)
     print("execute: {0}".format(cmd))
     os.system(cmd)
     return xmlOutputFullFn
 
 
+# run the external command writing to a named pipe (in temp dir) or its stdout, return the stream of its output
+# (closed if there is no output, the command has ended)
+def open_ext_stream(ext_exe: str, srcFn: str, cmdParam: str, xmlOutputFn: str, startSegment: int, endSegment: int, stime: datetime, etime: datetime,
+                    streamOutput: str):
+    fifoFn = None
+    xmlOutputFullFn = STDOUT_OUTPUT_FN
+    if streamOutput == "fifo":
+        tempDir = getTempDir()
+        if not os.path.exists(tempDir):
+            os.mkdir(tempDir)
+        fifoFn = str(Path(tempDir).joinpath(xmlOutputFn))
+        xmlOutputFullFn = fifoFn
+    cmd = get_ext_cmd(ext_exe, srcFn, cmdParam, xmlOutputFullFn, startSegment, endSegment, stime, etime)
+    print("execute: {0}".format(cmd))
+    xmlStream = ExtOutputStream(cmd, fifoFn)
+    try:
+        if not xmlStream.start():
+            xmlStream.close()
+    except ExtStreamError as e:
+        print("ERROR: {0}".format(e.message))
+        xmlStream.close()
+    return xmlStream
+
+
+def closeVitalOutput(xmlconverter: object):
+    if hasattr(xmlconverter, "closeVitalOutput"):
+        vitalFn = xmlconverter.closeVitalOutput()
+        if len(vitalFn) > 0:
+            print("Vitals written to: {0}".format(Path(vitalFn).name))
+
+
+# command line to run wfconvert itself (the executable if built by pyinstaller)
+def getSelfCmd():
+    if getattr(sys, "frozen", False):
+        return [sys.executable]
+    return [sys.executable, str(Path(__file__).resolve())]
+
+
+# options (given in command line) that apply to all jobs
+def getJobExtraArgs():
+    extraArgs = []
+    for k in ["sampling_rate", "channel_patterns", "output_fn_pattern", "output_fn_ext", "output_format", "channel_split_threshold_sec", "decode_workers",
+              "trend_secs", "src_fn_time_format"]:
+        if getattr(args, k) is not None:
+            extraArgs += ["--" + k, str(getattr(args, k))]
+    for k in ["ignore_gap", "ignore_gap_between_segs", "warning_on_gaps", "skip_overlapped_segments", "channel_superset_mode", "segment_index",
+              "signal_stats"]:
+        if getattr(args, k) is not None:
+            extraArgs += ["--" + k]
+    return extraArgs
+
+
+def runJobList(jobListFn: str):
+    jobs = readJobList(jobListFn, g_output_dir)
+    for job in jobs:
+        if (job.configFile is None) and Path(g_config_file).exists():
+            job.configFile = str(Path(g_config_file).resolve())
+    numWorkers = args.num_workers if args.num_workers is not None else (os.cpu_count() or 1)
+    print("Running {0} jobs from {1} ({2} at a time)...".format(len(jobs), jobListFn, numWorkers))
+    runner = JobRunner(getSelfCmd(), getJobExtraArgs(), numWorkers, args.retries, args.job_log_dir)
+    numFailed = runner.run(jobs)
+    runner.printSummary(jobs)
+    return 1 if numFailed > 0 else 0
+
+
+# convert a request (wfjobs.ConvertJob) in this process, return the output files
+def convertRequest(job: object):
+    global g_id1, g_id2, g_id3, g_id4, g_id5, g_stime, g_etime
+    if job.configFile is not None:
+        raise JobListError("config_file is not supported in service mode")
+    g_id1, g_id2, g_id3, g_id4, g_id5 = [(job.tagsDict.get(k) or "") for k in ["id1", "id2", "id3", "id4", "id5"]]
+    g_stime = parsetime(job.stime) if job.stime is not None else None
+    g_etime = parsetime(job.etime) if job.etime is not None else None
+    if not os.path.exists(job.outputDir):
+        os.makedirs(job.outputDir)
+    # write to a temporary directory first, so that a failed request leaves no partial output
+    stagingDir = tempfile.mkdtemp(prefix=STAGING_DIR_PREFIX, dir=job.outputDir)
+    try:
+        result = runApp(getFlow(job.file, job.dir), job.file, job.dir, stagingDir)
+        if result is not None and result != 0:
+            raise JobListError("Error during processing!")
+        return [moveToDir(os.path.join(stagingDir, fn), job.outputDir) for fn in sorted(os.listdir(stagingDir))]
+    finally:
+        shutil.rmtree(stagingDir, ignore_errors=True)
+
+
+def getFlow(srcFile: str, srcDir: str):
+    flow = "unknown"
+    if srcFile is None and srcDir is not None:
+        flow = "dir"
+    elif srcFile is not None and srcDir is None:
+        flow = "file"
+    if g_converter_type == "bedmaster" and flow == "file":
+        ext = os.path.splitext(srcFile)[1] if len(os.path.splitext(srcFile)) == 2 else ""
+        if ext.lower() == ".stp":
+            flow = "stp"
+    return flow
+
+
+# --stime/--etime (either can be omitted), or None
+def getTimeWindow():
+    if (g_stime is None) and (g_etime is None):
+        return None
+    return TimeWindow(g_stime, g_etime)
+
+
+# batch controller of the stp flow: number of segments per batch, or seconds of the time window (useTime)
+def createBatchController(useTime: bool, numSegmentsPerBatch: int, timeStep: timedelta):
+    targetBytes = int(float(g_converter_options.get("target_batch_mb", 512)) * 1024 * 1024)
+    targetSecs = float(g_converter_options.get("target_batch_secs", 0))
+    maxMemoryBytes = int(float(g_converter_options.get("max_batch_memory_mb", 0)) * 1024 * 1024)
+    if useTime:
+        minValue = float(g_converter_options.get("min_time_step_hours", 1)) * 3600
+        maxValue = float(g_converter_options.get("max_time_step_hours", 168)) * 3600
+        return AdaptiveBatchController(timeStep.total_seconds(), minValue, maxValue, targetBytes, targetSecs, maxMemoryBytes)
+    minValue = int(g_converter_options.get("min_segments_per_batch", 50))
+    maxValue = int(g_converter_options.get("max_segments_per_batch", 20000))
+    return AdaptiveBatchController(numSegmentsPerBatch, minValue, maxValue, targetBytes, targetSecs, maxMemoryBytes)
+
+
+# import only the converter of converter_type (the converters import numpy, etc.)
+def createConverter(dstDir: str):
+    xmlconverter = None
+    if g_converter_type == "bernoulli":
+        from xmlconvert.xmlconverter_for_ge import XmlConverterForGE
+        xmlconverter = XmlConverterForGE(dstDir, g_output_fn_pattern, g_output_fn_ext,
+                                         int(g_sampling_rate), g_channel_pattern_list, g_channel_info_list,
+                                         g_ignore_gap, g_ignore_gap_between_segs, g_warning_on_gaps,
+                                         g_output_fn_time_format_dict, g_output_format)
+        xmlconverter.setSkipOverlappedSegments(g_skip_overlapped_segments)
+        xmlconverter.setChannelSupersetMode(g_channel_superset_mode)
+        xmlconverter.setChannelSplitThresholdSec(g_channel_split_threshold_sec)
+        xmlconverter.setDecodeWorkers(g_decode_workers)
+        xmlconverter.setTimeWindow(getTimeWindow())
+        xmlconverter.setUseSegmentIndex(g_segment_index)
+        xmlconverter.setWriteSignalStats(g_signal_stats)
+        xmlconverter.setTrendSecs(g_trend_secs)
+    elif g_converter_type == "bedmaster":
+        from xmlconvert.xmlconverter_for_bedmaster import XmlConverterForBedMaster
+        xmlconverter = XmlConverterForBedMaster(dstDir, g_output_fn_pattern, g_output_fn_ext,
+                                                int(g_sampling_rate), g_channel_pattern_list, g_channel_info_list,
+                                                g_ignore_gap, g_ignore_gap_between_segs, g_warning_on_gaps,
+                                                g_output_fn_time_format_dict, g_output_format)
+        xmlconverter.setSkipOverlappedSegments(g_skip_overlapped_segments)
+        xmlconverter.setChannelSupersetMode(g_channel_superset_mode)
+        xmlconverter.setChannelSplitThresholdSec(g_channel_split_threshold_sec)
+        xmlconverter.setDecodeWorkers(g_decode_workers)
+        xmlconverter.setTimeWindow(getTimeWindow())
+        xmlconverter.setUseSegmentIndex(g_segment_index)
+        xmlconverter.setWriteSignalStats(g_signal_stats)
+        xmlconverter.setTrendSecs(g_trend_secs)
+        xmlconverter.setVitalFormat(g_vital_format)
+        xmlconverter.setVitalFilePoolSize(g_vital_file_pool_size)
+    return xmlconverter
+
+
 def runApp(flow: str, srcFile: str, srcDir: str, dstDir: str):
     timestampTm = datetime.now()
     tagsDict = {"id1": g_id1, "id2": g_id2, "id3": g_id3, "id4": g_id4, "id5": g_id5}
@@ -121,43 +352,43 @@ def runApp(flow: str, srcFile: str, srcDir: str, dstDir: str):
     if flow == "file":
         xml2BinState = Xml2BinState()
         xml2BinState.setTimestampTm(timestampTm)
-        if g_converter_type == "bernoulli":
-            xmlconverter = XmlConverterForGE(dstDir, g_output_fn_pattern, g_output_fn_ext,
-                                             int(g_sampling_rate), g_channel_pattern_list, g_channel_info_list,
-                                             g_ignore_gap, g_ignore_gap_between_segs, g_warning_on_gaps,
-                                             g_output_fn_time_format_dict)
-        elif g_converter_type == "bedmaster":
-            xmlconverter = XmlConverterForBedMaster(dstDir, g_output_fn_pattern, g_output_fn_ext,
-                                                    int(g_sampling_rate), g_channel_pattern_list, g_channel_info_list,
-                                                    g_ignore_gap, g_ignore_gap_between_segs, g_warning_on_gaps,
-                                                    g_output_fn_time_format_dict)
+        xmlconverter = createConverter(dstDir)
         xmlconverter.convert(srcFile, tagsDict, xml2BinState, print_processing_fn=True)
         xmlconverter.renameChannels(print_rename_details=True)
+        closeVitalOutput(xmlconverter)
         return 0
     elif flow == "dir":
         numFilesProcessed = 0
+        numFilesSkipped = 0
         xml2BinState = Xml2BinState()
         xml2BinState.setTimestampTm(timestampTm)
-        if g_converter_type == "bernoulli":
-            xmlconverter = XmlConverterForGE(dstDir, g_output_fn_pattern, g_output_fn_ext,
-                                             int(g_sampling_rate), g_channel_pattern_list, g_channel_info_list,
-                                             g_ignore_gap, g_ignore_gap_between_segs, g_warning_on_gaps,
-                                             g_output_fn_time_format_dict)
-        elif g_converter_type == "bedmaster":
-            xmlconverter = XmlConverterForBedMaster(dstDir, g_output_fn_pattern, g_output_fn_ext,
-                                                    int(g_sampling_rate), g_channel_pattern_list, g_channel_info_list,
-                                                    g_ignore_gap, g_ignore_gap_between_segs, g_warning_on_gaps,
-                                                    g_output_fn_time_format_dict)
-        for file in sorted(os.listdir(srcDir)):
-            # debug
-            fp = os.path.join(srcDir, file)
-            ext = os.path.splitext(fp)[1] if len(os.path.splitext(fp)) == 2 else ""
-            if ext == ".xml":
-                xmlconverter.clearState()
-                xmlconverter.convert(fp, tagsDict, xml2BinState, print_processing_fn=True)
-                numFilesProcessed += 1
+        xmlconverter = createConverter(dstDir)
+        timeWindow = getTimeWindow()
+        # .xml, or .xml.gz, .xml.bz2, .xml.xz (decompressed while converting), in a directory or a zip/tar archive
+        # (streamed from the archive, in name order)
+        if os.path.isfile(srcDir) and isXmlArchiveFn(srcDir):
+            xmlInputs = iterArchiveXmlInputs(srcDir)
+        else:
+            xmlInputs = (os.path.join(srcDir, file) for file in sorted(os.listdir(srcDir)) if isXmlInputFn(file))
+        for xmlInput in xmlInputs:
+            # skip files out of time window (from filename, or times near the start and end of file, not read ahead
+            # for archive members)
+            if timeWindow is not None:
+                if hasattr(xmlInput, "read"):
+                    overlaps = timeWindow.overlapsFn(xmlInput.name, g_src_fn_time_format)
+                else:
+                    overlaps = timeWindow.overlapsFile(xmlInput, g_src_fn_time_format)
+                if not overlaps:
+                    numFilesSkipped += 1
+                    continue
+            xmlconverter.clearState()
+            xmlconverter.convert(xmlInput, tagsDict, xml2BinState, print_processing_fn=True)
+            numFilesProcessed += 1
         xmlconverter.renameChannels(print_rename_details=True)
+        closeVitalOutput(xmlconverter)
         print("Number of XML files processed = {0}".format(numFilesProcessed))
+        if numFilesSkipped > 0:
+            print("Number of XML files skipped (out of time window) = {0}".format(numFilesSkipped))
         return 0
     elif flow == "stp":
         # need to add date-range option for processing
@@ -165,25 +396,33 @@ def runApp(flow: str, srcFile: str, srcDir: str, dstDir: str):
         ext_param = str(g_converter_options.get("stptools_param", ""))
         keep_temp_file = bool(g_converter_options.get("keep_temp_files", False))
         numSegmentsPerBatch = int(g_converter_options.get("num_segments_per_batch", 500))
+        adaptiveBatch = bool(g_converter_options.get("adaptive_batch", False))
+        streamOutput = str(g_converter_options.get("stream_output", ""))
         numSegmentsProcessed = 0
         xml2BinState = Xml2BinState()
         xml2BinState.setTimestampTm(timestampTm)
-        if g_converter_type == "bedmaster":
-            xmlconverter = XmlConverterForBedMaster(dstDir, g_output_fn_pattern, g_output_fn_ext,
-                                                    int(g_sampling_rate), g_channel_pattern_list, g_channel_info_list,
-                                                    g_ignore_gap, g_ignore_gap_between_segs, g_warning_on_gaps,
-                                                    g_output_fn_time_format_dict)
+        xmlconverter = createConverter(dstDir)
         startSegment = 0
         endSegment = startSegment + numSegmentsPerBatch - 1
         if (ext_exe is None) or (len(ext_exe) == 0):
             print("ERROR: stptools_exe option not set!")
             return 1
+        if streamOutput not in STREAM_OUTPUT_MODES:
+            print("ERROR: stream_output should be one of: {0}".format(", ".join(m for m in STREAM_OUTPUT_MODES if len(m) > 0)))
+            return 1
+        if (len(streamOutput) > 0) and (not canStreamOutput(streamOutput)):
+            print("stream_output {0} not supported on this platform, using temp files".format(streamOutput))
+            streamOutput = ""
         hasSegments = True
         useTime = (g_stime is not None) and (g_etime is not None)
-        time_step = timedelta(days=1)
+        time_step = timedelta(hours=float(g_converter_options.get("time_step_hours", 24)))
         current_stime = g_stime
         current_etime = g_stime
         numSamplesWritten = 0
+        batchController = None
+        if adaptiveBatch:
+            batchController = createBatchController(useTime, numSegmentsPerBatch, time_step)
+            print("Adaptive batch: {0}".format(batchController))
         if useTime:
             current_etime = g_stime + time_step
             if current_etime > g_etime:
@@ -191,32 +430,68 @@ def runApp(flow: str, srcFile: str, srcDir: str, dstDir: str):
         while ((not useTime) and hasSegments) or (useTime and (current_stime < g_etime) and (current_stime < current_etime)):
             basefn = Path(srcFile).stem
             xmlOutputFn = "{0}_{1}_{2}_wf.xml".format(basefn, dtTimestampFormat(timestampTm), startSegment)
-            xmlOutputFullFn = execute_ext(ext_exe, srcFile, ext_param, xmlOutputFn, startSegment, endSegment, current_stime, current_etime)
+            xmlStream = None
+            xmlOutputFullFn = None
+            if len(streamOutput) > 0:
+                xmlStream = open_ext_stream(ext_exe, srcFile, ext_param, xmlOutputFn, startSegment, endSegment, current_stime, current_etime,
+                                            streamOutput)
+                if xmlStream.numBytes == 0:
+                    # command failed (or could not be run) without output
+                    if xmlStream.returncode != 0:
+                        print("Streaming not possible, using temp files")
+                        streamOutput = ""
+                    xmlStream = None
+            if len(streamOutput) == 0:
+                xmlOutputFullFn = execute_ext(ext_exe, srcFile, ext_param, xmlOutputFn, startSegment, endSegment, current_stime, current_etime)
             xmlProcesingStarttime = datetime.now()
-            if Path(xmlOutputFullFn).exists():
+            # no temp XML or output (e.g. StpToolkit found no segments): nothing written in this batch
+            numSamplesWritten = 0
+            xmlBytes = 0
+            xmlProcessingElapsedtime = timedelta(0)
+            if (xmlStream is not None) or ((xmlOutputFullFn is not None) and Path(xmlOutputFullFn).exists()):
                 if not useTime:
                     print("Processing XML from segment {0} to segment {1}...".format(startSegment, endSegment))
                 else:
                     print("Processing XML from {0} to {1}...".format(current_stime.strftime("%m/%d/%Y %I:%M:%S %p"), current_etime.strftime("%m/%d/%Y %I:%M:%S %p")))
                 xmlconverter.clearState()
-                numSamplesWritten = xmlconverter.convert(xmlOutputFullFn, tagsDict, xml2BinState, print_processing_fn=True)
+                if xmlStream is not None:
+                    # converted while StpToolkit is writing it
+                    with xmlStream:
+                        numSamplesWritten = xmlconverter.convert(xmlStream, tagsDict, xml2BinState, print_processing_fn=True)
+                    xmlBytes = xmlStream.numBytes
+                    if xmlStream.returncode != 0:
+                        print("WARNING: {0} exit code {1}".format(Path(ext_exe.split(" ")[0]).name, xmlStream.returncode))
+                else:
+                    xmlBytes = os.path.getsize(xmlOutputFullFn)
+                    numSamplesWritten = xmlconverter.convert(xmlOutputFullFn, tagsDict, xml2BinState, print_processing_fn=True)
                 xmlProcessingEndtime = datetime.now()
                 xmlProcessingElapsedtime = xmlProcessingEndtime - xmlProcesingStarttime
                 if numSamplesWritten == 0:
                     print("No more data segments for processing.")
                 print("Processing XML takes {0}".format(elapsedFormat(xmlProcessingElapsedtime.total_seconds(), totalSecondsOnly=True)))
-                if not keep_temp_file:
+                if (xmlOutputFullFn is not None) and (not keep_temp_file):
                     os.remove(xmlOutputFullFn)
-            startSegment = endSegment + 1
-            endSegment = startSegment + numSegmentsPerBatch - 1
+                    if Path(getSegmentIndexFn(xmlOutputFullFn)).exists():
+                        os.remove(getSegmentIndexFn(xmlOutputFullFn))
             numSegmentsProcessed += numSegmentsPerBatch
             hasSegments = (numSamplesWritten > 0)
+            if batchController is not None:
+                batchValue = batchController.update(xmlBytes, xmlProcessingElapsedtime.total_seconds(), getPeakMemoryBytes())
+                if useTime:
+                    time_step = timedelta(seconds=int(batchValue))
+                    print("Next batch: {0}".format(elapsedFormat(time_step.total_seconds())))
+                else:
+                    numSegmentsPerBatch = int(batchValue)
+                    print("Next batch: {0} segments".format(numSegmentsPerBatch))
+            startSegment = endSegment + 1
+            endSegment = startSegment + numSegmentsPerBatch - 1
             if useTime:
                 current_stime = current_etime
                 current_etime = current_stime + time_step
                 if current_etime > g_etime:
                     current_etime = g_etime
         xmlconverter.renameChannels(print_rename_details=True)
+        closeVitalOutput(xmlconverter)
         print("Done")
 
 
@@ -238,7 +513,10 @@ g_file = args.file
 g_dir = args.dir
 g_output_dir = args.output_dir
 g_output_fn_pattern = None
-g_output_fn_ext = default_fn_ext
+g_output_fn_ext = None
+g_output_format = default_output_format
+g_vital_format = VITAL_FORMAT_VITAL
+g_vital_file_pool_size = DEFAULT_VITAL_FILE_POOL_SIZE
 g_sampling_rate = default_sampling_rate
 g_channel_patterns = None
 g_channel_pattern_list = None
@@ -246,6 +524,14 @@ g_channel_info_list = None
 g_ignore_gap = False
 g_ignore_gap_between_segs = False
 g_warning_on_gaps = False
+g_skip_overlapped_segments = False
+g_channel_superset_mode = False
+g_channel_split_threshold_sec = DEFAULT_CHANNEL_SPLIT_THRESHOLD_SEC
+g_decode_workers = 1
+g_segment_index = False
+g_signal_stats = False
+g_trend_secs = 0.0
+g_src_fn_time_format = None
 g_stime = None
 g_etime = None
 if args.stime is not None:
@@ -261,7 +547,7 @@ configData = None
 if (g_config_file is not None) and (len(g_config_file) > 0) and os.path.exists(g_config_file):
     print("Reading config file: {0}".format(g_config_file))
     with open(g_config_file, 'r') as stream:
-        configData = yaml.load(stream)
+        configData = yaml.load(stream, Loader=yaml.SafeLoader)
 if configData is not None:
     if configData.get("converter_type") is not None:
         g_converter_type = str(configData.get("converter_type")).lower()
@@ -279,6 +565,8 @@ if configData is not None:
         g_output_fn_pattern = configData.get("output_fn_pattern")
     if configData.get("output_fn_ext") is not None:
         g_output_fn_ext = configData.get("output_fn_ext")
+    if configData.get("output_format") is not None:
+        g_output_format = str(configData.get("output_format")).lower()
     if configData.get("sampling_rate") is not None:
         g_sampling_rate = float(configData.get("sampling_rate"))
     if configData.get("ignore_gap") is not None:
@@ -287,6 +575,22 @@ if configData is not None:
         g_ignore_gap_between_segs = bool(configData.get("ignore_gap_between_segs"))
     if configData.get("warning_on_gaps") is not None:
         g_warning_on_gaps = bool(configData.get("warning_on_gaps"))
+    if configData.get("skip_overlapped_segments") is not None:
+        g_skip_overlapped_segments = bool(configData.get("skip_overlapped_segments"))
+    if configData.get("channel_superset_mode") is not None:
+        g_channel_superset_mode = bool(configData.get("channel_superset_mode"))
+    if configData.get("channel_split_threshold_sec") is not None:
+        g_channel_split_threshold_sec = float(configData.get("channel_split_threshold_sec"))
+    if configData.get("decode_workers") is not None:
+        g_decode_workers = int(configData.get("decode_workers"))
+    if configData.get("segment_index") is not None:
+        g_segment_index = bool(configData.get("segment_index"))
+    if configData.get("signal_stats") is not None:
+        g_signal_stats = bool(configData.get("signal_stats"))
+    if configData.get("trend_secs") is not None:
+        g_trend_secs = float(configData.get("trend_secs"))
+    if configData.get("src_fn_time_format") is not None:
+        g_src_fn_time_format = str(configData.get("src_fn_time_format"))
     if configData.get("channel_pattern_list") is not None:
         g_channel_patterns = configData.get("channel_pattern_list")
     if configData.get("channel_info_list") is not None:
@@ -297,10 +601,16 @@ if configData is not None:
             for cinfo in g_channel_info_list:
                 if len(cinfo.get("label", "")) > 0:
                     cinfo["labelPattern"] = re.compile(cinfo.get("label", ""), flags=re.IGNORECASE)
+g_vital_format = str(g_converter_options.get("vital_format", g_vital_format)).lower()
+g_vital_file_pool_size = int(g_converter_options.get("vital_file_pool_size", g_vital_file_pool_size))
 if args.output_fn_pattern is not None:
     g_output_fn_pattern = args.output_fn_pattern
 if args.output_fn_ext is not None:
-    output_fn_ext = args.output_fn_ext
+    g_output_fn_ext = args.output_fn_ext
+if args.output_format is not None:
+    g_output_format = args.output_format.lower()
+if g_output_fn_ext is None:
+    g_output_fn_ext = DEFAULT_FN_EXT_BY_FORMAT.get(g_output_format, default_fn_ext)
 if args.sampling_rate is not None:
     g_sampling_rate = float(args.sampling_rate)
 if args.channel_patterns is not None:
@@ -315,35 +625,71 @@ if args.ignore_gap_between_segs is not None:
     g_ignore_gap_between_segs = bool(args.ignore_gap_between_segs)
 if args.warning_on_gaps is not None:
     g_warning_on_gaps = bool(args.warning_on_gaps)
+if args.skip_overlapped_segments is not None:
+    g_skip_overlapped_segments = bool(args.skip_overlapped_segments)
+if args.channel_superset_mode is not None:
+    g_channel_superset_mode = bool(args.channel_superset_mode)
+if args.channel_split_threshold_sec is not None:
+    g_channel_split_threshold_sec = args.channel_split_threshold_sec
+if args.decode_workers is not None:
+    g_decode_workers = args.decode_workers
+if args.segment_index is not None:
+    g_segment_index = bool(args.segment_index)
+if args.signal_stats is not None:
+    g_signal_stats = bool(args.signal_stats)
+if args.trend_secs is not None:
+    g_trend_secs = args.trend_secs
+if args.src_fn_time_format is not None:
+    g_src_fn_time_format = args.src_fn_time_format
 
-flow = "unknown"
-if g_file is None and g_dir is not None:
-    flow = "dir"
-elif g_file is not None and g_dir is None:
-    flow = "file"
-
-if g_converter_type == "bedmaster" and flow == "file":
-    ext = os.path.splitext(g_file)[1] if len(os.path.splitext(g_file)) == 2 else ""
-    if ext.lower() == ".stp":
-        flow = "stp"
+if args.spool_dir is not None:
+    flow = "service"
+elif args.job_list is not None:
+    flow = "jobs"
+else:
+    flow = getFlow(g_file, g_dir)
 
 valid = True
-if (not g_file) and (not g_dir):
+if flow == "service":
+    if not os.path.isdir(args.spool_dir):
+        print("Spool directory is not accessible!!")
+        valid = False
+elif flow == "jobs":
+    if not os.path.exists(args.job_list):
+        print("Job list is not accessible!!")
+        valid = False
+elif (not g_file) and (not g_dir):
     print("You must specify -f or -d option!!")
     valid = False
-if valid and (not g_output_dir):
+if valid and (flow != "jobs") and (flow != "service") and (not g_output_dir):
     print("You must specify -o option!!")
     valid = False
-if valid and (not (os.path.exists(g_output_dir))):
+if valid and (g_output_dir is not None) and (not (os.path.exists(g_output_dir))):
     print("Output directory is not accessible!!")
     valid = False
+if valid and (g_output_format not in OUTPUT_FORMATS):
+    print("Unsupported output format: {0}!!".format(g_output_format))
+    valid = False
+if valid and (g_vital_format not in VITAL_FORMATS):
+    print("Unsupported vital format: {0}!!".format(g_vital_format))
+    valid = False
 
 
 if valid:
     starttime = datetime.now()
     print("Start processing at: {0}".format(dtFormat(starttime)))
     printOptions()
-    result = runApp(flow, g_file, g_dir, g_output_dir)
+    if flow == "service":
+        SpoolService(args.spool_dir, convertRequest, args.poll_interval).run()
+        result = 0
+    elif flow == "jobs":
+        try:
+            result = runJobList(args.job_list)
+        except JobListError as e:
+            print("ERROR: {0}".format(e))
+            result = 1
+    else:
+        result = runApp(flow, g_file, g_dir, g_output_dir)
     if result is not None and result != 0:
         print("Error during processing!")
     endtime = datetime.now()
@@ -351,3 +697,8 @@ if valid:
     elapsedtime = endtime - starttime
     print("Total elapsed time: {0}".format(
         elapsedFormat(elapsedtime.total_seconds())))
+    # non-zero exit code, so that the job runner (or a script) knows the conversion failed
+    if result is not None and result != 0:
+        sys.exit(1)
+else:
+    sys.exit(1)
@@ -0,0 +1,82 @@
+"""
+MIT License
+
+Copyright (c) 2019 UCSF Hu Lab
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import argparse
+from datetime import datetime
+from myutil import dtFormat
+from myutil import elapsedFormat
+from wfio.extract import concatFiles
+from wfio.extract import findBinFiles
+from wfio.extract import ExtractError
+
+g_version = "0.1"
+g_exename = "wfedit"
+
+
+def getArgs():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-f", "--file", help="Input File (can be repeated)", action="append")
+    parser.add_argument("-d", "--dir", help="Input Directory, all .adibin files in it are used")
+    parser.add_argument("-o", "--output", help="Output Filename", required=True)
+    parser.add_argument("-p", "--channels", help="comma separated channel labels, in the order of output (default: all channels)")
+    # use store_const, instead of store_true, so that default value is None (instead of False)
+    parser.add_argument("--ignore_gap", help="ignore gap or overlap between files", action="store_const", const=True)
+    parser.add_argument("--warning_on_gaps", help="show warning when encountering gaps or overlaps", action="store_const", const=True)
+    return parser.parse_args()
+
+
+def runApp(files, outputFn, labels, ignoreGap, warningOnGaps):
+    try:
+        numSamples = concatFiles(files, outputFn, labels, ignoreGap, warningOnGaps, print_processing_fn=True)
+    except ExtractError as e:
+        print("ERROR: {0}".format(e.message))
+        return 1
+    print("Number of samples written = {0}".format(numSamples))
+    return 0
+
+
+print("{0} v{1} - Copyright(c) HuLab@UCSF 2019".format(g_exename, g_version))
+args = getArgs()
+files = []
+if args.file is not None:
+    files.extend(args.file)
+if args.dir is not None:
+    files.extend(findBinFiles([args.dir]))
+valid = True
+if len(files) == 0:
+    print("You must specify -f or -d option!!")
+    valid = False
+if valid and os.path.exists(args.output):
+    print("Output file exists already!!")
+    valid = False
+if valid:
+    starttime = datetime.now()
+    print("Start processing at: {0}".format(dtFormat(starttime)))
+    labels = args.channels.split(",") if args.channels is not None else None
+    runApp(files, args.output, labels, bool(args.ignore_gap), bool(args.warning_on_gaps))
+    endtime = datetime.now()
+    print("Finished processing at: {0}".format(dtFormat(endtime)))
+    elapsedtime = endtime - starttime
+    print("Total elapsed time: {0}".format(elapsedFormat(elapsedtime.total_seconds())))
@@ -0,0 +1,93 @@
+"""
+MIT License
+
+Copyright (c) 2019 UCSF Hu Lab
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import argparse
+from datetime import datetime
+from myutil import elapsedFormat
+from myutil import parsetime
+from wfio.catalog import Catalog
+from wfio.extract import extractTimeRange
+from wfio.extract import findBinFiles
+from wfio.extract import ExtractError
+
+g_version = "0.1"
+g_exename = "wfextract"
+
+
+def getArgs():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-d", "--dir", help="Input directory with .adibin files (can be repeated)", action="append")
+    parser.add_argument("--db", help="Catalog database file (created by wfcatalog), used instead of scanning -d")
+    parser.add_argument("-o", "--output", help="Output Filename", required=True)
+    parser.add_argument("--stime", help="specify start time, format: \"1/1/2019 8:00:00 AM\"")
+    parser.add_argument("--etime", help="specify end time, format: \"1/1/2019 12:00:00 PM\"")
+    parser.add_argument("-p", "--channels", help="comma separated channel labels (default: all channels)")
+    parser.add_argument("--id1", help="id1 tag in output file (only with --db)")
+    parser.add_argument("--id2", help="id2 tag in output file (only with --db)")
+    parser.add_argument("--id3", help="id3 tag in output file (only with --db)")
+    parser.add_argument("--id4", help="id4 tag in output file (only with --db)")
+    parser.add_argument("--id5", help="id5 tag in output file (only with --db)")
+    return parser.parse_args()
+
+
+def runApp(args, stime, etime):
+    labels = args.channels.split(",") if args.channels is not None else None
+    if args.db is not None:
+        tagsDict = {"id1": args.id1, "id2": args.id2, "id3": args.id3, "id4": args.id4, "id5": args.id5}
+        with Catalog(args.db) as catalog:
+            files = [info["path"] for info in catalog.query(stime, etime, labels, tagsDict, "bin")]
+    else:
+        files = findBinFiles(args.dir)
+    try:
+        numSamples = extractTimeRange(files, args.output, stime, etime, labels, print_processing_fn=True)
+    except ExtractError as e:
+        print("ERROR: {0}".format(e.message))
+        return 1
+    if numSamples == 0:
+        print("No samples found in the time range.")
+    else:
+        print("Number of samples written = {0}".format(numSamples))
+    return 0
+
+
+print("{0} v{1} - Copyright(c) HuLab@UCSF 2019".format(g_exename, g_version))
+args = getArgs()
+valid = True
+stime = parsetime(args.stime) if args.stime is not None else None
+etime = parsetime(args.etime) if args.etime is not None else None
+if (args.dir is None) and (args.db is None):
+    print("You must specify -d or --db option!!")
+    valid = False
+if valid and ((args.stime is not None and stime is None) or (args.etime is not None and etime is None)):
+    print("Invalid --stime or --etime !!")
+    valid = False
+if valid and os.path.exists(args.output):
+    print("Output file exists already!!")
+    valid = False
+if valid:
+    starttime = datetime.now()
+    runApp(args, stime, etime)
+    elapsedtime = datetime.now() - starttime
+    print("Total elapsed time: {0}".format(elapsedFormat(elapsedtime.total_seconds(), totalSecondsOnly=True)))
@@ -0,0 +1,64 @@
+"""
+MIT License
+
+Copyright (c) 2019 UCSF Hu Lab
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import importlib
+
+# submodule of each name; submodules are imported on first use (PEP 562), so that importing
+# a light module (e.g. wfio.output_file) does not import numpy, sqlite3, etc.
+LAZY_NAMES = {
+    "BinReader": "bin_reader",
+    "getHeaderStartDt": "bin_reader",
+    "BlockCache": "block_cache",
+    "Catalog": "catalog",
+    "BinStitcher": "bin_stitcher",
+    "extractTimeRange": "extract",
+    "concatFiles": "extract",
+    "findBinFiles": "extract",
+    "ExtractError": "extract",
+    "NpyDirFile": "npy_file",
+    "loadNpyDir": "npy_file",
+    "CompressedBinFile": "compressed_file",
+    "NumpyBinFile": "numpy_bin_file",
+    "openOutputFile": "output_file",
+    "VitalStore": "vital_store",
+    "loadVitalStore": "vital_store",
+    "getVitalParameter": "vital_store",
+    "SignalStats": "signal_stats",
+    "loadSignalStats": "signal_stats",
+    "TrendWriter": "trend_file",
+    "SidecarOutput": "sidecar",
+}
+__all__ = list(LAZY_NAMES.keys())
+
+
+def __getattr__(name: str):
+    if name in LAZY_NAMES:
+        value = getattr(importlib.import_module("." + LAZY_NAMES[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError("module {0!r} has no attribute {1!r}".format(__name__, name))
+
+
+def __dir__():
+    return sorted(list(globals().keys()) + __all__)
@@ -0,0 +1,58 @@
+"""
+MIT License
+
+Copyright (c) 2019 UCSF Hu Lab
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import numpy as np
+# to fix error in pyinstaller, we need to import additional types for numpy
+import numpy.core._dtype_ctypes
+from typing import List
+from typing import Any
+
+
+# convert chanData (list of channels) written at the end of file with gapInSecs (same as
+# BinFile.writeChannelData: positive is gap, negative is overlap) to a block
+# (numChannels x numSamples) of the samples to append, including the gap, return (numGapSamples, block).
+# If interleaved is True, the block is (numSamples x numChannels) as in .adibin files.
+# Each channel (numpy array or any buffer, e.g. array('h')) is copied once, into the block
+def toChannelBlock(chanData: List[Any], fs: int, gapInSecs: int, numChannels: int, dtype: np.dtype, gapValue: Any,
+                   interleaved: bool = False):
+    numGapSamples = int(gapInSecs * fs) if gapInSecs > 0 else 0
+    overlappedSamples = int(-1 * gapInSecs * fs) if gapInSecs < 0 else 0
+    len_chanData = len(chanData[0]) if len(chanData) > 0 else 0
+    numDataSamples = max(len_chanData - overlappedSamples, 0)
+    if interleaved:
+        samples = np.empty((numGapSamples + numDataSamples, numChannels), dtype=dtype)
+        block = samples.T
+    else:
+        samples = np.empty((numChannels, numGapSamples + numDataSamples), dtype=dtype)
+        block = samples
+    block[:, :numGapSamples] = gapValue
+    for i in range(numChannels):
+        if i >= len(chanData):
+            block[i, numGapSamples:] = gapValue
+            continue
+        # channels shorter than the first channel are padded with gap value, longer ones are cut
+        d = np.asarray(chanData[i])[overlappedSamples:len_chanData]
+        block[i, numGapSamples:numGapSamples + len(d)] = d
+        block[i, numGapSamples + len(d):] = gapValue
+    return numGapSamples, samples
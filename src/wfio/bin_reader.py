@@ -0,0 +1,129 @@
+"""
+MIT License
+
+Copyright (c) 2019 UCSF Hu Lab
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import math
+import datetime
+import numpy as np
+# to fix error in pyinstaller, we need to import additional types for numpy
+import numpy.core._dtype_ctypes
+from binfilepy import BinFile
+from binfilepy import BinFileError
+from binfilepy import constant
+
+# numpy dtype of one sample for each supported DataFormat
+DTYPE_BY_FORMAT = {
+    constant.FORMAT_SHORT: np.dtype("<i2"),
+    constant.FORMAT_FLOAT: np.dtype("<f4"),
+    constant.FORMAT_DOUBLE: np.dtype("<f8"),
+}
+
+
+def getHeaderStartDt(header: object):
+    second = int(math.floor(header.Second))
+    dt = datetime.datetime(header.Year, header.Month, header.Day, header.Hour, header.Minute, second)
+    return dt + datetime.timedelta(seconds=header.Second - second)
+
+
+class BinReader:
+    """
+    Random access reader for .adibin files.  Sample data is memory mapped with numpy,
+    so reading a window only touches the pages of the file that it needs.
+    """
+    filename = ""
+    header = None
+    channels = []
+    data = None
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.header = None
+        self.channels = []
+        self.data = None
+
+    def open(self):
+        with BinFile(self.filename, "r") as f:
+            f.readHeader()
+            self.header = f.header
+            self.channels = f.channels
+        dtype = DTYPE_BY_FORMAT.get(self.header.DataFormat)
+        if dtype is None:
+            raise BinFileError("Unsupported data format!")
+        numChannels = self.header.NChannels
+        dataOffset = constant.CFWB_SIZE + constant.CHANNEL_SIZE * numChannels
+        numSamples = 0
+        if numChannels > 0:
+            # do not map beyond the end of file (e.g. file is still being written)
+            numSamplesInFile = max(os.path.getsize(self.filename) - dataOffset, 0) // (dtype.itemsize * numChannels)
+            numSamples = min(self.header.SamplesPerChannel, numSamplesInFile)
+        if numSamples > 0:
+            self.data = np.memmap(self.filename, dtype=dtype, mode="r", offset=dataOffset, shape=(numSamples, numChannels))
+        else:
+            self.data = np.zeros((0, numChannels), dtype=dtype)
+
+    def close(self):
+        self.data = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    @property
+    def numSamples(self):
+        return self.data.shape[0] if self.data is not None else 0
+
+    @property
+    def numChannels(self):
+        return len(self.channels)
+
+    @property
+    def samplesPerSec(self):
+        return 1.0 / self.header.secsPerTick
+
+    @property
+    def startDt(self):
+        return getHeaderStartDt(self.header)
+
+    # return raw samples (numSamples x numChannels) as a view into the file
+    def readBlock(self, offset: int, length: int):
+        offset = min(max(int(offset), 0), self.numSamples)
+        end = min(offset + max(int(length), 0), self.numSamples)
+        return self.data[offset:end]
+
+    # return scaled samples (numChannels x numSamples), gaps are returned as NaN
+    def readScaledBlock(self, offset: int, length: int):
+        raw = self.readBlock(offset, length)
+        out = np.empty((raw.shape[1], raw.shape[0]), dtype=np.float64)
+        for i, c in enumerate(self.channels):
+            col = raw[:, i]
+            if self.header.DataFormat == constant.FORMAT_SHORT:
+                np.add(col, c.offset, out=out[i])
+                np.multiply(out[i], c.scale, out=out[i])
+                out[i][np.isin(col, constant.GAP_SHORT_VALUES)] = np.nan
+            else:
+                out[i] = col
+        return out
@@ -0,0 +1,165 @@
+"""
+MIT License
+
+Copyright (c) 2019 UCSF Hu Lab
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import datetime
+from pathlib import Path
+import numpy as np
+# to fix error in pyinstaller, we need to import additional types for numpy
+import numpy.core._dtype_ctypes
+from binfilepy import BinFile
+from binfilepy import BinFileError
+from binfilepy import CFWBINARY
+from binfilepy import CFWBCHANNEL
+from binfilepy import constant
+from .bin_reader import BinReader
+from typing import List
+
+# number of samples (per channel) copied at a time
+DEFAULT_CHUNK_SIZE = 1 << 18
+
+
+class BinStitcher:
+    """
+    Write the samples of selected channels of many .adibin files, in time order, into one
+    .adibin file.  Gaps between files, and channels that a file does not have, are filled
+    with the gap value.  Samples are copied in blocks of chunkSize samples, so the memory
+    used does not depend on the size of the files.
+    If gapInWholeSecs is True, gaps and overlaps are handled in whole seconds in the same
+    way as the XML converters do between segments.
+    """
+    filename = ""
+    channels = []
+    samplesPerSec = 0
+    startDt = None
+    numSamples = 0
+
+    def __init__(self, filename: str, channels: List[CFWBCHANNEL], samplesPerSec: float, startDt: datetime.datetime,
+                 ignoreGap: bool = False, warningOnGaps: bool = False, gapInWholeSecs: bool = False,
+                 chunkSize: int = DEFAULT_CHUNK_SIZE):
+        self.filename = filename
+        self.channels = channels
+        self.samplesPerSec = samplesPerSec
+        self.startDt = startDt
+        self.ignoreGap = ignoreGap
+        self.warningOnGaps = warningOnGaps
+        self.gapInWholeSecs = gapInWholeSecs
+        self.chunkSize = max(int(chunkSize), 1)
+        self.numSamples = 0
+        self.binFileOut = None
+
+    def open(self):
+        header = CFWBINARY()
+        dt = self.startDt
+        header.setValue(1.0 / self.samplesPerSec, dt.year, dt.month, dt.day, dt.hour, dt.minute, dt.second + dt.microsecond / 1000000.0, 0, 0)
+        header.NChannels = len(self.channels)
+        self.binFileOut = BinFile(self.filename, "w")
+        self.binFileOut.open()
+        self.binFileOut.setHeader(header)
+        for c in self.channels:
+            channel = CFWBCHANNEL()
+            channel.setValue(c.Title, c.Units, c.scale, c.offset, c.RangeHigh, c.RangeLow)
+            self.binFileOut.addChannel(channel)
+        self.binFileOut.writeHeader()
+        self.numSamples = 0
+
+    def close(self):
+        if self.binFileOut is not None:
+            self.binFileOut.updateSamplesPerChannel(self.numSamples, True)
+            self.binFileOut.close()
+            self.binFileOut = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    # index of each output channel in the source channels (None if source does not have it)
+    def getChannelMap(self, srcChannels: List[CFWBCHANNEL]):
+        label2Index = {}
+        for i, c in enumerate(srcChannels):
+            label2Index.setdefault(c.Title.lower(), i)
+        return [label2Index.get(c.Title.lower()) for c in self.channels]
+
+    def writeGap(self, numSamples: int):
+        if numSamples <= 0:
+            return
+        numChannels = len(self.channels)
+        gapBlock = np.full((min(numSamples, self.chunkSize), numChannels), constant.MIN_SHORT_VALUE, dtype="<i2")
+        self.binFileOut.f.seek(0, 2)
+        remaining = numSamples
+        while remaining > 0:
+            n = min(remaining, len(gapBlock))
+            self.binFileOut.f.write(memoryview(gapBlock[:n]))
+            remaining -= n
+        self.numSamples += numSamples
+
+    # return gap (or overlap if negative) in number of samples between the end of output and srcStartDt
+    def getGap(self, srcStartDt: datetime.datetime, filename: str):
+        if self.gapInWholeSecs:
+            endDt = self.startDt + datetime.timedelta(seconds=int(self.numSamples / self.samplesPerSec))
+            gapInSec = int((srcStartDt - endDt).total_seconds())
+            if self.warningOnGaps and (gapInSec != 0) and (self.numSamples > 0):
+                print("{0} shows gap (or overlap) = {1} secs".format(filename, gapInSec))
+            return gapInSec * int(round(self.samplesPerSec))
+        gap = int(round((srcStartDt - self.startDt).total_seconds() * self.samplesPerSec)) - self.numSamples
+        if self.warningOnGaps and (gap != 0) and (self.numSamples > 0):
+            print("{0} shows gap (or overlap) = {1:.2f} secs".format(filename, gap / self.samplesPerSec))
+        return gap
+
+    # copy samples [startSample, endSample) of the source, return number of samples written
+    def addFile(self, reader: BinReader, startSample: int = 0, endSample: int = None):
+        if reader.header.DataFormat != constant.FORMAT_SHORT:
+            raise BinFileError("Unsupported data format!")
+        endSample = reader.numSamples if endSample is None else min(endSample, reader.numSamples)
+        srcStartDt = reader.startDt + datetime.timedelta(seconds=startSample / reader.samplesPerSec)
+        gap = self.getGap(srcStartDt, Path(reader.filename).name)
+        if self.ignoreGap:
+            gap = 0
+        numSamplesBefore = self.numSamples
+        if gap > 0:
+            self.writeGap(gap)
+        elif gap < 0:
+            # overlap: skip the samples that are written already
+            startSample -= gap
+        chanMap = self.getChannelMap(reader.channels)
+        numChannels = len(self.channels)
+        self.binFileOut.f.seek(0, 2)
+        pos = startSample
+        while pos < endSample:
+            n = min(endSample - pos, self.chunkSize)
+            block = reader.readBlock(pos, n)
+            if chanMap == list(range(reader.numChannels)):
+                # same channels in same order, write straight from the mapped file
+                out = np.ascontiguousarray(block)
+            else:
+                out = np.full((n, numChannels), constant.MIN_SHORT_VALUE, dtype="<i2")
+                for j, srcIdx in enumerate(chanMap):
+                    if srcIdx is not None:
+                        out[:, j] = block[:, srcIdx]
+            self.binFileOut.f.write(memoryview(out))
+            self.numSamples += n
+            pos += n
+        return self.numSamples - numSamplesBefore
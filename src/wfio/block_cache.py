@@ -0,0 +1,113 @@
+"""
+MIT License
+
+Copyright (c) 2019 UCSF Hu Lab
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import queue
+import threading
+from collections import OrderedDict
+import numpy as np
+from .bin_reader import BinReader
+
+
+class BlockCache:
+    """
+    Bounded LRU cache of decoded (scaled) sample blocks of a BinReader.
+    Neighboring blocks can be decoded ahead of time on a background thread.
+    """
+    reader = None
+    blockSize = 0
+    maxBlocks = 0
+
+    def __init__(self, reader: BinReader, blockSize: int, maxBlocks: int = 16):
+        self.reader = reader
+        self.blockSize = max(int(blockSize), 1)
+        self.maxBlocks = max(int(maxBlocks), 1)
+        self.blocks = OrderedDict()
+        self.lock = threading.Lock()
+        self.prefetchQueue = queue.Queue()
+        self.prefetchThread = None
+
+    def numBlocks(self):
+        return (self.reader.numSamples + self.blockSize - 1) // self.blockSize
+
+    def getBlock(self, idx: int):
+        with self.lock:
+            block = self.blocks.get(idx)
+            if block is not None:
+                self.blocks.move_to_end(idx)
+                return block
+        block = self.reader.readScaledBlock(idx * self.blockSize, self.blockSize)
+        with self.lock:
+            self.blocks[idx] = block
+            self.blocks.move_to_end(idx)
+            while len(self.blocks) > self.maxBlocks:
+                self.blocks.popitem(last=False)
+        return block
+
+    def isCached(self, idx: int):
+        with self.lock:
+            return idx in self.blocks
+
+    # return scaled samples (numChannels x numSamples) of the window [offset, offset + length)
+    def getWindow(self, offset: int, length: int):
+        offset = min(max(int(offset), 0), self.reader.numSamples)
+        end = min(offset + max(int(length), 0), self.reader.numSamples)
+        if end <= offset:
+            return np.zeros((self.reader.numChannels, 0), dtype=np.float64)
+        firstIdx = offset // self.blockSize
+        lastIdx = (end - 1) // self.blockSize
+        parts = []
+        for idx in range(firstIdx, lastIdx + 1):
+            block = self.getBlock(idx)
+            blockStart = idx * self.blockSize
+            parts.append(block[:, max(offset - blockStart, 0):end - blockStart])
+        return parts[0] if len(parts) == 1 else np.concatenate(parts, axis=1)
+
+    # queue the blocks of the window [offset, offset + length) for decoding in background
+    def prefetch(self, offset: int, length: int):
+        offset = max(int(offset), 0)
+        end = min(offset + max(int(length), 0), self.reader.numSamples)
+        if end <= offset:
+            return
+        if self.prefetchThread is None:
+            self.prefetchThread = threading.Thread(target=self._prefetchWorker, daemon=True)
+            self.prefetchThread.start()
+        for idx in range(offset // self.blockSize, (end - 1) // self.blockSize + 1):
+            if not self.isCached(idx):
+                self.prefetchQueue.put(idx)
+
+    def _prefetchWorker(self):
+        while True:
+            idx = self.prefetchQueue.get()
+            if idx is None:
+                break
+            if not self.isCached(idx):
+                self.getBlock(idx)
+
+    def close(self):
+        if self.prefetchThread is not None:
+            self.prefetchQueue.put(None)
+            self.prefetchThread.join()
+            self.prefetchThread = None
+        with self.lock:
+            self.blocks.clear()
@@ -0,0 +1,255 @@
+"""
+MIT License
+
+Copyright (c) 2019 UCSF Hu Lab
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import re
+import sqlite3
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from binfilepy import BinFile
+from vitalfilepy import VitalFile
+from vitalfilepy import constant as vitalconstant
+from .bin_reader import getHeaderStartDt
+from .trend_file import isTrendFn
+from typing import Dict
+from typing import List
+
+DEFAULT_BIN_EXTS = ["adibin"]
+VITAL_EXT = "vital"
+TAG_NAMES = ["id1", "id2", "id3", "id4", "id5"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    kind TEXT,
+    mtime REAL,
+    size INTEGER,
+    start_ts REAL,
+    end_ts REAL,
+    samples_per_sec REAL,
+    num_samples INTEGER,
+    unit TEXT,
+    bed TEXT,
+    id1 TEXT, id2 TEXT, id3 TEXT, id4 TEXT, id5 TEXT
+);
+CREATE INDEX IF NOT EXISTS files_start_ts ON files (start_ts);
+CREATE INDEX IF NOT EXISTS files_end_ts ON files (end_ts);
+CREATE INDEX IF NOT EXISTS files_id1 ON files (id1);
+CREATE TABLE IF NOT EXISTS channels (
+    path TEXT,
+    idx INTEGER,
+    label TEXT COLLATE NOCASE,
+    uom TEXT
+);
+CREATE INDEX IF NOT EXISTS channels_label ON channels (label);
+CREATE INDEX IF NOT EXISTS channels_path ON channels (path);
+"""
+
+
+def dtToTs(dt: datetime.datetime):
+    # naive datetime (local time of the archive), stored as seconds since 1970-01-01
+    return (dt - datetime.datetime(1970, 1, 1)).total_seconds()
+
+
+def tsToDt(ts: float):
+    return datetime.datetime(1970, 1, 1) + datetime.timedelta(seconds=ts)
+
+
+# convert output_fn_pattern (e.g. "{id1}_{starttime}_{endtime}") to a regex that extracts id1 - id5
+def fnPatternToRegex(fnpattern: str):
+    regex = "^"
+    pos = 0
+    for m in re.finditer(r"\{(\w+)\}", fnpattern):
+        regex += re.escape(fnpattern[pos:m.start()])
+        name = m.group(1).lower()
+        regex += "(?P<{0}>.+?)".format(name) if name in TAG_NAMES else ".+?"
+        pos = m.end()
+    regex += re.escape(fnpattern[pos:])
+    # vital files have "_<parameter>" and duplicated names have "_<n>" appended
+    regex += "(?:_.+)?$"
+    return re.compile(regex)
+
+
+def readBinFileInfo(path: str):
+    with BinFile(path, "r") as f:
+        f.readHeader()
+        startDt = getHeaderStartDt(f.header)
+        numSamples = f.header.SamplesPerChannel
+        samplesPerSec = (1.0 / f.header.secsPerTick) if f.header.secsPerTick > 0 else 0.0
+        endDt = startDt + datetime.timedelta(seconds=(numSamples / samplesPerSec) if samplesPerSec > 0 else 0)
+        channels = [(c.Title, c.Units) for c in f.channels]
+    return {"kind": "bin", "start_ts": dtToTs(startDt), "end_ts": dtToTs(endDt), "samples_per_sec": samplesPerSec,
+            "num_samples": numSamples, "unit": None, "bed": None, "channels": channels}
+
+
+def readVitalFileInfo(path: str):
+    with VitalFile(path, "r") as f:
+        f.readHeader()
+        h = f.header
+        startDt = getHeaderStartDt(h)
+        numSamples = f.numSamplesInFile
+        endDt = startDt
+        if numSamples > 0:
+            # only read the last record for the end time
+            f.f.seek(vitalconstant.VITALHEADER_SIZE + (numSamples - 1) * vitalconstant.DOUBLE_SIZE * 4, 0)
+            value, offset, low, high = f.readVitalData()
+            endDt = startDt + datetime.timedelta(seconds=offset)
+    return {"kind": "vital", "start_ts": dtToTs(startDt), "end_ts": dtToTs(endDt), "samples_per_sec": None,
+            "num_samples": numSamples, "unit": h.Unit, "bed": h.Bed, "channels": [(h.Label, h.Uom)]}
+
+
+def readFileInfo(path: str):
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    if ext == VITAL_EXT:
+        return readVitalFileInfo(path)
+    return readBinFileInfo(path)
+
+
+class Catalog:
+    """
+    SQLite index of the headers of converted output files (.adibin and .vital).
+    Only new or modified files (by mtime and size) are read when updating.
+    """
+    dbFilename = ""
+    conn = None
+
+    def __init__(self, dbFilename: str, fnpattern: str = None):
+        self.dbFilename = dbFilename
+        self.fnRegex = fnPatternToRegex(fnpattern) if (fnpattern is not None) and (len(fnpattern) > 0) else None
+        self.conn = None
+
+    def open(self):
+        self.conn = sqlite3.connect(self.dbFilename)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.commit()
+            self.conn.close()
+            self.conn = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def scanDir(self, srcDir: str, exts: List[str]):
+        found = {}
+        for root, dirs, files in os.walk(srcDir):
+            for fn in files:
+                ext = os.path.splitext(fn)[1].lower().lstrip(".")
+                if (ext in exts) and not isTrendFn(fn):
+                    fp = os.path.abspath(os.path.join(root, fn))
+                    st = os.stat(fp)
+                    found[fp] = (st.st_mtime, st.st_size)
+        return found
+
+    def getTags(self, path: str):
+        tags = {}
+        if self.fnRegex is not None:
+            m = self.fnRegex.match(os.path.splitext(os.path.basename(path))[0])
+            if m is not None:
+                tags = m.groupdict()
+        return tags
+
+    # return number of files (added or updated, removed, unchanged)
+    def update(self, srcDirs: List[str], exts: List[str] = None, numWorkers: int = 8, print_errors: bool = False):
+        exts = [e.lower().lstrip(".") for e in (exts if exts is not None else DEFAULT_BIN_EXTS + [VITAL_EXT])]
+        found = {}
+        with ThreadPoolExecutor(max_workers=max(numWorkers, 1)) as pool:
+            for d in pool.map(lambda srcDir: self.scanDir(srcDir, exts), srcDirs):
+                found.update(d)
+        known = {}
+        for srcDir in srcDirs:
+            prefix = os.path.join(os.path.abspath(srcDir), "")
+            for path, mtime, size in self.conn.execute("SELECT path, mtime, size FROM files WHERE substr(path, 1, ?) = ?", (len(prefix), prefix)):
+                known[path] = (mtime, size)
+        changed = [p for p, stat in found.items() if known.get(p) != stat]
+        removed = [p for p in known if p not in found]
+        numUnchanged = len(found) - len(changed)
+
+        def readInfo(path: str):
+            try:
+                return path, readFileInfo(path)
+            except Exception as e:
+                if print_errors:
+                    print("Cannot read header of {0}: {1}".format(path, e))
+                return path, None
+
+        numUpdated = 0
+        with ThreadPoolExecutor(max_workers=max(numWorkers, 1)) as pool:
+            for path, info in pool.map(readInfo, changed):
+                self.removeFile(path)
+                if info is None:
+                    continue
+                mtime, size = found[path]
+                tags = self.getTags(path)
+                self.conn.execute("INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                  (path, info["kind"], mtime, size, info["start_ts"], info["end_ts"], info["samples_per_sec"],
+                                   info["num_samples"], info["unit"], info["bed"]) + tuple(tags.get(t) for t in TAG_NAMES))
+                self.conn.executemany("INSERT INTO channels VALUES (?, ?, ?, ?)",
+                                      [(path, i, label, uom) for i, (label, uom) in enumerate(info["channels"])])
+                numUpdated += 1
+        for path in removed:
+            self.removeFile(path)
+        self.conn.commit()
+        return numUpdated, len(removed), numUnchanged
+
+    def removeFile(self, path: str):
+        self.conn.execute("DELETE FROM files WHERE path = ?", (path,))
+        self.conn.execute("DELETE FROM channels WHERE path = ?", (path,))
+
+    # return list of dict of the files overlapping [stime, etime) having any of the channels
+    def query(self, stime: datetime.datetime = None, etime: datetime.datetime = None,
+              channels: List[str] = None, tagsDict: Dict = None, kind: str = None):
+        sql = "SELECT * FROM files f WHERE 1 = 1"
+        params = []
+        if stime is not None:
+            sql += " AND f.end_ts > ?"
+            params.append(dtToTs(stime))
+        if etime is not None:
+            sql += " AND f.start_ts < ?"
+            params.append(dtToTs(etime))
+        if kind is not None:
+            sql += " AND f.kind = ?"
+            params.append(kind)
+        if tagsDict is not None:
+            for t in TAG_NAMES:
+                if tagsDict.get(t) is not None:
+                    sql += " AND f.{0} = ?".format(t)
+                    params.append(tagsDict.get(t))
+        if (channels is not None) and (len(channels) > 0):
+            sql += " AND f.path IN (SELECT c.path FROM channels c WHERE c.label IN ({0}))".format(",".join("?" * len(channels)))
+            params.extend(channels)
+        sql += " ORDER BY f.start_ts, f.path"
+        cur = self.conn.execute(sql, params)
+        names = [d[0] for d in cur.description]
+        result = []
+        for row in cur.fetchall():
+            info = dict(zip(names, row))
+            info["channels"] = [r[0] for r in self.conn.execute("SELECT label FROM channels WHERE path = ? ORDER BY idx", (info["path"],))]
+            result.append(info)
+        return result
@@ -0,0 +1,292 @@
+"""
+MIT License
+
+Copyright (c) 2019 UCSF Hu Lab
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import bisect
+import lzma
+import struct
+import zlib
+import numpy as np
+# to fix error in pyinstaller, we need to import additional types for numpy
+import numpy.core._dtype_ctypes
+from pathlib import Path
+from binfilepy import BinFileError
+from binfilepy import CFWBINARY
+from binfilepy import CFWBCHANNEL
+from binfilepy import constant
+from .bin_block import toChannelBlock
+from .sidecar import SidecarOutput
+from typing import List
+from typing import Any
+
+MAGIC = [b'C', b'F', b'W', b'Z']
+CODEC_ZLIB = 1
+CODEC_LZMA = 2
+CODEC_BY_NAME = {"zlib": CODEC_ZLIB, "lzma": CODEC_LZMA}
+# default number of samples (per channel) in a block
+DEFAULT_BLOCK_SIZE = 240 * 60
+BLOCK_MAGIC = b"BLK1"
+# magic, codec, numSamples, compressed length, first sample
+BLOCK_HEADER_FORMAT = "<4sB3xIIQ"
+BLOCK_HEADER_SIZE = struct.calcsize(BLOCK_HEADER_FORMAT)
+INDEX_MAGIC = b"IDX1"
+# first sample, numSamples, offset of block header
+INDEX_ENTRY_FORMAT = "<QIQ"
+INDEX_ENTRY_SIZE = struct.calcsize(INDEX_ENTRY_FORMAT)
+# magic, number of blocks, offset of index
+TRAILER_FORMAT = "<4sIQ"
+TRAILER_SIZE = struct.calcsize(TRAILER_FORMAT)
+SAMPLE_DTYPE = np.dtype("<i2")
+
+
+# delta encode each channel (int16 wrap around), and store low bytes before high bytes
+def encodeBlock(block: np.ndarray, codec: int, level: int):
+    delta = np.empty(block.shape, dtype=SAMPLE_DTYPE)
+    delta[:, :1] = block[:, :1]
+    np.subtract(block[:, 1:], block[:, :-1], out=delta[:, 1:], casting="unsafe")
+    shuffled = delta.view(np.uint8).reshape(-1, 2).T.tobytes()
+    if codec == CODEC_LZMA:
+        return lzma.compress(shuffled, preset=level)
+    return zlib.compress(shuffled, level)
+
+
+# return block (numChannels x numSamples)
+def decodeBlock(buf: bytes, codec: int, numChannels: int, numSamples: int):
+    shuffled = lzma.decompress(buf) if codec == CODEC_LZMA else zlib.decompress(buf)
+    delta = np.frombuffer(shuffled, dtype=np.uint8).reshape(2, -1).T.copy().view(SAMPLE_DTYPE)
+    delta = delta.reshape(numChannels, numSamples)
+    return np.cumsum(delta, axis=1, dtype=SAMPLE_DTYPE)
+
+
+class CompressedBinFile(SidecarOutput):
+    """
+    Output file with the same interface as BinFile, for 16-bit data only.  The header is the
+    same as .adibin (with magic "CFWZ"), followed by independently compressed blocks of
+    blockSize samples (delta encoded per channel, then zlib or lzma), and an index of the
+    blocks at the end of file, so that any range of samples can be read by decoding only
+    the blocks needed (see readSamples).
+    """
+    f = None
+    filename = ""
+    header = None
+    channels = []
+    sidecars = []
+
+    def __init__(self, filename: str, mode: str, codec: str = "zlib", level: int = 6, blockSize: int = DEFAULT_BLOCK_SIZE):
+        self.filename = filename
+        self.mode = mode
+        self.codec = CODEC_BY_NAME.get(codec, CODEC_ZLIB)
+        self.level = level
+        self.blockSize = max(int(blockSize), 1)
+        self.header = None
+        self.channels = []
+        self.pending = []
+        self.numPendingSamples = 0
+        # list of (first sample, numSamples, offset)
+        self.index = []
+        self.indexFirstSamples = []
+        self.numSamplesInBlocks = 0
+        self.indexLoaded = False
+        self.lastDecoded = None
+        self.sidecars = []
+
+    def open(self):
+        if self.mode == "r":
+            try:
+                self.f = open(self.filename, "rb")
+            except OSError:
+                self.f = None
+                raise BinFileError("File not found!")
+        elif self.mode == "r+":
+            try:
+                self.f = open(self.filename, "rb+")
+            except OSError:
+                self.f = None
+                raise BinFileError("File not found!")
+        elif self.mode == "w":
+            if Path(self.filename).exists():
+                raise BinFileError("Cannot open file!")
+            try:
+                self.f = open(self.filename, "wb+")
+            except OSError:
+                self.f = None
+                raise BinFileError("Cannot open file!")
+            self.indexLoaded = True
+
+    def setHeader(self, header: CFWBINARY):
+        self.header = header
+
+    def addChannel(self, channelDef: CFWBCHANNEL):
+        self.channels.append(channelDef)
+
+    def getDataOffset(self):
+        return constant.CFWB_SIZE + constant.CHANNEL_SIZE * self.header.NChannels
+
+    def readHeader(self):
+        self.f.seek(0, 0)
+        buf = self.f.read(constant.CFWB_SIZE)
+        magic = struct.unpack("cccc", buf[0:4])
+        if list(magic) != MAGIC:
+            raise BinFileError("Not a compressed bin file!")
+        self.header = CFWBINARY()
+        # do not modify the class attribute CFWBINARY.magic
+        self.header.magic = list(magic)
+        (self.header.Version, self.header.secsPerTick, self.header.Year, self.header.Month, self.header.Day,
+         self.header.Hour, self.header.Minute, self.header.Second, self.header.trigger, self.header.NChannels,
+         self.header.SamplesPerChannel, self.header.TimeChannel, self.header.DataFormat) = struct.unpack("=idiiiiiddiiii", buf[4:])
+        self.channels = []
+        for i in range(self.header.NChannels):
+            label = self.f.read(32).decode("utf-8").rstrip('\0')
+            uom = self.f.read(32).decode("utf-8").rstrip('\0')
+            scale, offset, rangeHigh, rangeLow = struct.unpack("dddd", self.f.read(constant.DOUBLE_SIZE * 4))
+            self.channels.append(CFWBCHANNEL(label, uom, scale, offset, rangeHigh, rangeLow))
+        self.loadIndex()
+
+    def writeHeader(self):
+        self.f.seek(0, 0)
+        h = self.header
+        self.f.write(struct.pack("cccc", *MAGIC))
+        self.f.write(struct.pack("=idiiiiiddiiii", h.Version, h.secsPerTick, h.Year, h.Month, h.Day, h.Hour, h.Minute,
+                                 h.Second, h.trigger, h.NChannels, h.SamplesPerChannel, h.TimeChannel, h.DataFormat))
+        for c in self.channels:
+            self.f.write(struct.pack("32s", c.Title.encode('utf-8')))
+            self.f.write(struct.pack("32s", c.Units.encode('utf-8')))
+            self.f.write(struct.pack("dddd", c.scale, c.offset, c.RangeHigh, c.RangeLow))
+
+    def loadIndex(self):
+        self.index = []
+        fileSize = os.path.getsize(self.filename)
+        dataOffset = self.getDataOffset()
+        endOfBlocks = dataOffset
+        trailer = None
+        if fileSize >= dataOffset + TRAILER_SIZE:
+            self.f.seek(fileSize - TRAILER_SIZE, 0)
+            trailer = struct.unpack(TRAILER_FORMAT, self.f.read(TRAILER_SIZE))
+        if (trailer is not None) and (trailer[0] == INDEX_MAGIC):
+            numBlocks, indexOffset = trailer[1], trailer[2]
+            self.f.seek(indexOffset, 0)
+            buf = self.f.read(numBlocks * INDEX_ENTRY_SIZE)
+            self.index = [struct.unpack_from(INDEX_ENTRY_FORMAT, buf, i * INDEX_ENTRY_SIZE) for i in range(numBlocks)]
+            endOfBlocks = indexOffset
+        else:
+            # no index (file was not closed), rebuild it from the block headers
+            pos = dataOffset
+            while pos + BLOCK_HEADER_SIZE <= fileSize:
+                self.f.seek(pos, 0)
+                magic, codec, numSamples, clen, firstSample = struct.unpack(BLOCK_HEADER_FORMAT, self.f.read(BLOCK_HEADER_SIZE))
+                if (magic != BLOCK_MAGIC) or (pos + BLOCK_HEADER_SIZE + clen > fileSize):
+                    break
+                self.index.append((firstSample, numSamples, pos))
+                pos += BLOCK_HEADER_SIZE + clen
+            endOfBlocks = pos
+        self.indexFirstSamples = [e[0] for e in self.index]
+        self.numSamplesInBlocks = (self.index[-1][0] + self.index[-1][1]) if len(self.index) > 0 else 0
+        self.indexLoaded = True
+        if self.mode == "r+":
+            # remove the index (or partial block), new blocks are appended after the last block
+            self.f.truncate(endOfBlocks)
+            self.header.SamplesPerChannel = self.numSamplesInBlocks
+
+    def writeBlock(self, block: np.ndarray):
+        buf = encodeBlock(block, self.codec, self.level)
+        self.f.seek(0, 2)
+        pos = self.f.tell()
+        self.f.write(struct.pack(BLOCK_HEADER_FORMAT, BLOCK_MAGIC, self.codec, block.shape[1], len(buf), self.numSamplesInBlocks))
+        self.f.write(buf)
+        self.index.append((self.numSamplesInBlocks, block.shape[1], pos))
+        self.indexFirstSamples.append(self.numSamplesInBlocks)
+        self.numSamplesInBlocks += block.shape[1]
+
+    def flushBlocks(self, flushAll: bool):
+        while (self.numPendingSamples >= self.blockSize) or (flushAll and self.numPendingSamples > 0):
+            pending = self.pending[0] if len(self.pending) == 1 else np.concatenate(self.pending, axis=1)
+            n = min(self.blockSize, pending.shape[1])
+            self.writeBlock(pending[:, :n])
+            self.pending = [pending[:, n:]] if n < pending.shape[1] else []
+            self.numPendingSamples -= n
+
+    def writeChannelData(self, chanData: List[Any], fs: int = 0, gapInSecs: int = 0):
+        if self.header.DataFormat != constant.FORMAT_SHORT:
+            raise BinFileError("Unsupported array type!")
+        if not self.indexLoaded:
+            self.loadIndex()
+        numGapSamples, block = toChannelBlock(chanData, fs, gapInSecs, len(self.channels), SAMPLE_DTYPE, constant.MIN_SHORT_VALUE)
+        if block.shape[1] > 0:
+            self.pending.append(block)
+            self.numPendingSamples += block.shape[1]
+            self.flushBlocks(False)
+            self.addToSidecars(block)
+        return block.shape[1]
+
+    def updateSamplesPerChannel(self, numSamples: int, writeToFile: bool):
+        self.header.SamplesPerChannel = numSamples
+        if writeToFile:
+            if self.mode == "w" or self.mode == "r+":
+                self.f.seek(constant.N_SAMPLE_POSITION)
+                self.f.write(struct.pack("i", numSamples))
+                self.f.flush()
+
+    # return samples [offset, offset + length) as (numSamples x numChannels), like BinReader.readBlock
+    def readSamples(self, offset: int, length: int):
+        if not self.indexLoaded:
+            self.loadIndex()
+        offset = min(max(int(offset), 0), self.numSamplesInBlocks)
+        end = min(offset + max(int(length), 0), self.numSamplesInBlocks)
+        parts = []
+        i = bisect.bisect_right(self.indexFirstSamples, offset) - 1
+        while (i >= 0) and (i < len(self.index)) and (self.index[i][0] < end):
+            firstSample, numSamples, pos = self.index[i]
+            if (self.lastDecoded is not None) and (self.lastDecoded[0] == i):
+                block = self.lastDecoded[1]
+            else:
+                self.f.seek(pos, 0)
+                magic, codec, n, clen, first = struct.unpack(BLOCK_HEADER_FORMAT, self.f.read(BLOCK_HEADER_SIZE))
+                block = decodeBlock(self.f.read(clen), codec, len(self.channels), n)
+                self.lastDecoded = (i, block)
+            parts.append(block[:, max(offset - firstSample, 0):end - firstSample])
+            i += 1
+        if len(parts) == 0:
+            return np.zeros((0, len(self.channels)), dtype=SAMPLE_DTYPE)
+        return np.concatenate(parts, axis=1).T
+
+    def close(self):
+        self.closeSidecars()
+        if self.f is not None:
+            if (self.mode == "w" or self.mode == "r+") and self.indexLoaded:
+                self.flushBlocks(True)
+                self.f.seek(0, 2)
+                indexOffset = self.f.tell()
+                for e in self.index:
+                    self.f.write(struct.pack(INDEX_ENTRY_FORMAT, *e))
+                self.f.write(struct.pack(TRAILER_FORMAT, INDEX_MAGIC, len(self.index), indexOffset))
+            self.f.flush()
+            self.f.close()
+            self.f = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
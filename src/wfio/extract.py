@@ -0,0 +1,164 @@
+"""
+MIT License
+
+Copyright (c) 2019 UCSF Hu Lab
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import datetime
+from binfilepy import CFWBCHANNEL
+from binfilepy import constant
+from .bin_reader import BinReader
+from .bin_stitcher import BinStitcher
+from .trend_file import isTrendFn
+from typing import List
+
+BIN_EXTS = ["adibin"]
+
+
+class ExtractError(BaseException):
+    def __init__(self, message):
+        self.message = message
+
+
+def findBinFiles(srcDirs: List[str], exts: List[str] = None):
+    exts = [e.lower().lstrip(".") for e in (exts if exts is not None else BIN_EXTS)]
+    files = []
+    for srcDir in srcDirs:
+        for root, dirs, fns in os.walk(srcDir):
+            for fn in fns:
+                if (os.path.splitext(fn)[1].lower().lstrip(".") in exts) and not isTrendFn(fn):
+                    files.append(os.path.join(root, fn))
+    return sorted(files)
+
+
+class SourceFileInfo:
+    __slots__ = ["filename", "startDt", "endDt", "samplesPerSec", "channels"]
+
+    def __init__(self, filename: str, startDt: datetime.datetime, endDt: datetime.datetime, samplesPerSec: float, channels: List[CFWBCHANNEL]):
+        self.filename = filename
+        self.startDt = startDt
+        self.endDt = endDt
+        self.samplesPerSec = samplesPerSec
+        self.channels = channels
+
+
+def readSourceFileInfo(filename: str):
+    with BinReader(filename) as r:
+        if (r.numSamples == 0) or (r.header.DataFormat != constant.FORMAT_SHORT):
+            return None
+        startDt = r.startDt
+        endDt = startDt + datetime.timedelta(seconds=r.numSamples / r.samplesPerSec)
+        return SourceFileInfo(filename, startDt, endDt, r.samplesPerSec, r.channels)
+
+
+# select the output channels (from the first file that has it), all channels if labels is empty.
+# The samples are copied as they are, so a selected channel must have the same scale and offset in all files
+def selectChannels(infos: List[SourceFileInfo], labels: List[str] = None, print_warnings: bool = False):
+    label2Channel = {}
+    label2MixedFn = {}
+    allLabels = []
+    for info in infos:
+        for c in info.channels:
+            key = c.Title.lower()
+            if key not in label2Channel:
+                label2Channel[key] = c
+                allLabels.append(c.Title)
+            elif ((c.scale != label2Channel[key].scale) or (c.offset != label2Channel[key].offset)) and (key not in label2MixedFn):
+                label2MixedFn[key] = info.filename
+    if (labels is None) or (len(labels) == 0):
+        labels = allLabels
+    channels = []
+    for label in labels:
+        c = label2Channel.get(label.lower())
+        if label.lower() in label2MixedFn:
+            raise ExtractError("Channel {0} of {1} has different scale or offset".format(c.Title, label2MixedFn[label.lower()]))
+        if c is not None:
+            channels.append(c)
+        elif print_warnings:
+            print("Channel {0} is not found in any file".format(label))
+    return channels
+
+
+# return SourceFileInfo of the files with the same sampling rate (as the first file) in time order
+def readSourceFileInfos(files: List[str], stime: datetime.datetime = None, etime: datetime.datetime = None):
+    infos = []
+    for fn in files:
+        info = readSourceFileInfo(fn)
+        if info is None:
+            continue
+        if ((stime is not None) and (info.endDt <= stime)) or ((etime is not None) and (info.startDt >= etime)):
+            continue
+        infos.append(info)
+    infos.sort(key=lambda i: (i.startDt, i.filename))
+    sameRateInfos = []
+    for info in infos:
+        if info.samplesPerSec != infos[0].samplesPerSec:
+            print("Skip {0}: sampling rate {1:.3f} is different from {2:.3f}".format(info.filename, info.samplesPerSec, infos[0].samplesPerSec))
+        else:
+            sameRateInfos.append(info)
+    return sameRateInfos
+
+
+# write samples of [stime, etime) of the channels in files to outputFn, return number of samples written
+def extractTimeRange(files: List[str], outputFn: str, stime: datetime.datetime = None, etime: datetime.datetime = None,
+                     labels: List[str] = None, print_processing_fn: bool = False):
+    infos = readSourceFileInfos(files, stime, etime)
+    if len(infos) == 0:
+        return 0
+    samplesPerSec = infos[0].samplesPerSec
+    channels = selectChannels(infos, labels, print_warnings=True)
+    if len(channels) == 0:
+        return 0
+    startDt = infos[0].startDt if (stime is None) or (stime < infos[0].startDt) else stime
+    endDt = max(info.endDt for info in infos)
+    endDt = endDt if (etime is None) or (etime > endDt) else etime
+    with BinStitcher(outputFn, channels, samplesPerSec, startDt) as stitcher:
+        for info in infos:
+            startSample = max(int(round((startDt - info.startDt).total_seconds() * samplesPerSec)), 0)
+            endSample = int(round((endDt - info.startDt).total_seconds() * samplesPerSec))
+            if endSample <= startSample:
+                continue
+            if print_processing_fn:
+                print("Extracting from: {0}".format(os.path.basename(info.filename)))
+            with BinReader(info.filename) as r:
+                stitcher.addFile(r, startSample, endSample)
+        return stitcher.numSamples
+
+
+# concatenate the files in time order with the channels (all channels if labels is empty) to outputFn,
+# gaps and overlaps are handled in the same way as the XML converters, return number of samples written
+def concatFiles(files: List[str], outputFn: str, labels: List[str] = None, ignoreGap: bool = False,
+                warningOnGaps: bool = False, print_processing_fn: bool = False):
+    infos = readSourceFileInfos(files)
+    if len(infos) == 0:
+        return 0
+    channels = selectChannels(infos, labels, print_warnings=True)
+    if len(channels) == 0:
+        return 0
+    with BinStitcher(outputFn, channels, infos[0].samplesPerSec, infos[0].startDt,
+                     ignoreGap=ignoreGap, warningOnGaps=warningOnGaps, gapInWholeSecs=True) as stitcher:
+        for info in infos:
+            if print_processing_fn:
+                print("Processing file: {0}".format(os.path.basename(info.filename)))
+            with BinReader(info.filename) as r:
+                stitcher.addFile(r)
+        return stitcher.numSamples
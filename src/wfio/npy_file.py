@@ -0,0 +1,204 @@
+"""
+MIT License
+
+Copyright (c) 2019 UCSF Hu Lab
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import json
+import struct
+import numpy as np
+# to fix error in pyinstaller, we need to import additional types for numpy
+import numpy.core._dtype_ctypes
+from pathlib import Path
+from binfilepy import BinFileError
+from binfilepy import CFWBINARY
+from binfilepy import CFWBCHANNEL
+from binfilepy import constant
+from .bin_reader import DTYPE_BY_FORMAT
+from .bin_reader import getHeaderStartDt
+from .bin_block import toChannelBlock
+from .sidecar import SidecarOutput
+from typing import List
+from typing import Any
+
+HEADER_FILENAME = "header.json"
+NPY_FORMAT_VERSION = 1
+# fixed size of .npy header, so that the shape can be updated in place when appending
+NPY_HEADER_SIZE = 128
+NPY_MAGIC = b"\x93NUMPY\x01\x00"
+
+
+def npyHeader(dtype: np.dtype, numSamples: int):
+    d = "{{'descr': '{0}', 'fortran_order': False, 'shape': ({1},), }}".format(dtype.str, numSamples)
+    # magic (6 + 2 bytes), header length (2 bytes), header padded with spaces and ending with newline
+    d = d.ljust(NPY_HEADER_SIZE - len(NPY_MAGIC) - 2 - 1) + "\n"
+    return NPY_MAGIC + struct.pack("<H", len(d)) + d.encode("latin1")
+
+
+class NpyDirFile(SidecarOutput):
+    """
+    Output file with the same interface as BinFile, written as a directory with one
+    contiguous .npy file per channel and a JSON header.  Channel data is appended to the
+    .npy files (their shape is updated in place), so any time range of a channel can be
+    read without copying with np.load(..., mmap_mode="r") (see loadNpyDir).
+    """
+    filename = ""
+    header = None
+    channels = []
+    sidecars = []
+
+    def __init__(self, filename: str, mode: str):
+        self.filename = filename
+        self.mode = mode
+        self.header = None
+        self.channels = []
+        self.sidecars = []
+        self.channelFiles = []
+        self.numSamplesInFile = []
+
+    def open(self):
+        if self.mode == "r" or self.mode == "r+":
+            if not Path(self.filename).joinpath(HEADER_FILENAME).exists():
+                raise BinFileError("File not found!")
+        elif self.mode == "w":
+            try:
+                os.mkdir(self.filename)
+            except OSError:
+                raise BinFileError("Cannot open file!")
+
+    def setHeader(self, header: CFWBINARY):
+        self.header = header
+
+    def addChannel(self, channelDef: CFWBCHANNEL):
+        self.channels.append(channelDef)
+
+    def getChannelFilename(self, idx: int):
+        return "ch{0:03d}.npy".format(idx)
+
+    def getDtype(self):
+        dtype = DTYPE_BY_FORMAT.get(self.header.DataFormat)
+        if dtype is None:
+            raise BinFileError("Unsupported array type!")
+        return dtype
+
+    def readHeader(self):
+        with open(Path(self.filename).joinpath(HEADER_FILENAME), "r") as f:
+            h = json.load(f)
+        self.header = CFWBINARY()
+        self.header.setValue(h["secsPerTick"], h["Year"], h["Month"], h["Day"], h["Hour"], h["Minute"], h["Second"],
+                             h.get("trigger", 0.0), len(h["channels"]), h["SamplesPerChannel"], h.get("TimeChannel", 0), h["DataFormat"])
+        self.channels = []
+        for c in h["channels"]:
+            self.channels.append(CFWBCHANNEL(c["Title"], c["Units"], c["scale"], c["offset"], c["RangeHigh"], c["RangeLow"]))
+
+    def writeHeader(self):
+        h = {"format": "npy", "version": NPY_FORMAT_VERSION,
+             "startTime": getHeaderStartDt(self.header).isoformat(),
+             "samplesPerSec": (1.0 / self.header.secsPerTick) if self.header.secsPerTick > 0 else 0.0,
+             "secsPerTick": self.header.secsPerTick,
+             "Year": self.header.Year, "Month": self.header.Month, "Day": self.header.Day,
+             "Hour": self.header.Hour, "Minute": self.header.Minute, "Second": self.header.Second,
+             "trigger": self.header.trigger, "TimeChannel": self.header.TimeChannel,
+             "DataFormat": self.header.DataFormat, "dtype": self.getDtype().str,
+             "SamplesPerChannel": self.header.SamplesPerChannel, "channels": []}
+        for i, c in enumerate(self.channels):
+            h["channels"].append({"Title": c.Title, "Units": c.Units, "scale": c.scale, "offset": c.offset,
+                                  "RangeHigh": c.RangeHigh, "RangeLow": c.RangeLow, "file": self.getChannelFilename(i)})
+        # replace the header in one step, so that readers never see a partial header
+        fn = Path(self.filename).joinpath(HEADER_FILENAME)
+        tempFn = Path(self.filename).joinpath(HEADER_FILENAME + ".tmp")
+        with open(tempFn, "w") as f:
+            json.dump(h, f, indent=1)
+        os.replace(tempFn, fn)
+        self.openChannelFiles()
+
+    def openChannelFiles(self):
+        dtype = self.getDtype()
+        while len(self.channelFiles) < len(self.channels):
+            fn = Path(self.filename).joinpath(self.getChannelFilename(len(self.channelFiles)))
+            if fn.exists():
+                f = open(fn, "rb+")
+                numSamples = (os.path.getsize(fn) - NPY_HEADER_SIZE) // dtype.itemsize
+            else:
+                f = open(fn, "wb+")
+                f.write(npyHeader(dtype, 0))
+                numSamples = 0
+            self.channelFiles.append(f)
+            self.numSamplesInFile.append(numSamples)
+
+    def appendChannelData(self, idx: int, data: np.ndarray):
+        f = self.channelFiles[idx]
+        f.seek(0, 2)
+        f.write(memoryview(np.ascontiguousarray(data, dtype=self.getDtype())))
+        self.numSamplesInFile[idx] += len(data)
+
+    def writeChannelData(self, chanData: List[Any], fs: int = 0, gapInSecs: int = 0):
+        self.openChannelFiles()
+        gapValue = constant.MIN_SHORT_VALUE if self.header.DataFormat == constant.FORMAT_SHORT else constant.MIN_DOUBLE_VALUE
+        numChannels = min(len(chanData), len(self.channelFiles))
+        numGapSamples, block = toChannelBlock(chanData, fs, gapInSecs, numChannels, self.getDtype(), gapValue)
+        for i in range(numChannels):
+            self.appendChannelData(i, block[i])
+        if self.header.DataFormat == constant.FORMAT_SHORT:
+            self.addToSidecars(block)
+        return block.shape[1]
+
+    def updateNpyHeaders(self):
+        dtype = self.getDtype()
+        for f, numSamples in zip(self.channelFiles, self.numSamplesInFile):
+            f.seek(0, 0)
+            f.write(npyHeader(dtype, numSamples))
+            f.flush()
+
+    def updateSamplesPerChannel(self, numSamples: int, writeToFile: bool):
+        self.header.SamplesPerChannel = numSamples
+        if writeToFile:
+            if self.mode == "w" or self.mode == "r+":
+                self.updateNpyHeaders()
+                self.writeHeader()
+
+    def close(self):
+        self.closeSidecars()
+        if len(self.channelFiles) > 0:
+            self.updateNpyHeaders()
+            for f in self.channelFiles:
+                f.close()
+            self.channelFiles = []
+            self.numSamplesInFile = []
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+
+# return (header dict, list of memory mapped channel arrays) of a directory written by NpyDirFile
+def loadNpyDir(dirname: str, mmap_mode: str = "r"):
+    with open(Path(dirname).joinpath(HEADER_FILENAME), "r") as f:
+        h = json.load(f)
+    arrays = []
+    for c in h["channels"]:
+        a = np.load(Path(dirname).joinpath(c["file"]), mmap_mode=mmap_mode)
+        arrays.append(a[:h["SamplesPerChannel"]])
+    return h, arrays
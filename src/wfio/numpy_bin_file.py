@@ -0,0 +1,68 @@
+"""
+MIT License
+
+Copyright (c) 2019 UCSF Hu Lab
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from binfilepy import BinFile
+from binfilepy import BinFileError
+from binfilepy import constant
+from .bin_reader import DTYPE_BY_FORMAT
+from .bin_block import toChannelBlock
+from .sidecar import SidecarOutput
+from typing import List
+from typing import Any
+
+GAP_VALUE_BY_FORMAT = {
+    constant.FORMAT_SHORT: constant.MIN_SHORT_VALUE,
+    constant.FORMAT_FLOAT: constant.MIN_FLOAT_VALUE,
+    constant.FORMAT_DOUBLE: constant.MIN_DOUBLE_VALUE,
+}
+
+
+class NumpyBinFile(BinFile, SidecarOutput):
+    """
+    BinFile with writeChannelData for numpy arrays (or any buffer, e.g. array('h')): the channels are
+    interleaved into one block and written with a single write, instead of packing sample by sample.
+    The file written is the same as BinFile's.
+    """
+    sidecars = []
+
+    def __init__(self, filename: str, mode: str):
+        super().__init__(filename, mode)
+        self.sidecars = []
+
+    def writeChannelData(self, chanData: List[Any], fs: int = 0, gapInSecs: int = 0):
+        dtype = DTYPE_BY_FORMAT.get(self.header.DataFormat)
+        if dtype is None:
+            raise BinFileError("Unsupported array type!")
+        numGapSamples, block = toChannelBlock(chanData, fs, gapInSecs, len(chanData), dtype,
+                                              GAP_VALUE_BY_FORMAT[self.header.DataFormat], interleaved=True)
+        # 2 means the end of file
+        self.f.seek(0, 2)
+        if block.size > 0:
+            self.f.write(memoryview(block))
+            self.addToSidecars(block.T)
+        return block.shape[0]
+
+    def close(self):
+        self.closeSidecars()
+        super().close()
@@ -0,0 +1,54 @@
+"""
+MIT License
+
+Copyright (c) 2019 UCSF Hu Lab
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+OUTPUT_FORMAT_ADIBIN = "adibin"
+OUTPUT_FORMAT_NPY = "npy"
+OUTPUT_FORMAT_ADIBINZ = "adibinz"
+OUTPUT_FORMAT_ADIBINXZ = "adibinxz"
+OUTPUT_FORMATS = [OUTPUT_FORMAT_ADIBIN, OUTPUT_FORMAT_NPY, OUTPUT_FORMAT_ADIBINZ, OUTPUT_FORMAT_ADIBINXZ]
+# default output_fn_ext of each output format
+DEFAULT_FN_EXT_BY_FORMAT = {OUTPUT_FORMAT_ADIBIN: "adibin", OUTPUT_FORMAT_NPY: "npyd", OUTPUT_FORMAT_ADIBINZ: "adibinz",
+                           OUTPUT_FORMAT_ADIBINXZ: "adibinxz"}
+# vitals (BedMaster): .vital file per parameter, or one columnar .vitals file (see VitalStore) per run
+VITAL_FORMAT_VITAL = "vital"
+VITAL_FORMAT_COLUMNAR = "columnar"
+VITAL_FORMATS = [VITAL_FORMAT_VITAL, VITAL_FORMAT_COLUMNAR]
+# default number of .vital files kept open across XML files (vital_file_pool_size of wfconvert, see VitalFilePool)
+DEFAULT_VITAL_FILE_POOL_SIZE = 64
+
+
+# return BinFile or the file of the same interface for the output format
+def openOutputFile(filename: str, mode: str, outputFormat: str = OUTPUT_FORMAT_ADIBIN):
+    # import numpy only when a file is opened
+    if outputFormat == OUTPUT_FORMAT_NPY:
+        from .npy_file import NpyDirFile
+        return NpyDirFile(filename, mode)
+    if outputFormat == OUTPUT_FORMAT_ADIBINZ:
+        from .compressed_file import CompressedBinFile
+        return CompressedBinFile(filename, mode, "zlib")
+    if outputFormat == OUTPUT_FORMAT_ADIBINXZ:
+        from .compressed_file import CompressedBinFile
+        return CompressedBinFile(filename, mode, "lzma")
+    from .numpy_bin_file import NumpyBinFile
+    return NumpyBinFile(filename, mode)
@@ -0,0 +1,51 @@
+"""
+MIT License
+
+Copyright (c) 2019 UCSF Hu Lab
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import numpy as np
+from typing import Any
+
+
+class SidecarOutput:
+    """
+    Sidecars of an output file (BinFile, or the file of the same interface): files derived from the samples
+    written to it, e.g. SignalStats ({filename}.stats.json) or TrendWriter ({stem}.trend.adibin).  A sidecar is
+    attached to the file opened for writing, after its header and channels are set (see attachSignalStats,
+    attachTrendWriter), and continues from its own file if the output file is opened to append (r+).  Each
+    block written (channels x samples) is added to the sidecars with add(block), and the sidecars are closed
+    with close() before the output file is closed.
+    """
+    sidecars = []
+
+    def attachSidecar(self, sidecar: Any):
+        self.sidecars = self.sidecars + [sidecar]
+        return sidecar
+
+    def addToSidecars(self, block: np.ndarray):
+        for sidecar in self.sidecars:
+            sidecar.add(block)
+
+    def closeSidecars(self):
+        for sidecar in self.sidecars:
+            sidecar.close()
+        self.sidecars = []
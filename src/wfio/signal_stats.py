@@ -0,0 +1,253 @@
+"""
+MIT License
+
+Copyright (c) 2019 UCSF Hu Lab
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import json
+import datetime
+import numpy as np
+# to fix error in pyinstaller, we need to import additional types for numpy
+import numpy.core._dtype_ctypes
+from binfilepy import constant
+from .bin_reader import getHeaderStartDt
+from typing import List
+
+SIGNAL_STATS_EXT = ".stats.json"
+SIGNAL_STATS_VERSION = 1
+SECS_PER_BUCKET = 60
+# runs of the same value for at least this long are flatline
+DEFAULT_FLATLINE_SECS = 2.0
+# samples at the limits of short (not gap values) are saturated
+SATURATED_SHORT_VALUES = [constant.MAX_SHORT_VALUE, constant.MIN_SHORT_VALUE + 1]
+# columns (numBuckets x numChannels) saved in the sidecar
+STATS_COLUMNS = ["samples", "gapSamples", "sum", "min", "max", "flatlineSamples", "saturatedSamples"]
+
+
+class SignalStats:
+    """
+    Per channel statistics of the samples (short) written to an output file, by minute from the start of file,
+    accumulated from the blocks as they are written: number of samples, gap samples (gap values, incl. gaps filled
+    between segments), sum, min and max (raw values), flatline samples (runs of the same value for at least
+    flatlineSecs) and saturated samples.  Saved in a JSON sidecar ({filename}.stats.json), see loadSignalStats.
+    """
+    filename = ""
+    samplesPerSec = 0.0
+    labels = []
+    flatlineSecs = DEFAULT_FLATLINE_SECS
+    numSamples = 0
+
+    def __init__(self, filename: str, samplesPerSec: float, labels: List[str], flatlineSecs: float = DEFAULT_FLATLINE_SECS):
+        self.filename = filename
+        self.samplesPerSec = samplesPerSec
+        self.labels = list(labels)
+        self.flatlineSecs = flatlineSecs
+        self.numSamples = 0
+        self.startDt = None
+        self.scales = [1.0] * len(self.labels)
+        self.offsets = [0.0] * len(self.labels)
+        numChannels = len(self.labels)
+        self.columns = {}
+        for name in STATS_COLUMNS:
+            self.columns[name] = np.zeros((0, numChannels), dtype=np.float64 if name == "sum" else np.int64)
+        # the last run of each channel (value, first sample, samples counted as flatline up to)
+        self.runValue = [None] * numChannels
+        self.runStart = [0] * numChannels
+        self.runCountedTo = [0] * numChannels
+
+    @property
+    def samplesPerBucket(self):
+        return max(int(round(SECS_PER_BUCKET * self.samplesPerSec)), 1)
+
+    @property
+    def numBuckets(self):
+        return self.columns["samples"].shape[0]
+
+    def reserve(self, numBuckets: int):
+        n = numBuckets - self.numBuckets
+        if n <= 0:
+            return
+        for name in STATS_COLUMNS:
+            fill = constant.MAX_SHORT_VALUE if name == "min" else (constant.MIN_SHORT_VALUE if name == "max" else 0)
+            add = np.full((n, len(self.labels)), fill, dtype=self.columns[name].dtype)
+            self.columns[name] = np.concatenate([self.columns[name], add])
+
+    # add counts of samples [start, end) of channel idx to column name, by bucket
+    def addRange(self, name: str, idx: int, start: int, end: int):
+        spb = self.samplesPerBucket
+        while start < end:
+            bucket = start // spb
+            bucketEnd = min(end, (bucket + 1) * spb)
+            self.columns[name][bucket, idx] += bucketEnd - start
+            start = bucketEnd
+
+    # block of samples (numChannels x numSamples) appended to the file
+    def add(self, block: np.ndarray):
+        numChannels = min(block.shape[0], len(self.labels))
+        n = block.shape[1]
+        if (n == 0) or (numChannels == 0):
+            return
+        start = self.numSamples
+        end = start + n
+        spb = self.samplesPerBucket
+        self.reserve((end - 1) // spb + 1)
+        block = block[:numChannels]
+        gaps = np.isin(block, constant.GAP_SHORT_VALUES)
+        saturated = np.isin(block, SATURATED_SHORT_VALUES)
+        for bucket in range(start // spb, (end - 1) // spb + 1):
+            s = max(start, bucket * spb) - start
+            e = min(end, (bucket + 1) * spb) - start
+            part = block[:, s:e]
+            partGaps = gaps[:, s:e]
+            numGaps = partGaps.sum(axis=1)
+            self.columns["gapSamples"][bucket, :numChannels] += numGaps
+            self.columns["samples"][bucket, :numChannels] += (e - s) - numGaps
+            self.columns["saturatedSamples"][bucket, :numChannels] += saturated[:, s:e].sum(axis=1)
+            self.columns["sum"][bucket, :numChannels] += np.where(partGaps, 0, part).sum(axis=1, dtype=np.float64)
+            np.minimum(self.columns["min"][bucket, :numChannels], np.where(partGaps, constant.MAX_SHORT_VALUE, part).min(axis=1),
+                       out=self.columns["min"][bucket, :numChannels])
+            np.maximum(self.columns["max"][bucket, :numChannels], np.where(partGaps, constant.MIN_SHORT_VALUE, part).max(axis=1),
+                       out=self.columns["max"][bucket, :numChannels])
+        flatlineSamples = max(int(round(self.flatlineSecs * self.samplesPerSec)), 2)
+        for i in range(numChannels):
+            x = block[i]
+            changes = np.flatnonzero(x[1:] != x[:-1]) + 1
+            localStarts = np.concatenate([[0], changes])
+            runStarts = localStarts + start
+            runEnds = np.concatenate([changes, [n]]) + start
+            # the first run continues the last run of the previous block
+            continued = (self.runValue[i] is not None) and (int(x[0]) == self.runValue[i])
+            if continued:
+                runStarts[0] = self.runStart[i]
+            longRuns = np.flatnonzero((runEnds - runStarts) >= flatlineSamples)
+            for r in longRuns:
+                # gaps are not flatline
+                if int(x[localStarts[r]]) in constant.GAP_SHORT_VALUES:
+                    continue
+                countFrom = max(int(runStarts[r]), self.runCountedTo[i]) if (r == 0 and continued) else int(runStarts[r])
+                self.addRange("flatlineSamples", i, countFrom, int(runEnds[r]))
+            self.runValue[i] = int(x[-1])
+            self.runStart[i] = int(runStarts[-1])
+            self.runCountedTo[i] = int(runEnds[-1]) if (runEnds[-1] - runStarts[-1]) >= flatlineSamples else int(runStarts[-1])
+        self.numSamples = end
+
+    def close(self):
+        self.save()
+
+    def save(self, filename: str = None):
+        h = {
+            "version": SIGNAL_STATS_VERSION,
+            "startTime": self.startDt.strftime("%Y-%m-%d %H:%M:%S.%f") if self.startDt is not None else "",
+            "samplesPerSec": self.samplesPerSec,
+            "secsPerBucket": SECS_PER_BUCKET,
+            "flatlineSecs": self.flatlineSecs,
+            "numSamples": self.numSamples,
+            "channels": self.labels,
+            "scales": self.scales,
+            "offsets": self.offsets,
+            "runs": [self.runValue, self.runStart, self.runCountedTo],
+        }
+        for name in STATS_COLUMNS:
+            h[name] = self.columns[name].tolist()
+        with open(filename if filename is not None else getSignalStatsFn(self.filename), "w") as f:
+            json.dump(h, f, separators=(",", ":"))
+
+    def load(self, filename: str = None):
+        with open(filename if filename is not None else getSignalStatsFn(self.filename), "r") as f:
+            h = json.load(f)
+        self.startDt = datetime.datetime.strptime(h["startTime"], "%Y-%m-%d %H:%M:%S.%f") if len(h["startTime"]) > 0 else None
+        self.samplesPerSec = h["samplesPerSec"]
+        self.flatlineSecs = h["flatlineSecs"]
+        self.numSamples = h["numSamples"]
+        self.labels = h["channels"]
+        self.scales = h["scales"]
+        self.offsets = h["offsets"]
+        self.runValue, self.runStart, self.runCountedTo = h["runs"]
+        for name in STATS_COLUMNS:
+            self.columns[name] = np.array(h[name], dtype=self.columns[name].dtype).reshape((-1, len(self.labels)))
+        return self
+
+
+def getSignalStatsFn(filename: str):
+    return filename + SIGNAL_STATS_EXT
+
+
+# attach SignalStats to an output file as a sidecar (see SidecarOutput)
+def attachSignalStats(outputFile: object, filename: str):
+    labels = [c.Title for c in outputFile.channels]
+    numSamplesInFile = outputFile.header.SamplesPerChannel if outputFile.mode == "r+" else 0
+    stats = SignalStats(filename, 1.0 / outputFile.header.secsPerTick, labels)
+    statsFn = getSignalStatsFn(filename)
+    if (numSamplesInFile > 0) and os.path.exists(statsFn):
+        try:
+            stats.load(statsFn)
+        except (OSError, ValueError, KeyError):
+            stats = SignalStats(filename, 1.0 / outputFile.header.secsPerTick, labels)
+    if (stats.numSamples != numSamplesInFile) or (stats.labels != labels):
+        # no (or outdated) stats of the samples in file, stats start from the end of file
+        stats = SignalStats(filename, 1.0 / outputFile.header.secsPerTick, labels)
+        stats.numSamples = numSamplesInFile
+    stats.startDt = getHeaderStartDt(outputFile.header)
+    stats.scales = [c.scale for c in outputFile.channels]
+    stats.offsets = [c.offset for c in outputFile.channels]
+    return outputFile.attachSidecar(stats)
+
+
+# rename the sidecar of an output file (renamed after it is closed)
+def renameSignalStats(filename: str, newFilename: str):
+    statsFn = getSignalStatsFn(filename)
+    if os.path.exists(statsFn):
+        os.replace(statsFn, getSignalStatsFn(newFilename))
+
+
+# update the channel labels in the sidecar of an output file (channels renamed)
+def renameSignalStatsChannels(filename: str, labels: List[str]):
+    statsFn = getSignalStatsFn(filename)
+    if os.path.exists(statsFn):
+        stats = SignalStats(filename, 0.0, labels).load(statsFn)
+        stats.labels = list(labels)
+        stats.save(statsFn)
+
+
+# return the stats in the sidecar (of an output file) as a dict, with numpy arrays (numMinutes x numChannels) of
+# samples, gapSecs, min, max, mean (scaled with the channel settings, NaN if no samples), flatlineSecs, saturatedSecs
+def loadSignalStats(statsFn: str):
+    stats = SignalStats("", 0.0, []).load(statsFn)
+    fs = stats.samplesPerSec
+    samples = stats.columns["samples"]
+    scales = np.array(stats.scales, dtype=np.float64)
+    offsets = np.array(stats.offsets, dtype=np.float64)
+    hasSamples = samples > 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = (stats.columns["sum"] / samples + offsets) * scales
+    return {
+        "startDt": stats.startDt,
+        "secsPerBucket": SECS_PER_BUCKET,
+        "channels": stats.labels,
+        "samples": samples,
+        "gapSecs": stats.columns["gapSamples"] / fs,
+        "min": np.where(hasSamples, (stats.columns["min"] + offsets) * scales, np.nan),
+        "max": np.where(hasSamples, (stats.columns["max"] + offsets) * scales, np.nan),
+        "mean": np.where(hasSamples, mean, np.nan),
+        "flatlineSecs": stats.columns["flatlineSamples"] / fs,
+        "saturatedSecs": stats.columns["saturatedSamples"] / fs,
+    }
@@ -0,0 +1,261 @@
+"""
+MIT License
+
+Copyright (c) 2019 UCSF Hu Lab
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import math
+import numpy as np
+# to fix error in pyinstaller, we need to import additional types for numpy
+import numpy.core._dtype_ctypes
+from binfilepy import CFWBINARY
+from binfilepy import CFWBCHANNEL
+from binfilepy import constant
+from .numpy_bin_file import NumpyBinFile
+from typing import List
+
+TREND_FN_SUFFIX = ".trend.adibin"
+DEFAULT_TREND_SECS = 1.0
+# min, max and mean of each channel, in this order
+TREND_STATS = ["min", "max", "mean"]
+
+
+def getTrendFn(filename: str):
+    return os.path.splitext(filename)[0] + TREND_FN_SUFFIX
+
+
+# trend files (written with the output files) are not recordings, e.g. for findBinFiles and Catalog
+def isTrendFn(filename: str):
+    return str(filename).lower().endswith(TREND_FN_SUFFIX)
+
+
+def getTrendLabels(labels: List[str]):
+    return ["{0}_{1}".format(label, s) for label in labels for s in TREND_STATS]
+
+
+class TrendWriter:
+    """
+    Low rate trend of an output file ({stem}.trend.adibin, short): min, max and mean (raw values, gaps excluded,
+    gap value if no samples) of each channel per interval of trendSecs from the start of file, computed from the
+    blocks as they are written.  The last interval (partial) is written when the file is closed, and is completed
+    (overwritten) when samples are appended to the output file.
+    """
+    filename = ""
+    trendSecs = DEFAULT_TREND_SECS
+    samplesPerInterval = 1
+    numChannels = 0
+    numIntervals = 0
+    trendFile = None
+
+    def __init__(self, filename: str, trendSecs: float = DEFAULT_TREND_SECS):
+        self.filename = filename
+        self.trendSecs = trendSecs
+        self.samplesPerInterval = 1
+        self.numChannels = 0
+        self.trendFile = None
+        self.numIntervals = 0
+        # samples of the last (partial) interval, and their number, sum, min and max (gaps excluded) by channel
+        self.numPendingSamples = 0
+        self.pendingCount = None
+        self.pendingSum = None
+        self.pendingMin = None
+        self.pendingMax = None
+        # the last interval written is partial, overwritten with the next interval
+        self.partialWritten = False
+
+    @property
+    def trendFn(self):
+        return getTrendFn(self.filename)
+
+    def clearPending(self):
+        self.numPendingSamples = 0
+        self.pendingCount = np.zeros(self.numChannels, dtype=np.int64)
+        self.pendingSum = np.zeros(self.numChannels, dtype=np.float64)
+        self.pendingMin = np.full(self.numChannels, constant.MAX_SHORT_VALUE, dtype=np.int64)
+        self.pendingMax = np.full(self.numChannels, constant.MIN_SHORT_VALUE, dtype=np.int64)
+
+    # open the trend file of an output file (header and channels set, numSamplesInFile samples in file)
+    def open(self, outputFile: object, numSamplesInFile: int):
+        header = outputFile.header
+        self.numChannels = len(outputFile.channels)
+        self.samplesPerInterval = max(int(round(self.trendSecs / header.secsPerTick)), 1)
+        self.clearPending()
+        secsPerTick = self.samplesPerInterval * header.secsPerTick
+        labels = getTrendLabels([c.Title for c in outputFile.channels])
+        numIntervals = int(math.ceil(numSamplesInFile / self.samplesPerInterval))
+        if (numSamplesInFile > 0) and self.openToAppend(labels, secsPerTick, numIntervals):
+            numPending = numSamplesInFile % self.samplesPerInterval
+            if numPending > 0:
+                # continue the last interval, its samples (unknown) are taken as not gaps
+                self.trendFile.f.seek(-self.numChannels * len(TREND_STATS) * constant.SHORT_SIZE, 2)
+                last = np.frombuffer(self.trendFile.f.read(self.numChannels * len(TREND_STATS) * constant.SHORT_SIZE),
+                                     dtype=np.int16).reshape((self.numChannels, len(TREND_STATS))).astype(np.int64)
+                hasSamples = last[:, 2] != constant.MIN_SHORT_VALUE
+                self.numPendingSamples = numPending
+                self.pendingCount = np.where(hasSamples, numPending, 0)
+                self.pendingSum = np.where(hasSamples, last[:, 2] * numPending, 0).astype(np.float64)
+                self.pendingMin = np.where(hasSamples, last[:, 0], constant.MAX_SHORT_VALUE)
+                self.pendingMax = np.where(hasSamples, last[:, 1], constant.MIN_SHORT_VALUE)
+                self.partialWritten = True
+            return
+        # no (or outdated) trend of the samples in file, trend starts from the end of file (gaps before)
+        trendHeader = CFWBINARY()
+        trendHeader.setValue(secsPerTick, header.Year, header.Month, header.Day, header.Hour, header.Minute, header.Second, 0, 0)
+        trendHeader.NChannels = len(labels)
+        if os.path.exists(self.trendFn):
+            os.remove(self.trendFn)
+        self.trendFile = NumpyBinFile(self.trendFn, "w")
+        self.trendFile.open()
+        self.trendFile.setHeader(trendHeader)
+        for c in outputFile.channels:
+            for s in TREND_STATS:
+                channel = CFWBCHANNEL()
+                channel.setValue("{0}_{1}".format(c.Title, s), c.Units, c.scale, c.offset, c.RangeLow, c.RangeHigh)
+                self.trendFile.addChannel(channel)
+        self.trendFile.writeHeader()
+        self.numIntervals = 0
+        self.partialWritten = False
+        numGapIntervals = numSamplesInFile // self.samplesPerInterval
+        if numGapIntervals > 0:
+            self.writeIntervals(np.full((len(labels), numGapIntervals), constant.MIN_SHORT_VALUE, dtype=np.int16))
+        self.numPendingSamples = numSamplesInFile % self.samplesPerInterval
+
+    def openToAppend(self, labels: List[str], secsPerTick: float, numIntervals: int):
+        if not os.path.exists(self.trendFn):
+            return False
+        trendFile = NumpyBinFile(self.trendFn, "r+")
+        try:
+            trendFile.open()
+            trendFile.readHeader()
+        except Exception:
+            trendFile.close()
+            return False
+        if ([c.Title for c in trendFile.channels] != labels) or (trendFile.header.SamplesPerChannel != numIntervals) or \
+                (abs(trendFile.header.secsPerTick - secsPerTick) > 1e-9) or (trendFile.header.DataFormat != constant.FORMAT_SHORT):
+            trendFile.close()
+            return False
+        self.trendFile = trendFile
+        self.numIntervals = numIntervals
+        return True
+
+    # append intervals ((numChannels * 3) x numIntervals), overwriting the last interval if partial
+    def writeIntervals(self, intervals: np.ndarray):
+        if self.partialWritten:
+            self.numIntervals -= 1
+            self.trendFile.f.truncate(constant.CFWB_SIZE + constant.CHANNEL_SIZE * self.trendFile.header.NChannels +
+                                      self.numIntervals * self.trendFile.header.NChannels * constant.SHORT_SIZE)
+            self.partialWritten = False
+        self.numIntervals += self.trendFile.writeChannelData(intervals)
+
+    # intervals of min, max, mean from counts, sums, mins and maxs (numChannels x numIntervals)
+    def toIntervals(self, count: np.ndarray, total: np.ndarray, minValue: np.ndarray, maxValue: np.ndarray):
+        hasSamples = count > 0
+        intervals = np.empty((self.numChannels, len(TREND_STATS), count.shape[1]), dtype=np.int16)
+        intervals[:, 0] = np.where(hasSamples, minValue, constant.MIN_SHORT_VALUE)
+        intervals[:, 1] = np.where(hasSamples, maxValue, constant.MIN_SHORT_VALUE)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            intervals[:, 2] = np.where(hasSamples, np.rint(total / np.maximum(count, 1)), constant.MIN_SHORT_VALUE)
+        return intervals.reshape((self.numChannels * len(TREND_STATS), count.shape[1]))
+
+    def addToPending(self, block: np.ndarray):
+        gaps = np.isin(block, constant.GAP_SHORT_VALUES)
+        self.pendingCount += block.shape[1] - gaps.sum(axis=1)
+        self.pendingSum += np.where(gaps, 0, block).sum(axis=1, dtype=np.float64)
+        if block.shape[1] > 0:
+            np.minimum(self.pendingMin, np.where(gaps, constant.MAX_SHORT_VALUE, block).min(axis=1), out=self.pendingMin)
+            np.maximum(self.pendingMax, np.where(gaps, constant.MIN_SHORT_VALUE, block).max(axis=1), out=self.pendingMax)
+        self.numPendingSamples += block.shape[1]
+
+    def pendingIntervals(self):
+        return self.toIntervals(self.pendingCount[:, None], self.pendingSum[:, None], self.pendingMin[:, None], self.pendingMax[:, None])
+
+    # block of samples (numChannels x numSamples) appended to the output file
+    def add(self, block: np.ndarray):
+        if (self.trendFile is None) or (block.shape[1] == 0):
+            return
+        if block.shape[0] != self.numChannels:
+            # channels not written are gaps
+            padded = np.full((self.numChannels, block.shape[1]), constant.MIN_SHORT_VALUE, dtype=np.int16)
+            numChannels = min(block.shape[0], self.numChannels)
+            padded[:numChannels] = block[:numChannels]
+            block = padded
+        spi = self.samplesPerInterval
+        parts = []
+        # complete the pending interval
+        n = min(spi - self.numPendingSamples, block.shape[1]) if self.numPendingSamples > 0 else 0
+        if n > 0:
+            self.addToPending(block[:, :n])
+            block = block[:, n:]
+            if self.numPendingSamples == spi:
+                parts.append(self.pendingIntervals())
+                self.clearPending()
+        # full intervals
+        numIntervals = block.shape[1] // spi
+        if numIntervals > 0:
+            x = block[:, :numIntervals * spi].reshape((self.numChannels, numIntervals, spi))
+            gaps = np.isin(x, constant.GAP_SHORT_VALUES)
+            parts.append(self.toIntervals(spi - gaps.sum(axis=2), np.where(gaps, 0, x).sum(axis=2, dtype=np.float64),
+                                          np.where(gaps, constant.MAX_SHORT_VALUE, x).min(axis=2),
+                                          np.where(gaps, constant.MIN_SHORT_VALUE, x).max(axis=2)))
+            block = block[:, numIntervals * spi:]
+        if block.shape[1] > 0:
+            self.addToPending(block)
+        if len(parts) > 0:
+            self.writeIntervals(np.concatenate(parts, axis=1))
+
+    def close(self):
+        if self.trendFile is None:
+            return
+        if self.numPendingSamples > 0:
+            self.writeIntervals(self.pendingIntervals())
+            self.partialWritten = True
+        self.trendFile.updateSamplesPerChannel(self.numIntervals, True)
+        self.trendFile.close()
+        self.trendFile = None
+
+
+# attach a TrendWriter to an output file as a sidecar (see SidecarOutput), None if the data is not short
+def attachTrendWriter(outputFile: object, filename: str, trendSecs: float = DEFAULT_TREND_SECS):
+    if outputFile.header.DataFormat != constant.FORMAT_SHORT:
+        return None
+    numSamplesInFile = outputFile.header.SamplesPerChannel if outputFile.mode == "r+" else 0
+    writer = TrendWriter(filename, trendSecs)
+    writer.open(outputFile, numSamplesInFile)
+    return outputFile.attachSidecar(writer)
+
+
+# rename the trend file of an output file (renamed after it is closed)
+def renameTrendFile(filename: str, newFilename: str):
+    trendFn = getTrendFn(filename)
+    if os.path.exists(trendFn):
+        os.replace(trendFn, getTrendFn(newFilename))
+
+
+# update the channel labels in the trend file of an output file (channels renamed)
+def renameTrendChannels(filename: str, labels: List[str]):
+    trendFn = getTrendFn(filename)
+    if os.path.exists(trendFn):
+        with NumpyBinFile(trendFn, "r+") as f:
+            f.readHeader()
+            for c, label in zip(f.channels, getTrendLabels(labels)):
+                c.Title = label
+            f.writeHeader()
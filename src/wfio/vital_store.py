@@ -0,0 +1,149 @@
+"""
+MIT License
+
+Copyright (c) 2019 UCSF Hu Lab
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import json
+import struct
+import datetime
+import numpy as np
+# to fix error in pyinstaller, we need to import additional types for numpy
+import numpy.core._dtype_ctypes
+from array import array
+from typing import Dict
+
+VITAL_STORE_MAGIC = b"VTLC"
+VITAL_STORE_VERSION = 1
+# magic, version, length of JSON header
+VITAL_STORE_HEADER_FORMAT = "<4sII"
+VITAL_STORE_HEADER_SIZE = struct.calcsize(VITAL_STORE_HEADER_FORMAT)
+# columns (in file order) and their types
+VITAL_STORE_COLUMNS = [("par", "<u2"), ("offset", "<f8"), ("value", "<f8"), ("low", "<f8"), ("high", "<f8")]
+
+
+def align8(n: int):
+    return (n + 7) & ~7
+
+
+class VitalStore:
+    """
+    Columnar store of the vital signs of all parameters (a single file per run instead
+    of a .vital file per parameter).  Records are appended to typed arrays (parameter id,
+    time offset in seconds from startDt, value, alarm low/high) and written by write() sorted
+    by parameter and time, with the row range of each parameter in the JSON header.
+    """
+    startDt = None
+    endDt = None
+    # time of the first record added, offsets are kept relative to it until written (vitals are not in time order)
+    firstDt = None
+
+    def __init__(self):
+        self.startDt = None
+        self.endDt = None
+        self.firstDt = None
+        self.params = []
+        self.parName2Id = {}
+        self.par = array("H")
+        self.offset = array("d")
+        self.value = array("d")
+        self.low = array("d")
+        self.high = array("d")
+
+    @property
+    def numRecords(self):
+        return len(self.par)
+
+    def addVital(self, par: str, uom: str, unit: str, bed: str, dt: datetime.datetime, value: float, low: float, high: float):
+        parId = self.parName2Id.get(par)
+        if parId is None:
+            parId = len(self.params)
+            self.parName2Id[par] = parId
+            self.params.append({"name": par, "uom": uom, "unit": unit, "bed": bed})
+        if self.firstDt is None:
+            self.firstDt = dt
+        if (self.startDt is None) or (dt < self.startDt):
+            self.startDt = dt
+        if (self.endDt is None) or (dt > self.endDt):
+            self.endDt = dt
+        self.par.append(parId)
+        self.offset.append((dt - self.firstDt).total_seconds())
+        self.value.append(value)
+        self.low.append(low)
+        self.high.append(high)
+
+    def write(self, filename: str):
+        columns = {}
+        for name, dtype in VITAL_STORE_COLUMNS:
+            columns[name] = np.frombuffer(getattr(self, name), dtype=np.dtype(dtype).newbyteorder("="))
+        if self.numRecords > 0:
+            # offsets from startDt (the earliest record)
+            columns["offset"] = columns["offset"] - (self.startDt - self.firstDt).total_seconds()
+        order = np.lexsort((columns["offset"], columns["par"]))
+        parIds = columns["par"][order]
+        starts = np.searchsorted(parIds, np.arange(len(self.params) + 1))
+        params = []
+        for i, p in enumerate(self.params):
+            p = dict(p)
+            p["start"] = int(starts[i])
+            p["count"] = int(starts[i + 1] - starts[i])
+            params.append(p)
+        header = {"version": VITAL_STORE_VERSION,
+                  "startTime": self.startDt.isoformat() if self.startDt is not None else None,
+                  "endTime": self.endDt.isoformat() if self.endDt is not None else None,
+                  "numRecords": self.numRecords, "parameters": params, "columns": []}
+        # column offsets are relative to the end of the header
+        pos = 0
+        for name, dtype in VITAL_STORE_COLUMNS:
+            header["columns"].append({"name": name, "dtype": dtype, "offset": pos})
+            pos = align8(pos + np.dtype(dtype).itemsize * self.numRecords)
+        headerBytes = json.dumps(header).encode("utf-8")
+        headerLen = align8(VITAL_STORE_HEADER_SIZE + len(headerBytes)) - VITAL_STORE_HEADER_SIZE
+        with open(filename, "wb") as f:
+            f.write(struct.pack(VITAL_STORE_HEADER_FORMAT, VITAL_STORE_MAGIC, VITAL_STORE_VERSION, headerLen))
+            f.write(headerBytes.ljust(headerLen, b" "))
+            for name, dtype in VITAL_STORE_COLUMNS:
+                buf = columns[name][order].astype(dtype).tobytes()
+                f.write(buf)
+                f.write(b"\0" * (align8(len(buf)) - len(buf)))
+
+
+# read the whole file at once, return header (dict) and columns (dict of numpy arrays)
+def loadVitalStore(filename: str):
+    with open(filename, "rb") as f:
+        buf = f.read()
+    magic, version, headerLen = struct.unpack_from(VITAL_STORE_HEADER_FORMAT, buf, 0)
+    if magic != VITAL_STORE_MAGIC:
+        raise ValueError("Not a vital store file: {0}".format(filename))
+    header = json.loads(buf[VITAL_STORE_HEADER_SIZE:VITAL_STORE_HEADER_SIZE + headerLen].decode("utf-8"))
+    dataOffset = VITAL_STORE_HEADER_SIZE + headerLen
+    columns = {}
+    for c in header["columns"]:
+        columns[c["name"]] = np.frombuffer(buf, dtype=c["dtype"], count=header["numRecords"], offset=dataOffset + c["offset"])
+    return header, columns
+
+
+# return columns of the records of parameter (slices of the loaded columns), or None
+def getVitalParameter(header: Dict, columns: Dict, par: str):
+    for p in header["parameters"]:
+        if p["name"] == par:
+            return {name: c[p["start"]:p["start"] + p["count"]] for name, c in columns.items()}
+    return None
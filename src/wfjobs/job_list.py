@@ -0,0 +1,123 @@
+"""
+MIT License
+
+Copyright (c) 2019 UCSF Hu Lab
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import csv
+import yaml
+from pathlib import Path
+from typing import Dict
+
+JOB_ID_KEYS = ["id1", "id2", "id3", "id4", "id5"]
+
+
+class JobListError(BaseException):
+    pass
+
+
+class ConvertJob:
+    """
+    A wfconvert job: input file (-f) or directory (-d), output directory, id1-id5 tags,
+    optional time range and config file, and its result after JobRunner has run it.
+    """
+    index = 0
+    name = ""
+    file = None
+    dir = None
+    outputDir = None
+    tagsDict = None
+    stime = None
+    etime = None
+    configFile = None
+    status = "pending"
+    attempts = 0
+    returnCode = None
+    elapsedSecs = 0.0
+    outputFiles = []
+    message = ""
+
+    def __init__(self, index: int, d: Dict):
+        self.index = index
+        self.file = getValue(d, "file")
+        self.dir = getValue(d, "dir")
+        inputPath = getValue(d, "input")
+        if (inputPath is not None) and (self.file is None) and (self.dir is None):
+            if Path(inputPath).is_dir():
+                self.dir = inputPath
+            else:
+                self.file = inputPath
+        self.outputDir = getValue(d, "output_dir")
+        self.tagsDict = {}
+        for k in JOB_ID_KEYS:
+            self.tagsDict[k] = getValue(d, k)
+        self.stime = getValue(d, "stime")
+        self.etime = getValue(d, "etime")
+        self.configFile = getValue(d, "config_file")
+        self.name = getValue(d, "name")
+        if self.name is None:
+            self.name = Path(self.file if self.file is not None else (self.dir if self.dir is not None else "")).name
+        self.status = "pending"
+        self.attempts = 0
+        self.returnCode = None
+        self.elapsedSecs = 0.0
+        self.outputFiles = []
+        self.message = ""
+
+    def validate(self):
+        if (self.file is None) == (self.dir is None):
+            raise JobListError("job {0}: specify either file or dir".format(self.index + 1))
+        if self.outputDir is None:
+            raise JobListError("job {0}: output_dir not set".format(self.index + 1))
+
+
+# return value as str, or None if it is not set
+def getValue(d: Dict, key: str):
+    value = d.get(key)
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value if len(value) > 0 else None
+
+
+def readJobList(filename: str, defaultOutputDir: str = None):
+    """
+    read job list from .yaml (a list of jobs, or "jobs": list) or .csv (with header row),
+    with keys: file, dir (or input), output_dir, id1-id5, stime, etime, config_file, name
+    """
+    ext = Path(filename).suffix.lower()
+    if ext == ".csv":
+        with open(filename, "r", newline="") as f:
+            rows = [row for row in csv.DictReader(f)]
+    else:
+        with open(filename, "r") as stream:
+            data = yaml.load(stream, Loader=yaml.SafeLoader)
+        rows = data.get("jobs", []) if isinstance(data, dict) else data
+    if not isinstance(rows, list):
+        raise JobListError("Invalid job list: {0}".format(filename))
+    jobs = []
+    for i, row in enumerate(rows):
+        job = ConvertJob(i, row)
+        if (job.outputDir is None) and (defaultOutputDir is not None):
+            job.outputDir = defaultOutputDir
+        job.validate()
+        jobs.append(job)
+    return jobs
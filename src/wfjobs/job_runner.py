@@ -0,0 +1,177 @@
+"""
+MIT License
+
+Copyright (c) 2019 UCSF Hu Lab
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import subprocess
+from datetime import datetime
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from .job_list import ConvertJob
+from .job_list import JOB_ID_KEYS
+from typing import List
+
+STAGING_DIR_PREFIX = ".wfconvert_job_"
+
+
+# create dst (an empty file, or directory) if it does not exist, return False if it does
+def reserveName(dst: str, isDir: bool):
+    try:
+        if isDir:
+            os.mkdir(dst)
+        else:
+            os.close(os.open(dst, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        return False
+    return True
+
+
+# move file (or directory, e.g. .npyd) to dstDir (on the same file system), adding _1, _2... if the name is taken.
+# The name is reserved (created) atomically first, so that jobs writing to the same dstDir do not overwrite each other
+def moveToDir(src: str, dstDir: str):
+    p = Path(src)
+    isDir = p.is_dir()
+    ext = "".join(p.suffixes[-1:])
+    stem = p.name[:len(p.name) - len(ext)]
+    dst = Path(dstDir).joinpath(p.name)
+    i = 1
+    while not reserveName(str(dst), isDir):
+        dst = Path(dstDir).joinpath("{0}_{1}{2}".format(stem, i, ext))
+        i += 1
+    if isDir:
+        # into the reserved directory (a directory cannot replace another one on all platforms)
+        for child in os.listdir(str(p)):
+            os.replace(str(p.joinpath(child)), str(dst.joinpath(child)))
+        os.rmdir(str(p))
+    else:
+        os.replace(str(p), str(dst))
+    return str(dst)
+
+
+class JobRunner:
+    """
+    Run wfconvert jobs in separate processes (so that converter state is not shared between
+    jobs), at most numWorkers at a time.  Each attempt writes to a staging directory inside
+    the job's output directory, which is moved into place only if the attempt succeeds, so a
+    failed job is retried (up to retries times) from a clean state.
+    """
+    cmd = []
+    extraArgs = []
+    numWorkers = 1
+    retries = 0
+    logDir = None
+
+    def __init__(self, cmd: List[str], extraArgs: List[str] = None, numWorkers: int = 1, retries: int = 0, logDir: str = None):
+        self.cmd = cmd
+        self.extraArgs = extraArgs if extraArgs is not None else []
+        self.numWorkers = max(int(numWorkers), 1)
+        self.retries = max(int(retries), 0)
+        self.logDir = logDir
+        self.printLock = threading.Lock()
+
+    def log(self, msg: str):
+        with self.printLock:
+            print(msg, flush=True)
+
+    def getJobArgs(self, job: ConvertJob, outputDir: str):
+        args = list(self.cmd)
+        if job.file is not None:
+            args += ["-f", job.file]
+        else:
+            args += ["-d", job.dir]
+        args += ["-o", outputDir]
+        if job.configFile is not None:
+            args += ["-c", job.configFile]
+        for k in JOB_ID_KEYS:
+            if job.tagsDict.get(k) is not None:
+                args += ["--" + k, job.tagsDict[k]]
+        if job.stime is not None:
+            args += ["--stime", job.stime]
+        if job.etime is not None:
+            args += ["--etime", job.etime]
+        return args + self.extraArgs
+
+    def runAttempt(self, job: ConvertJob):
+        stagingDir = tempfile.mkdtemp(prefix=STAGING_DIR_PREFIX, dir=job.outputDir)
+        try:
+            args = self.getJobArgs(job, stagingDir)
+            if self.logDir is not None:
+                logFn = Path(self.logDir).joinpath("job{0:04d}_{1}.log".format(job.index + 1, job.attempts))
+                with open(logFn, "w") as logFile:
+                    result = subprocess.run(args, stdout=logFile, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL)
+                output = ""
+            else:
+                result = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL)
+                output = result.stdout.decode("utf-8", errors="replace")
+            job.returnCode = result.returncode
+            if result.returncode == 0:
+                job.outputFiles = [moveToDir(str(Path(stagingDir).joinpath(fn)), job.outputDir) for fn in sorted(os.listdir(stagingDir))]
+                return True
+            lines = [line for line in output.splitlines() if len(line.strip()) > 0]
+            job.message = lines[-1] if len(lines) > 0 else "exit code {0}".format(result.returncode)
+            return False
+        except OSError as e:
+            job.message = str(e)
+            return False
+        finally:
+            shutil.rmtree(stagingDir, ignore_errors=True)
+
+    def runJob(self, job: ConvertJob):
+        starttime = datetime.now()
+        job.status = "running"
+        if not os.path.exists(job.outputDir):
+            os.makedirs(job.outputDir)
+        while job.attempts <= self.retries:
+            job.attempts += 1
+            self.log("[job {0}] {1}: attempt {2}...".format(job.index + 1, job.name, job.attempts))
+            if self.runAttempt(job):
+                job.status = "ok"
+                break
+            job.status = "failed"
+            self.log("[job {0}] {1}: failed ({2})".format(job.index + 1, job.name, job.message))
+        job.elapsedSecs = (datetime.now() - starttime).total_seconds()
+        self.log("[job {0}] {1}: {2} in {3:.1f} secs".format(job.index + 1, job.name, job.status, job.elapsedSecs))
+        return job
+
+    # return number of failed jobs
+    def run(self, jobs: List[ConvertJob]):
+        if self.logDir is not None and not os.path.exists(self.logDir):
+            os.makedirs(self.logDir)
+        with ThreadPoolExecutor(max_workers=self.numWorkers) as executor:
+            list(executor.map(self.runJob, jobs))
+        return len([job for job in jobs if job.status != "ok"])
+
+    def printSummary(self, jobs: List[ConvertJob]):
+        print("Summary:")
+        print("{0:>5}  {1:<30} {2:<7} {3:>8} {4:>10} {5:>7}".format("job", "name", "status", "attempts", "secs", "files"))
+        for job in jobs:
+            print("{0:>5}  {1:<30} {2:<7} {3:>8} {4:>10.1f} {5:>7}".format(job.index + 1, job.name[:30], job.status, job.attempts,
+                                                                         job.elapsedSecs, len(job.outputFiles)))
+            if job.status != "ok":
+                print("       {0}".format(job.message))
+        numFailed = len([job for job in jobs if job.status != "ok"])
+        totalFiles = sum([len(job.outputFiles) for job in jobs])
+        print("{0} jobs: {1} ok, {2} failed, {3} output files".format(len(jobs), len(jobs) - numFailed, numFailed, totalFiles))
@@ -0,0 +1,122 @@
+"""
+MIT License
+
+Copyright (c) 2019 UCSF Hu Lab
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+from .job_list import ConvertJob
+from typing import Callable
+
+REQUEST_EXT = ".json"
+PROCESSING_EXT = ".processing"
+RESULT_EXT = ".result"
+STOP_FILENAME = "stop"
+
+
+class SpoolService:
+    """
+    Process conversion requests dropped in a spool directory, without starting a new process
+    for each request.  A request is a .json file with the keys of a job list entry (file or
+    dir, output_dir, id1-id5, stime, etime), which should be written with another extension
+    and renamed to .json when complete.  A request is claimed by renaming it to .processing
+    (so several services can share a spool directory), and the reply is written to
+    <request>.result (JSON with status, message, output_files and elapsed_secs).
+    Create a file named "stop" (or send {"command": "stop"}) to stop the service.
+    """
+    spoolDir = ""
+    handler = None
+    pollInterval = 1.0
+
+    def __init__(self, spoolDir: str, handler: Callable, pollInterval: float = 1.0):
+        self.spoolDir = spoolDir
+        self.handler = handler
+        self.pollInterval = pollInterval
+        self.numRequests = 0
+        self.stopped = False
+
+    def claimNextRequest(self):
+        requests = sorted([fn for fn in os.listdir(self.spoolDir) if fn.endswith(REQUEST_EXT)])
+        for fn in requests:
+            processingFn = os.path.join(self.spoolDir, fn[:-len(REQUEST_EXT)] + PROCESSING_EXT)
+            try:
+                os.rename(os.path.join(self.spoolDir, fn), processingFn)
+            except OSError:
+                # claimed by another service
+                continue
+            return processingFn
+        return None
+
+    def writeResult(self, processingFn: str, result: dict):
+        resultFn = processingFn[:-len(PROCESSING_EXT)] + RESULT_EXT
+        tempFn = resultFn + ".tmp"
+        with open(tempFn, "w") as f:
+            json.dump(result, f, indent=2)
+        os.replace(tempFn, resultFn)
+        os.remove(processingFn)
+
+    def processRequest(self, processingFn: str):
+        name = Path(processingFn).stem
+        starttime = datetime.now()
+        result = {"request": name, "status": "failed", "message": "", "output_files": []}
+        try:
+            with open(processingFn, "r") as f:
+                d = json.load(f)
+            if d.get("command") == "stop":
+                self.stopped = True
+                result["status"] = "ok"
+                result["message"] = "stopped"
+            else:
+                job = ConvertJob(self.numRequests, d)
+                job.name = name
+                job.validate()
+                print("[{0}] processing request...".format(name), flush=True)
+                result["output_files"] = self.handler(job)
+                result["status"] = "ok"
+        except KeyboardInterrupt:
+            raise
+        except BaseException as e:
+            # XmlConverterError is derived from BaseException
+            result["message"] = "{0}: {1}".format(type(e).__name__, e)
+        result["elapsed_secs"] = (datetime.now() - starttime).total_seconds()
+        self.numRequests += 1
+        self.writeResult(processingFn, result)
+        print("[{0}] {1} {2}".format(name, result["status"], result["message"]), flush=True)
+        return result
+
+    def run(self):
+        print("Waiting for requests in {0} (create file \"{1}\" to stop)...".format(self.spoolDir, STOP_FILENAME), flush=True)
+        stopFn = os.path.join(self.spoolDir, STOP_FILENAME)
+        while not self.stopped:
+            if os.path.exists(stopFn):
+                os.remove(stopFn)
+                break
+            processingFn = self.claimNextRequest()
+            if processingFn is not None:
+                self.processRequest(processingFn)
+            else:
+                time.sleep(self.pollInterval)
+        print("Stopped after {0} requests.".format(self.numRequests))
+        return self.numRequests
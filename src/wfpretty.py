@@ -1,7 +1,9 @@
 import argparse
-from bs4 import BeautifulSoup
+from xmlconvert.xml_pretty import XmlPrettyWriter
+from xmlconvert.time_window import TimeWindow
+from myutil import parsetime
 
-g_version = "0.1"
+g_version = "0.2"
 g_exename = "wfpretty"
 
 
@@ -9,17 +11,30 @@ def getArgs():
     parser = argparse.ArgumentParser()
     parser.add_argument("-f", "--filename", help="Input Filename", required=True)
     parser.add_argument("-o", "--output", help="Output Filename", required=True)
+    parser.add_argument("-n", "--max_segments", help="Only output the first N segments (measurements or Segment elements)")
+    parser.add_argument("-w", "--max_wave_len", help="Truncate wave data (Wave or WaveformData) to N characters")
+    parser.add_argument("-s", "--start_segment", help="Start from segment N (0 based), using the index of segments (.segidx) of the file")
+    parser.add_argument("--stime", help="Only output segments from this time, format: \"1/1/2019 8:00:00 AM\" (using the index of segments)")
+    parser.add_argument("--etime", help="Only output segments before this time, format: \"1/1/2019 12:00:00 PM\" (using the index of segments)")
     return parser.parse_args()
 
 
-def runApp(fn, outputFn):
-    with open(fn, "r") as f:
-        soup = BeautifulSoup(f, "xml")
-        g = open(outputFn, "w")
-        g.write(soup.prettify(encoding="utf-8").decode("utf-8"))
-        g.close()
+def runApp(fn, outputFn, maxSegments, maxWaveLen, startSegment, timeWindow):
+    writer = XmlPrettyWriter(maxSegments=maxSegments, maxWaveLen=maxWaveLen)
+    if (startSegment > 0) or (timeWindow is not None):
+        numSegments = writer.prettifySegments(fn, outputFn, startSegment, timeWindow)
+    else:
+        numSegments = writer.prettify(fn, outputFn)
+    print("Number of segments written = {0}".format(numSegments))
 
 print("{0} v{1} - Copyright(c) HuLab@UCSF 2019".format(g_exename, g_version))
 args = getArgs()
-runApp(args.filename, args.output)
+maxSegments = int(args.max_segments) if args.max_segments is not None else -1
+maxWaveLen = int(args.max_wave_len) if args.max_wave_len is not None else -1
+startSegment = int(args.start_segment) if args.start_segment is not None else 0
+timeWindow = None
+if (args.stime is not None) or (args.etime is not None):
+    timeWindow = TimeWindow(parsetime(args.stime) if args.stime is not None else None,
+                            parsetime(args.etime) if args.etime is not None else None)
+runApp(args.filename, args.output, maxSegments, maxWaveLen, startSegment, timeWindow)
 print("done.")
@@ -28,18 +28,20 @@ import re
 import yaml
 import argparse
 from datetime import datetime
+from datetime import timedelta
 from pathlib import Path
 from array import array
 from binfilepy import BinFile
 import binfilepy
-import matplotlib.pyplot as plt
-import numpy as np
-# to fix error in pyinstaller, we need to import additional types for numpy
-import numpy.core._dtype_ctypes
 from typing import Any
 from typing import List
 
-g_version = "0.1"
+# numpy and matplotlib are imported only when plotting (see importPlotModules),
+# so that -h and --show_header_only start fast
+np = None
+plt = None
+
+g_version = "0.2"
 g_exename = "wfshow"
 default_config_fn = "{0}_config.yaml".format(g_exename)
 
@@ -52,21 +54,34 @@ def getArgs():
     parser.add_argument("--size", help="Size of the graph in pixels (e.g. 1024x768)")
     parser.add_argument("--num_samples", help="Use number of samples as unit for offset and length (instead of # of seconds)", action="store_true")
     parser.add_argument("--show_header_only", help="Show header info only without plotting graphs", action="store_true")
+    parser.add_argument("-i", "--interactive", help="Page through the file with keyboard (left/right, pageup/pagedown, home/end) or mouse scroll",
+                        action="store_true")
+    parser.add_argument("--cache_blocks", help="Max number of decoded blocks kept in memory in interactive mode (default: 32)")
     return parser.parse_args()
 
 
-def findMinMaxStep(arr: np.ndarray):
+def importPlotModules():
+    global np, plt
+    import numpy as np
+    # to fix error in pyinstaller, we need to import additional types for numpy
+    import numpy.core._dtype_ctypes
+    import matplotlib.pyplot as plt
+
+
+def findMinMaxStep(arr: Any):
     # Try to Auto-fit the curve in the min/max range
     min_thres = -1000
     max_thres = 1000
-    n = len(arr)
+    arr = np.asarray(arr)
     _min = binfilepy.constant.MAX_DOUBLE_VALUE
     _max = binfilepy.constant.MIN_DOUBLE_VALUE
-    for i in range(0, n):
-        if (arr[i] < _min) and (arr[i] >= min_thres):
-            _min = arr[i]
-        if (arr[i] > _max) and (arr[i] <= max_thres):
-            _max = arr[i]
+    # NaN (gap) never passes the comparisons below
+    inRange = arr[arr >= min_thres]
+    if len(inRange) > 0:
+        _min = min(_min, inRange.min())
+    inRange = arr[arr <= max_thres]
+    if len(inRange) > 0:
+        _max = max(_max, inRange.max())
     if _min == binfilepy.constant.MAX_DOUBLE_VALUE:  # never assigned
         _min = min_thres
     if _min < min_thres:
@@ -114,6 +129,88 @@ def plotChannels(fp: str, f: BinFile, data: List[array], width: int, height: int
     return
 
 
+class PagingViewer:
+    """
+    Interactive viewer that pages through a file one window at a time.  Windows are
+    read lazily through a BlockCache, and the neighboring windows are prefetched in
+    background so that paging stays smooth on large files.
+    """
+    pageKeys = {"right": 1.0, "left": -1.0, "pagedown": 10.0, "pageup": -10.0}
+
+    def __init__(self, fp: str, reader: Any, offset: int, length: int, width: int, height: int, cacheBlocks: int):
+        from wfio.block_cache import BlockCache
+        self.filename = Path(fp).name
+        self.reader = reader
+        self.length = max(int(length), 1)
+        self.offset = 0
+        self.width = width
+        self.height = height
+        # one window spans at most 2 blocks, keep at least the current window and both neighbors
+        self.cache = BlockCache(reader, self.length, max(cacheBlocks, 6))
+        self.fig = None
+        self.axs = []
+        self.lines = []
+        self.moveTo(offset, redraw=False)
+
+    def show(self):
+        numChannels = self.reader.numChannels
+        if (self.width <= 0) or (self.height <= 0):
+            self.fig, axs = plt.subplots(numChannels, 1, sharex=True, squeeze=False)
+        else:
+            self.fig, axs = plt.subplots(numChannels, 1, sharex=True, squeeze=False, figsize=(self.width / 100.0, self.height / 100.0), dpi=100)
+        self.axs = axs[:, 0]
+        # Remove horizontal space between axes
+        self.fig.subplots_adjust(hspace=0)
+        self.lines = []
+        for i in range(0, numChannels):
+            line, = self.axs[i].plot([], [])
+            self.lines.append(line)
+            self.axs[i].set_ylabel(self.reader.channels[i].Title)
+        self.axs[-1].set_xlabel("seconds")
+        self.fig.canvas.mpl_connect("key_press_event", self.onKey)
+        self.fig.canvas.mpl_connect("scroll_event", self.onScroll)
+        self.redraw()
+        print("Use left/right (1 page), pageup/pagedown (10 pages), home/end or mouse scroll to navigate.")
+        plt.show()
+        self.cache.close()
+
+    def onKey(self, event: Any):
+        if event.key in self.pageKeys:
+            self.moveTo(self.offset + int(self.pageKeys[event.key] * self.length))
+        elif event.key == "home":
+            self.moveTo(0)
+        elif event.key == "end":
+            self.moveTo(self.reader.numSamples - self.length)
+
+    def onScroll(self, event: Any):
+        step = max(self.length // 2, 1)
+        self.moveTo(self.offset - step if event.button == "up" else self.offset + step)
+
+    def moveTo(self, offset: int, redraw: bool = True):
+        offset = min(max(int(offset), 0), max(self.reader.numSamples - self.length, 0))
+        self.offset = offset
+        if redraw:
+            self.redraw()
+        # decode neighboring windows ahead of time
+        self.cache.prefetch(offset + self.length, self.length)
+        self.cache.prefetch(offset - self.length, self.length)
+
+    def redraw(self):
+        data = self.cache.getWindow(self.offset, self.length)
+        fs = self.reader.samplesPerSec
+        t = (self.offset + np.arange(0, data.shape[1])) / fs
+        for i in range(0, len(self.lines)):
+            self.lines[i].set_data(t, data[i])
+            _min, _max, _step = findMinMaxStep(data[i])
+            self.axs[i].set_yticks(np.arange(_min, _max, _step))
+            self.axs[i].set_ylim(_min, _max)
+        if len(t) > 0:
+            self.axs[-1].set_xlim(t[0], t[0] + self.length / fs)
+        windowDt = self.reader.startDt + timedelta(seconds=self.offset / fs)
+        self.fig.suptitle("{0} - {1}".format(self.filename, windowDt.strftime("%Y/%m/%d %H:%M:%S")))
+        self.fig.canvas.draw_idle()
+
+
 def printHeaderInfo(f: BinFile):
     print("Binary file info:")
     dt = datetime.strptime("{0}/{1}/{2} {3}:{4}:{5:.0f}".format(f.header.Year, f.header.Month, f.header.Day, f.header.Hour, f.header.Minute, f.header.Second), "%Y/%m/%d %H:%M:%S")
@@ -132,16 +229,33 @@ def printHeaderInfo(f: BinFile):
         print("    - RangeHigh: {0}".format(c.RangeHigh))
 
 
-def runApp(fn, offset, length, width, height, useNumSamples, showHeaderOnly):
+def runInteractive(fn, offset, length, width, height, useNumSamples, cacheBlocks):
+    from wfio.bin_reader import BinReader
+    with BinReader(fn) as reader:
+        if (reader.numSamples == 0) or (reader.numChannels == 0):
+            print("No samples to show.")
+            return
+        fs = reader.samplesPerSec
+        offsetSampleNum = int(offset) if useNumSamples else int(offset * fs)
+        lengthSampleNum = int(length) if useNumSamples else int(length * fs)
+        viewer = PagingViewer(fn, reader, offsetSampleNum, lengthSampleNum, width, height, cacheBlocks)
+        viewer.show()
+
+
+def runApp(fn, offset, length, width, height, useNumSamples, showHeaderOnly, interactive, cacheBlocks):
     with BinFile(fn, "r") as f:
         f.readHeader()
         printHeaderInfo(f)
         if not showHeaderOnly:
+            importPlotModules()
+        if (not showHeaderOnly) and (not interactive):
             data = f.readChannelData(offset, length, useSecForOffset=not useNumSamples, useSecForLength=not useNumSamples)
             if (data is not None) and (len(data) > 0):
                 numSamples = len(data[0])
                 if numSamples > 0:
                     plotChannels(fn, f, data, width, height)
+    if (not showHeaderOnly) and interactive:
+        runInteractive(fn, offset, length, width, height, useNumSamples, cacheBlocks)
     return
 
 print("{0} v{1} - Copyright(c) HuLab@UCSF 2019".format(g_exename, g_version))
@@ -156,5 +270,6 @@ if args.size is not None:
     else:
         print("--size argument must be in the form of 'WxH', like 680x480 !!")
         valid = False
-runApp(args.file, float(args.start), float(args.length), width, height, args.num_samples, args.show_header_only)
+cacheBlocks = int(args.cache_blocks) if args.cache_blocks is not None else 32
+runApp(args.file, float(args.start), float(args.length), width, height, args.num_samples, args.show_header_only, args.interactive, cacheBlocks)
 print("done.")
@@ -22,8 +22,31 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-from .xmlconverter import WaveHeader
-from .xmlconverter import WaveChannel
-from .xmlconverter_for_ge import XmlConverterForGE
-from .xmlconverter_for_bedmaster import XmlConverterForBedMaster
-from .xml2bin_state import Xml2BinState
+import importlib
+
+# submodule of each name; submodules are imported on first use (PEP 562), so that e.g.
+# wfpretty does not import the converters (and numpy)
+LAZY_NAMES = {
+    "WaveHeader": "xmlconverter",
+    "WaveChannel": "xmlconverter",
+    "XmlConverter": "xmlconverter",
+    "XmlConverterForGE": "xmlconverter_for_ge",
+    "XmlConverterForBedMaster": "xmlconverter_for_bedmaster",
+    "Xml2BinState": "xml2bin_state",
+    "XmlPrettyWriter": "xml_pretty",
+    "SegmentIndex": "segment_index",
+    "getSegmentIndex": "segment_index",
+}
+__all__ = list(LAZY_NAMES.keys())
+
+
+def __getattr__(name: str):
+    if name in LAZY_NAMES:
+        value = getattr(importlib.import_module("." + LAZY_NAMES[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError("module {0!r} has no attribute {1!r}".format(__name__, name))
+
+
+def __dir__():
+    return sorted(list(globals().keys()) + __all__)
@@ -0,0 +1,120 @@
+"""
+MIT License
+
+Copyright (c) 2019 UCSF Hu Lab
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import sys
+
+
+# bounds of the change of the batch from one batch to the next (e.g. one odd batch should not
+# change the batch size 100 times)
+MAX_GROWTH_FACTOR = 2.0
+MAX_SHRINK_FACTOR = 0.25
+
+
+# peak resident memory of this process (in bytes) so far, None if not available
+def getPeakMemoryBytes():
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD), ("PeakWorkingSetSize", ctypes.c_size_t),
+                        ("WorkingSetSize", ctypes.c_size_t), ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPagedPoolUsage", ctypes.c_size_t), ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaNonPagedPoolUsage", ctypes.c_size_t), ("PagefileUsage", ctypes.c_size_t),
+                        ("PeakPagefileUsage", ctypes.c_size_t)]
+        try:
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            process = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+                return int(counters.PeakWorkingSetSize)
+        except (AttributeError, OSError):
+            pass
+        return None
+    try:
+        import resource
+    except ImportError:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return int(maxrss) if sys.platform == "darwin" else int(maxrss) * 1024
+
+
+class AdaptiveBatchController:
+    """
+    Size of the next batch (number of segments, or seconds of the time window) extracted by StpToolkit.
+    After each batch, the size of the temp XML, its conversion time and the peak memory of the process
+    are given to update(), and the next batch is scaled toward the targets (the most limiting one),
+    within [minValue, maxValue].
+    """
+    value = 0.0
+    minValue = 0.0
+    maxValue = 0.0
+    targetBytes = None
+    targetSecs = None
+    maxMemoryBytes = None
+    lastPeakMemoryBytes = 0
+    numBatches = 0
+
+    def __init__(self, value: float, minValue: float, maxValue: float, targetBytes: int = None, targetSecs: float = None,
+                 maxMemoryBytes: int = None):
+        self.minValue = minValue
+        self.maxValue = max(minValue, maxValue)
+        self.value = min(max(value, self.minValue), self.maxValue)
+        self.targetBytes = targetBytes if (targetBytes is not None) and (targetBytes > 0) else None
+        self.targetSecs = targetSecs if (targetSecs is not None) and (targetSecs > 0) else None
+        self.maxMemoryBytes = maxMemoryBytes if (maxMemoryBytes is not None) and (maxMemoryBytes > 0) else None
+        self.lastPeakMemoryBytes = 0
+        self.numBatches = 0
+
+    def __str__(self):
+        targets = []
+        if self.targetBytes is not None:
+            targets.append("{0:.0f} MB".format(self.targetBytes / 1024 / 1024))
+        if self.targetSecs is not None:
+            targets.append("{0:.0f} secs".format(self.targetSecs))
+        if self.maxMemoryBytes is not None:
+            targets.append("memory < {0:.0f} MB".format(self.maxMemoryBytes / 1024 / 1024))
+        return "{0:g} in [{1:g}, {2:g}], target: {3}".format(self.value, self.minValue, self.maxValue, ", ".join(targets) if len(targets) > 0 else "none")
+
+    # factor by which the last batch could have been larger (> 1) or should have been smaller (< 1)
+    def getScale(self, xmlBytes: int, elapsedSecs: float, peakMemoryBytes: int = None):
+        scale = MAX_GROWTH_FACTOR
+        if (self.targetBytes is not None) and (xmlBytes > 0):
+            scale = min(scale, self.targetBytes / xmlBytes)
+        if (self.targetSecs is not None) and (elapsedSecs > 0):
+            scale = min(scale, self.targetSecs / elapsedSecs)
+        # the peak memory of the process only grows and is not proportional to the batch: over the limit,
+        # shrink if this batch raised the peak, otherwise do not grow
+        if (self.maxMemoryBytes is not None) and (peakMemoryBytes is not None) and (peakMemoryBytes > self.maxMemoryBytes):
+            scale = min(scale, 0.5 if (peakMemoryBytes > self.lastPeakMemoryBytes) else 1.0)
+        return min(max(scale, MAX_SHRINK_FACTOR), MAX_GROWTH_FACTOR)
+
+    # xmlBytes = 0 for an empty batch (e.g. no data in the time window), which grows the next one
+    def update(self, xmlBytes: int, elapsedSecs: float, peakMemoryBytes: int = None):
+        self.numBatches += 1
+        self.value = min(max(self.value * self.getScale(xmlBytes, elapsedSecs, peakMemoryBytes), self.minValue), self.maxValue)
+        if peakMemoryBytes is not None:
+            self.lastPeakMemoryBytes = max(self.lastPeakMemoryBytes, peakMemoryBytes)
+        return self.value
@@ -0,0 +1,125 @@
+"""
+MIT License
+
+Copyright (c) 2019 UCSF Hu Lab
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import threading
+import subprocess
+
+# stream_output modes of the stp flow: "" (temp XML files), "fifo" (named pipe) or "stdout"
+STREAM_OUTPUT_MODES = ["", "fifo", "stdout"]
+# output filename given to the external command to write to stdout
+STDOUT_OUTPUT_FN = "-"
+
+
+class ExtStreamError(BaseException):
+    def __init__(self, message):
+        self.message = message
+
+
+# return True if output of mode can be streamed on this platform
+def canStreamOutput(mode: str):
+    if mode == "fifo":
+        return hasattr(os, "mkfifo")
+    return mode == "stdout"
+
+
+class ExtOutputStream:
+    """
+    read only (binary) file object of the output of an external command (e.g. StpToolkit), written to a named pipe
+    (fifoFn) or to its stdout (fifoFn is None), and read while the command is running.
+    start() runs the command and waits for its first output, it returns False if the command ended without output.
+    """
+    cmd = ""
+    fifoFn = None
+    name = ""
+    numBytes = 0
+    returncode = None
+
+    def __init__(self, cmd: str, fifoFn: str = None):
+        self.cmd = cmd
+        self.fifoFn = fifoFn
+        self.name = fifoFn if fifoFn is not None else "stdout"
+        self.numBytes = 0
+        self.returncode = None
+        self.proc = None
+        self.f = None
+        self.buf = b""
+
+    def start(self):
+        if self.fifoFn is None:
+            self.proc = subprocess.Popen(self.cmd, shell=True, stdout=subprocess.PIPE)
+            self.f = self.proc.stdout
+        else:
+            try:
+                os.mkfifo(self.fifoFn)
+            except (AttributeError, OSError) as e:
+                raise ExtStreamError("Cannot create named pipe {0}: {1}".format(self.fifoFn, e))
+            self.proc = subprocess.Popen(self.cmd, shell=True)
+            # the read end is opened without waiting for the command, and a write end is kept open (until the command
+            # ends) so that reading does not see the end of file before the command opens the pipe (or if it never does)
+            fd = os.open(self.fifoFn, os.O_RDONLY | os.O_NONBLOCK)
+            writeFd = os.open(self.fifoFn, os.O_WRONLY)
+            os.set_blocking(fd, True)
+            self.f = os.fdopen(fd, "rb")
+            threading.Thread(target=self.closeWhenDone, args=(writeFd,), daemon=True).start()
+        self.buf = self.f.read1(64 * 1024) if hasattr(self.f, "read1") else self.f.read(64 * 1024)
+        self.numBytes = len(self.buf)
+        return self.numBytes > 0
+
+    def closeWhenDone(self, writeFd: int):
+        self.proc.wait()
+        os.close(writeFd)
+
+    def read(self, size: int = -1):
+        if len(self.buf) > 0:
+            data = self.buf if (size < 0) or (size >= len(self.buf)) else self.buf[:size]
+            self.buf = self.buf[len(data):]
+            return data
+        data = self.f.read(size)
+        self.numBytes += len(data)
+        return data
+
+    # close the stream (after the command ends) and return the exit code of the command
+    def close(self):
+        if self.f is not None:
+            # read the rest, so that the command is not blocked writing
+            while len(self.f.read(64 * 1024)) > 0:
+                pass
+            self.f.close()
+            self.f = None
+        if self.proc is not None:
+            self.returncode = self.proc.wait()
+            self.proc = None
+        if (self.fifoFn is not None) and os.path.exists(self.fifoFn):
+            os.remove(self.fifoFn)
+        return self.returncode
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # stop the command if the output could not be converted
+        if (exc_type is not None) and (self.proc is not None):
+            self.proc.kill()
+        self.close()
@@ -62,3 +62,42 @@ def fixsamplingarr(arr: array, samplesPerSec: float, targetSamplesPerSec: float)
     '''
     new_y = np.interp(new_x, x, y)
     return array('h', new_y.astype(int).tolist())
+
+
+# positions (np.arange(0, numSamples, step) as in fixsamplingarr) split into the index of sample
+# before each position, the index of sample after it and the fraction, by (numSamples, samplesPerSec, targetSamplesPerSec)
+interpIndexCache = {}
+MAX_INTERP_INDEX_CACHE = 64
+
+
+def getInterpIndex(numSamples: int, samplesPerSec: float, targetSamplesPerSec: float):
+    key = (numSamples, samplesPerSec, targetSamplesPerSec)
+    interpIndex = interpIndexCache.get(key)
+    if interpIndex is None:
+        new_x = np.arange(0, numSamples, samplesPerSec / targetSamplesPerSec)
+        i0 = np.minimum(np.floor(new_x).astype(np.intp), numSamples - 1)
+        i1 = np.minimum(i0 + 1, numSamples - 1)
+        interpIndex = (i0, i1, new_x - i0)
+        if len(interpIndexCache) >= MAX_INTERP_INDEX_CACHE:
+            interpIndexCache.clear()
+        interpIndexCache[key] = interpIndex
+    return interpIndex
+
+
+def fixsamplingblock(block: np.ndarray, samplesPerSec: float, targetSamplesPerSec: float, out: np.ndarray = None):
+    """
+    resample all rows (channels) of block (numChannels x numSamples) at once, the result is the same as
+    fixsamplingarr for each row.  Write to out (numChannels x at least the new number of samples) if given,
+    return the resampled rows
+    """
+    numSamples = block.shape[1]
+    if numSamples == 0:
+        return block[:, :0] if out is None else out[:, :0]
+    i0, i1, frac = getInterpIndex(numSamples, samplesPerSec, targetSamplesPerSec)
+    y0 = block[:, i0].astype(np.float64)
+    # same arithmetic as np.interp with xp = 0, 1, 2...: slope * (x - xp[j]) + fp[j]
+    new_y = (block[:, i1] - y0) * frac + y0
+    if out is None:
+        return new_y.astype(int).astype(np.int16)
+    out[:, :len(i0)] = new_y.astype(int)
+    return out[:, :len(i0)]
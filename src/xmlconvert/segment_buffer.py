@@ -0,0 +1,169 @@
+"""
+MIT License
+
+Copyright (c) 2019 UCSF Hu Lab
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import numpy as np
+# to fix error in pyinstaller, we need to import additional types for numpy
+import numpy.core._dtype_ctypes
+from binfilepy import constant
+from .fixsampling import fixsamplingblock
+from typing import List
+from typing import Any
+
+
+class ChannelMeta:
+    """
+    settings of a channel in a segment (from the XML), numSamples is the number of samples in SegmentBuffer
+    """
+    __slots__ = ("label", "hz", "points", "pointsBytes", "min", "max", "offset", "gain", "uom", "numSamples")
+
+    def __init__(self):
+        self.clear("", 0)
+
+    def clear(self, label: str, hz: float):
+        self.label = label
+        self.hz = hz
+        self.points = 0
+        self.pointsBytes = 0
+        self.min = 0
+        self.max = 0
+        self.offset = 0
+        self.gain = 0
+        self.uom = ""
+        self.numSamples = 0
+
+
+class SegmentBuffer:
+    """
+    int16 samples (numChannels x numSamples) of the channels of a segment.  The buffers and ChannelMeta
+    objects are reused (and only grow) from segment to segment.
+    """
+    numChannels = 0
+    channels = []
+    data = None
+    raw = None
+
+    def __init__(self, maxChannels: int = 16, maxSamples: int = 4096):
+        self.numChannels = 0
+        self.channels = [ChannelMeta() for i in range(maxChannels)]
+        # samples after resampling (written to output file)
+        self.data = np.empty((maxChannels, maxSamples), dtype=np.int16)
+        # samples as decoded
+        self.raw = np.empty((maxChannels, maxSamples), dtype=np.int16)
+
+    def clear(self):
+        self.numChannels = 0
+
+    def reserve(self, numChannels: int, numSamples: int):
+        maxChannels, maxSamples = self.data.shape
+        if (numChannels <= maxChannels) and (numSamples <= maxSamples):
+            return
+        maxChannels = max(numChannels, maxChannels)
+        maxSamples = max(numSamples, maxSamples)
+        data = np.empty((maxChannels, maxSamples), dtype=np.int16)
+        raw = np.empty((maxChannels, maxSamples), dtype=np.int16)
+        data[:self.data.shape[0], :self.data.shape[1]] = self.data
+        raw[:self.raw.shape[0], :self.raw.shape[1]] = self.raw
+        self.data = data
+        self.raw = raw
+        while len(self.channels) < maxChannels:
+            self.channels.append(ChannelMeta())
+
+    def addChannel(self, label: str, hz: float, wavedata: Any):
+        """
+        add a channel with its decoded samples, return its ChannelMeta (to be filled in by the caller)
+        """
+        self.reserve(self.numChannels + 1, len(wavedata))
+        meta = self.channels[self.numChannels]
+        meta.clear(label, hz)
+        meta.numSamples = len(wavedata)
+        self.raw[self.numChannels, :len(wavedata)] = wavedata
+        self.numChannels += 1
+        return meta
+
+    def resample(self, targetSamplesPerSec: float):
+        """
+        resample the channels to targetSamplesPerSec, the channels of the same rate and length at once
+        """
+        groups = {}
+        for i in range(self.numChannels):
+            meta = self.channels[i]
+            if meta.hz == targetSamplesPerSec:
+                self.data[i, :meta.numSamples] = self.raw[i, :meta.numSamples]
+            else:
+                groups.setdefault((meta.hz, meta.numSamples), []).append(i)
+        for (hz, numSamples), rows in groups.items():
+            newNumSamples = len(np.arange(0, numSamples, hz / targetSamplesPerSec)) if numSamples > 0 else 0
+            self.reserve(self.numChannels, newNumSamples)
+            if len(rows) == rows[-1] - rows[0] + 1:
+                fixsamplingblock(self.raw[rows[0]:rows[-1] + 1, :numSamples], hz, targetSamplesPerSec,
+                                 self.data[rows[0]:rows[-1] + 1])
+            else:
+                self.data[rows, :newNumSamples] = fixsamplingblock(self.raw[rows, :numSamples], hz, targetSamplesPerSec)
+            for i in rows:
+                self.channels[i].numSamples = newNumSamples
+
+    @property
+    def labels(self):
+        return [self.channels[i].label for i in range(self.numChannels)]
+
+    @property
+    def maxNumSamples(self):
+        return max([self.channels[i].numSamples for i in range(self.numChannels)]) if self.numChannels > 0 else 0
+
+    def getChannelData(self):
+        """
+        return the samples of each channel (views of the buffer, valid until the next segment)
+        """
+        return [self.data[i, :self.channels[i].numSamples] for i in range(self.numChannels)]
+
+    def fitChannels(self, labels: List[str]):
+        """
+        reorder the channels as labels (the channels of output file), with the channels absent from the segment
+        filled with the gap value.  Return False (unchanged) if the segment has a channel not in labels
+        """
+        label2Row = {}
+        for i in range(self.numChannels):
+            if self.channels[i].label not in labels:
+                return False
+            label2Row[self.channels[i].label] = i
+        numSamples = self.maxNumSamples
+        self.reserve(len(labels), numSamples)
+        rows = [label2Row.get(label, -1) for label in labels]
+        presentRows = [i for i, row in enumerate(rows) if row >= 0]
+        self.data[presentRows] = self.data[[rows[i] for i in presentRows]]
+        # reuse the ChannelMeta objects not used by the segment for the absent channels
+        unusedMetas = self.channels[self.numChannels:]
+        channels = []
+        for i, row in enumerate(rows):
+            if row >= 0:
+                channels.append(self.channels[row])
+            else:
+                meta = unusedMetas.pop(0)
+                meta.clear(labels[i], 0)
+                meta.numSamples = numSamples
+                self.data[i, :numSamples] = constant.MIN_SHORT_VALUE
+                channels.append(meta)
+        self.channels = channels + unusedMetas
+        self.numChannels = len(labels)
+        return True
@@ -0,0 +1,378 @@
+"""
+MIT License
+
+Copyright (c) 2019 UCSF Hu Lab
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import re
+import io
+import json
+import mmap
+import datetime
+import xml.etree.ElementTree as ET
+from .time_window import TimeWindow
+from .time_window import SEGMENT_TIME_PATTERN
+from .time_window import PRESCAN_LAST_SEGMENT_SECS
+from .time_window import parseSegmentTime
+from .xml_input import isCompressedXmlFn
+from .xml_input import openXmlInput
+from typing import List
+
+SEGMENT_INDEX_EXT = ".segidx"
+SEGMENT_INDEX_VERSION = 1
+# segments parsed at once (in one small document) when reading segments from the index
+SEGMENTS_PER_DOCUMENT = 64
+
+# tags of the repeating blocks in GE (cpcArchive) and BedMaster (BedMasterEx) XML files, elements (other than segments)
+# needed to convert them, and elements enclosing the segments
+SEGMENT_TAGS = [b"measurements", b"Segment"]
+INDEXED_TAGS = [b"FileInfo"]
+CONTEXT_TAGS = [b"cpc", b"device"]
+TAG_PATTERN = re.compile(rb"<(measurements|Segment|FileInfo|cpc|device)[\s/>]")
+ROOT_PATTERN = re.compile(rb"<([A-Za-z_][\w.:-]*)[^>]*>")
+# channel labels of GE (mg name) and BedMaster (WaveformData Label)
+LABEL_PATTERN = re.compile(rb'<mg name="([^"]*)"|<WaveformData [^>]*Label="([^"]*)"')
+
+
+class SegmentIndexError(BaseException):
+    def __init__(self, message):
+        self.message = message
+
+
+class SegmentIndexEntry:
+    """
+    byte range [offset, offset + length) of an element in the XML file, with the time and channel labels of segments.
+    context is the index of the open tags enclosing the element (e.g. cpc and device of GE measurements) in the
+    contexts of the index, -1 if none
+    """
+    __slots__ = ["tag", "offset", "length", "time", "context", "labels"]
+
+    def __init__(self, tag: str, offset: int, length: int, time: datetime.datetime = None, context: int = -1,
+                 labels: List[str] = None):
+        self.tag = tag
+        self.offset = offset
+        self.length = length
+        self.time = time
+        self.context = context
+        self.labels = labels if labels is not None else []
+
+    def isSegment(self):
+        return self.tag.encode("ascii") in SEGMENT_TAGS
+
+
+class SegmentIndex:
+    """
+    Index of the segments (measurements / Segment elements) of a GE or BedMaster XML file, built by scanning the
+    raw bytes of the file once.  Selected segments are read (with seek) and parsed independently, in small
+    documents with the root element and the enclosing elements of the original file.
+    """
+    fn = ""
+    fileSize = 0
+    fileMtime = 0.0
+    root = ""
+    contexts = []
+    entries = []
+
+    def __init__(self, fn: str = ""):
+        self.fn = fn
+        self.fileSize = 0
+        self.fileMtime = 0.0
+        self.root = ""
+        self.contexts = []
+        self.entries = []
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def numSegments(self):
+        return sum(1 for e in self.entries if e.isSegment())
+
+    def build(self):
+        st = os.stat(self.fn)
+        self.fileSize = st.st_size
+        self.fileMtime = st.st_mtime
+        self.contexts = []
+        self.entries = []
+        if self.fileSize == 0:
+            return self
+        with open(self.fn, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                m = ROOT_PATTERN.search(mm)
+                while (m is not None) and (mm[m.start() + 1:m.start() + 2] in [b"?", b"!"]):
+                    m = ROOT_PATTERN.search(mm, m.end())
+                if m is None:
+                    raise SegmentIndexError("No root element: {0}".format(self.fn))
+                self.root = m.group(0).decode("utf-8")
+                pos = m.end()
+                context = []
+                while True:
+                    m = TAG_PATTERN.search(mm, pos)
+                    if m is None:
+                        break
+                    tag = m.group(1)
+                    start = m.start()
+                    openEnd = mm.find(b">", start) + 1
+                    if openEnd == 0:
+                        break
+                    if tag in CONTEXT_TAGS:
+                        # enclosing element of the following segments, e.g. <cpc ...><device ...>
+                        context = context[:CONTEXT_TAGS.index(tag)] + [mm[start:openEnd].decode("utf-8")]
+                        self.contexts.append("".join(context))
+                        pos = openEnd
+                        continue
+                    if mm[openEnd - 2:openEnd] == b"/>":
+                        end = openEnd
+                    else:
+                        end = mm.find(b"</" + tag + b">", openEnd)
+                        if end < 0:
+                            # truncated file, ignore the last (incomplete) element
+                            break
+                        end += len(tag) + 3
+                    entry = SegmentIndexEntry(tag.decode("ascii"), start, end - start, context=len(self.contexts) - 1)
+                    if tag in SEGMENT_TAGS:
+                        tm = SEGMENT_TIME_PATTERN.search(mm, start, end)
+                        if tm is not None:
+                            entry.time = parseSegmentTime((tm.group(1) or tm.group(2) or tm.group(3)).decode("ascii", "replace"))
+                        if (entry.time is None) and (len(context) > 0):
+                            # use cpc datetime if measurement does not have POLLTIME
+                            tm = SEGMENT_TIME_PATTERN.search(context[0].encode("utf-8"))
+                            if tm is not None:
+                                entry.time = parseSegmentTime((tm.group(1) or tm.group(2) or tm.group(3)).decode("ascii", "replace"))
+                        entry.labels = [(lm.group(1) or lm.group(2)).decode("utf-8") for lm in LABEL_PATTERN.finditer(mm, start, end)]
+                    self.entries.append(entry)
+                    pos = end
+        return self
+
+    def isUpToDate(self):
+        try:
+            st = os.stat(self.fn)
+        except OSError:
+            return False
+        return (st.st_size == self.fileSize) and (st.st_mtime == self.fileMtime)
+
+    def save(self, indexFn: str):
+        entries = []
+        for e in self.entries:
+            entries.append([e.tag, e.offset, e.length, e.time.strftime("%Y-%m-%d %H:%M:%S") if e.time is not None else "",
+                            e.context, ",".join(e.labels)])
+        h = {"version": SEGMENT_INDEX_VERSION, "size": self.fileSize, "mtime": self.fileMtime, "root": self.root,
+             "contexts": self.contexts, "entries": entries}
+        with open(indexFn, "w") as f:
+            json.dump(h, f)
+
+    def load(self, indexFn: str):
+        with open(indexFn, "r") as f:
+            h = json.load(f)
+        if h.get("version") != SEGMENT_INDEX_VERSION:
+            raise SegmentIndexError("Unsupported segment index version: {0}".format(indexFn))
+        self.fileSize = h["size"]
+        self.fileMtime = h["mtime"]
+        self.root = h["root"]
+        self.contexts = h["contexts"]
+        self.entries = []
+        for tag, offset, length, time, context, labels in h["entries"]:
+            time = datetime.datetime.strptime(time, "%Y-%m-%d %H:%M:%S") if len(time) > 0 else None
+            labels = labels.split(",") if len(labels) > 0 else []
+            self.entries.append(SegmentIndexEntry(tag, offset, length, time, context, labels))
+        return self
+
+    # return the entries (segments, and the other elements needed to convert them) to read: segments
+    # startSegment to startSegment + numSegments - 1 (all if numSegments < 0) that may have data in timeWindow
+    def select(self, timeWindow: TimeWindow = None, startSegment: int = 0, numSegments: int = -1):
+        selected = []
+        segmentIndex = 0
+        for e in self.entries:
+            if not e.isSegment():
+                selected.append(e)
+                continue
+            if (segmentIndex >= startSegment) and ((numSegments < 0) or (segmentIndex < startSegment + numSegments)):
+                # the length of segments is not in the index, the converters trim them to the window
+                if (timeWindow is None) or (e.time is None) or timeWindow.overlaps(e.time, PRESCAN_LAST_SEGMENT_SECS):
+                    selected.append(e)
+            segmentIndex += 1
+        return selected
+
+    # return the pieces (bytes) of a document with the root element, and the entries in their enclosing elements
+    def iterDocumentPieces(self, f: io.RawIOBase, entries: List[SegmentIndexEntry]):
+        yield self.root.encode("utf-8")
+        context = -1
+        for e in entries:
+            if e.context != context:
+                yield self.getContextTags(context, True)
+                yield self.getContextTags(e.context)
+                context = e.context
+            f.seek(e.offset)
+            yield f.read(e.length)
+        yield self.getContextTags(context, True)
+        yield closeTags(self.root)
+
+    # open (or close) tags of context
+    def getContextTags(self, context: int, close: bool = False):
+        if context < 0:
+            return b""
+        return closeTags(self.contexts[context]) if close else self.contexts[context].encode("utf-8")
+
+    def readDocument(self, f: io.RawIOBase, entries: List[SegmentIndexEntry]):
+        return b"".join(self.iterDocumentPieces(f, entries))
+
+    # open the entries as a (read only) stream of one XML document
+    def openDocument(self, entries: List[SegmentIndexEntry]):
+        return SegmentDocumentStream(self, entries)
+
+    # yield the root element of documents of SEGMENTS_PER_DOCUMENT entries each, parsed with ElementTree
+    def iterRoots(self, entries: List[SegmentIndexEntry]):
+        with open(self.fn, "rb") as f:
+            for i in range(0, len(entries), SEGMENTS_PER_DOCUMENT):
+                yield ET.fromstring(self.readDocument(f, entries[i:i + SEGMENTS_PER_DOCUMENT]))
+
+
+class SegmentDocumentStream:
+    """
+    file object (read only) of the document of entries of a SegmentIndex, read as needed
+    """
+
+    def __init__(self, index: SegmentIndex, entries: List[SegmentIndexEntry]):
+        self.f = open(index.fn, "rb")
+        self.pieces = index.iterDocumentPieces(self.f, entries)
+        self.buf = b""
+
+    def read(self, size: int = -1):
+        pieces = [self.buf]
+        bufLen = len(self.buf)
+        while (size < 0) or (bufLen < size):
+            piece = next(self.pieces, None)
+            if piece is None:
+                break
+            pieces.append(piece)
+            bufLen += len(piece)
+        buf = b"".join(pieces)
+        if size < 0:
+            size = bufLen
+        data, self.buf = buf[:size], buf[size:]
+        return data
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+# close tags of the open tags in s, e.g. "<cpc a="1"><device>" -> b"</device></cpc>"
+def closeTags(s: str):
+    names = re.findall(r"<([A-Za-z_][\w.:-]*)", s)
+    return "".join("</{0}>".format(name) for name in reversed(names)).encode("utf-8")
+
+
+def getSegmentIndexFn(fn: str):
+    return str(fn) + SEGMENT_INDEX_EXT
+
+
+# return the index of an XML file, from its sidecar (.segidx) if up to date, or built (and saved if save is True)
+def getSegmentIndex(fn: str, save: bool = True):
+    indexFn = getSegmentIndexFn(fn)
+    if os.path.exists(indexFn):
+        try:
+            index = SegmentIndex(fn).load(indexFn)
+            if index.isUpToDate():
+                return index
+        except (OSError, ValueError, KeyError, SegmentIndexError):
+            pass
+    index = SegmentIndex(fn).build()
+    if save:
+        try:
+            index.save(indexFn)
+        except OSError:
+            pass
+    return index
+
+
+# copy of the open element at level of stack (with the open enclosing elements below it), moving the complete
+# children of the open elements to the copy.  A segment still being parsed stays whole in the tree (moved once complete)
+def moveCompleteElements(stack: List[ET.Element], level: int = 0):
+    elem = stack[level]
+    copy = ET.Element(elem.tag, elem.attrib)
+    copy.text = elem.text
+    openChild = stack[level + 1] if level + 1 < len(stack) else None
+    for child in elem:
+        if child is not openChild:
+            copy.append(child)
+        elif child.tag.encode("utf-8") not in SEGMENT_TAGS:
+            copy.append(moveCompleteElements(stack, level + 1))
+    elem[:] = [openChild] if openChild is not None else []
+    return copy
+
+
+# yield the root element of documents of (at least) SEGMENTS_PER_DOCUMENT segments each, parsed incrementally from the stream
+# (e.g. the output of StpToolkit read while it is running), with the root element and the (open) enclosing elements
+# of the stream, like the documents read with the segment index
+def iterStreamRoots(f: io.RawIOBase, blockSize: int = 64 * 1024):
+    segmentTags = [tag.decode("ascii") for tag in SEGMENT_TAGS]
+    parser = ET.XMLPullParser(events=("start", "end"))
+    stack = []
+    numSegments = 0
+    while True:
+        block = f.read(blockSize)
+        if len(block) > 0:
+            parser.feed(block)
+        else:
+            parser.close()
+        for event, elem in parser.read_events():
+            if event == "start":
+                stack.append(elem)
+                continue
+            stack.pop()
+            if len(stack) == 0:
+                # root element complete
+                yield elem
+                return
+            if elem.tag in segmentTags:
+                numSegments += 1
+        # end-for event
+        # (only once the events of the block are read, the open elements are the ones in stack)
+        if numSegments >= SEGMENTS_PER_DOCUMENT:
+            yield moveCompleteElements(stack)
+            numSegments = 0
+        if len(block) == 0:
+            return
+
+
+# yield the root element of an XML file parsed at once, or (with useSegmentIndex) of documents of the segments
+# that may have data in timeWindow, read with the index of segments of the file.  fn can also be a (binary) stream,
+# or a compressed XML file, parsed incrementally (the segment index is not used)
+def iterXmlRoots(fn: str, useSegmentIndex: bool = False, timeWindow: TimeWindow = None):
+    if hasattr(fn, "read"):
+        yield from iterStreamRoots(fn)
+        return
+    if isCompressedXmlFn(fn):
+        with openXmlInput(fn) as f:
+            yield from iterStreamRoots(f)
+        return
+    if not useSegmentIndex:
+        yield ET.parse(fn).getroot()
+        return
+    index = getSegmentIndex(fn)
+    yield from index.iterRoots(index.select(timeWindow))
@@ -0,0 +1,91 @@
+"""
+MIT License
+
+Copyright (c) 2019 UCSF Hu Lab
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import collections
+from concurrent.futures import ThreadPoolExecutor
+from .segment_buffer import SegmentBuffer
+from typing import Iterable
+from typing import Callable
+
+
+class SegmentPipeline:
+    """
+    Decode (and resample) the segments of a file in a thread pool, ahead of the writer.
+    The parser feeds items into a bounded queue of maxPending segments, the workers call
+    decodeFunc(item, seg) to fill a SegmentBuffer, and run() yields the results in the order
+    of items, to be written by a single writer.  numpy releases the GIL while decoding and
+    resampling, so the workers run in parallel.
+    With numWorkers <= 1, decodeFunc is called in the writer's thread when the item is requested
+    (i.e. after the previous item is written), as without the pipeline.
+    """
+    numWorkers = 1
+    maxPending = 1
+    freeSegs = []
+
+    def __init__(self, numWorkers: int = 1, maxPending: int = 0):
+        self.numWorkers = max(int(numWorkers), 1)
+        self.maxPending = maxPending if maxPending > 0 else (1 if self.numWorkers <= 1 else 2 * self.numWorkers)
+        # the buffers are reused from file to file
+        self.freeSegs = [SegmentBuffer() for i in range(self.maxPending)]
+
+    def run(self, items: Iterable, decodeFunc: Callable, serial: bool = False):
+        """
+        yield (item, seg, decodeFunc(item, seg)) for each item, in order.  seg is reused when the next
+        item is requested.  If serial is True, decode in turn even if numWorkers > 1
+        """
+        if serial or (self.numWorkers <= 1):
+            seg = self.freeSegs[0]
+            for item in items:
+                yield item, seg, decodeFunc(item, seg)
+            return
+        pending = collections.deque()
+        itemIter = iter(items)
+        endOfItems = False
+        with ThreadPoolExecutor(max_workers=self.numWorkers) as executor:
+            try:
+                while True:
+                    while (not endOfItems) and (len(pending) < self.maxPending):
+                        try:
+                            item = next(itemIter)
+                        except StopIteration:
+                            endOfItems = True
+                            break
+                        seg = self.freeSegs.pop()
+                        pending.append((item, seg, executor.submit(decodeFunc, item, seg)))
+                    if len(pending) == 0:
+                        break
+                    item, seg, future = pending.popleft()
+                    try:
+                        yield item, seg, future.result()
+                    finally:
+                        self.freeSegs.append(seg)
+            finally:
+                # e.g. the writer failed: do not decode the rest
+                for item, seg, future in pending:
+                    future.cancel()
+                    try:
+                        future.result()
+                    except BaseException:
+                        pass
+                    self.freeSegs.append(seg)
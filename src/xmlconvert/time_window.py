@@ -0,0 +1,161 @@
+"""
+MIT License
+
+Copyright (c) 2019 UCSF Hu Lab
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import re
+import math
+import datetime
+from myutil import parsetime
+from .xml_input import isCompressedXmlFn
+from .xml_input import openXmlInput
+from .xml_input import getXmlStem
+
+# bytes read at the start (and at the end) of a file to find its first (and last) segment time,
+# doubled until a time is found, up to MAX_PRESCAN_BYTES
+PRESCAN_BLOCK_SIZE = 64 * 1024
+MAX_PRESCAN_BYTES = 4 * 1024 * 1024
+# the last segment of a file starts before the end of its data, by up to this
+PRESCAN_LAST_SEGMENT_SECS = 60
+
+# POLLTIME of measurements, or datetime of cpc (GE), CollectionTime of Waveforms (BedMaster)
+SEGMENT_TIME_PATTERN = re.compile(rb'name="POLLTIME">([^<]+)<|<cpc datetime="([^"]+)"|CollectionTime="([^"]+)"')
+
+
+# parse a segment time as the converters do, e.g. "2019-03-13T11:30:08.000Z" or "03/13/2019 11:30:08 AM"
+def parseSegmentTime(s: str):
+    s = s.split('.', 1)[0] if ('T' in s) else s
+    return parsetime(s.replace('T', ' ').replace('Z', ''))
+
+
+def findSegmentTimes(block: bytes):
+    times = []
+    for m in SEGMENT_TIME_PATTERN.finditer(block):
+        dt = parseSegmentTime((m.group(1) or m.group(2) or m.group(3)).decode("ascii", "replace"))
+        if dt is not None:
+            times.append(dt)
+    return times
+
+
+# return (firstDt, lastDt), the times of the first and last segments found near the start and end of an XML file
+# (None if not found), without parsing the file.  Only the start of a compressed file is read (lastDt is None)
+def prescanTimeRange(fn: str):
+    firstDt = None
+    lastDt = None
+    if isCompressedXmlFn(fn):
+        with openXmlInput(fn, PRESCAN_BLOCK_SIZE) as f:
+            block = b""
+            while (firstDt is None) and (len(block) < MAX_PRESCAN_BYTES):
+                data = f.read(PRESCAN_BLOCK_SIZE)
+                if len(data) == 0:
+                    break
+                block += data
+                times = findSegmentTimes(block)
+                firstDt = times[0] if len(times) > 0 else None
+        return firstDt, lastDt
+    with open(fn, "rb") as f:
+        f.seek(0, 2)
+        fileSize = f.tell()
+        blockSize = PRESCAN_BLOCK_SIZE
+        while (firstDt is None) and (blockSize <= MAX_PRESCAN_BYTES):
+            f.seek(0)
+            times = findSegmentTimes(f.read(blockSize))
+            firstDt = times[0] if len(times) > 0 else None
+            if blockSize >= fileSize:
+                break
+            blockSize *= 2
+        blockSize = PRESCAN_BLOCK_SIZE
+        while (lastDt is None) and (blockSize <= MAX_PRESCAN_BYTES):
+            f.seek(max(0, fileSize - blockSize))
+            times = findSegmentTimes(f.read(blockSize))
+            lastDt = times[-1] if len(times) > 0 else None
+            if blockSize >= fileSize:
+                break
+            blockSize *= 2
+    return firstDt, lastDt
+
+
+# return the start time in filename (without extension), or None if it does not match fnTimeFormat, e.g. "%Y%m%d-%H%M%S"
+def getFnStartTime(fn: str, fnTimeFormat: str):
+    if (fnTimeFormat is None) or (len(fnTimeFormat) == 0):
+        return None
+    try:
+        return datetime.datetime.strptime(getXmlStem(fn), fnTimeFormat)
+    except ValueError:
+        return None
+
+
+class TimeWindow:
+    """
+    Time window [stime, etime) of the data to convert (--stime/--etime), either end can be None (open)
+    """
+    stime = None
+    etime = None
+
+    def __init__(self, stime: datetime.datetime = None, etime: datetime.datetime = None):
+        self.stime = stime
+        self.etime = etime
+
+    def contains(self, dt: datetime.datetime):
+        return ((self.stime is None) or (dt >= self.stime)) and ((self.etime is None) or (dt < self.etime))
+
+    # segment starting at startDt, of numSecs (0 if unknown)
+    def overlaps(self, startDt: datetime.datetime, numSecs: float):
+        if (self.etime is not None) and (startDt >= self.etime):
+            return False
+        if (self.stime is not None) and (numSecs > 0) and (startDt + datetime.timedelta(seconds=numSecs) <= self.stime):
+            return False
+        return True
+
+    # return (trimSecs, numSecs): whole seconds to trim at the start of a segment overlapping the window, and the
+    # seconds of the segment to keep from its start (numSecs, or less if it goes past etime)
+    def getSegmentTrim(self, startDt: datetime.datetime, numSecs: float):
+        trimSecs = 0
+        if (self.stime is not None) and (startDt < self.stime) and (numSecs > 0):
+            trimSecs = int(math.floor((self.stime - startDt).total_seconds()))
+        if (self.etime is not None) and (numSecs > 0):
+            numSecs = min(numSecs, (self.etime - startDt).total_seconds())
+        return trimSecs, numSecs
+
+    # check if an XML file may have data in the window from the start time in its name (if it matches fnTimeFormat)
+    def overlapsFn(self, fn: str, fnTimeFormat: str = None):
+        firstDt = getFnStartTime(fn, fnTimeFormat)
+        return (firstDt is None) or (self.etime is None) or (firstDt < self.etime)
+
+    # check (cheaply) if an XML file may have data in the window: the start time is taken from the filename if it
+    # matches fnTimeFormat, or from the first segment, and the end from the last segment of the file
+    def overlapsFile(self, fn: str, fnTimeFormat: str = None):
+        if not self.overlapsFn(fn, fnTimeFormat):
+            return False
+        firstDt = getFnStartTime(fn, fnTimeFormat)
+        if (firstDt is None) or (self.stime is not None):
+            prescanFirstDt, lastDt = prescanTimeRange(fn)
+            firstDt = prescanFirstDt if firstDt is None else firstDt
+            if (firstDt is not None) and (self.etime is not None) and (firstDt >= self.etime):
+                return False
+            if (lastDt is not None) and (self.stime is not None) and \
+                    (lastDt + datetime.timedelta(seconds=PRESCAN_LAST_SEGMENT_SECS) <= self.stime):
+                return False
+        return True
+
+    def __str__(self):
+        return "{0} - {1}".format(self.stime if self.stime is not None else "", self.etime if self.etime is not None else "")
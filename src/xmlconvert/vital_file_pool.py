@@ -0,0 +1,88 @@
+"""
+MIT License
+
+Copyright (c) 2019 UCSF Hu Lab
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from collections import OrderedDict
+from vitalfilepy import VitalFile
+from vitalfilepy import VITALBINARY
+from wfio.output_file import DEFAULT_VITAL_FILE_POOL_SIZE
+
+
+class VitalFilePool:
+    """
+    Open vital files (VitalFile), by filename, kept open across XML files.  A file is opened when a parameter is first
+    written, and the least recently used file is closed (and flushed) when more than maxOpenFiles files are open
+    (0 for no limit).
+    """
+    maxOpenFiles = DEFAULT_VITAL_FILE_POOL_SIZE
+    files = None
+    numOpens = 0
+    numEvictions = 0
+
+    def __init__(self, maxOpenFiles: int = DEFAULT_VITAL_FILE_POOL_SIZE):
+        self.maxOpenFiles = max(0, maxOpenFiles)
+        self.files = OrderedDict()
+        self.numOpens = 0
+        self.numEvictions = 0
+
+    def __len__(self):
+        return len(self.files)
+
+    def __contains__(self, filename: str):
+        return filename in self.files
+
+    # create a vital file and write its header
+    def create(self, filename: str, header: VITALBINARY):
+        vitalFile = self.open(filename, "w")
+        vitalFile.setHeader(header)
+        vitalFile.writeHeader()
+        return vitalFile
+
+    # return the open vital file, (re)opened to append to it if it is not open
+    def get(self, filename: str):
+        vitalFile = self.files.get(filename)
+        if vitalFile is not None:
+            self.files.move_to_end(filename)
+            return vitalFile
+        return self.open(filename, "r+")
+
+    def open(self, filename: str, mode: str):
+        self.close(filename)
+        while (self.maxOpenFiles > 0) and (len(self.files) >= self.maxOpenFiles):
+            lruFilename, lruVitalFile = self.files.popitem(last=False)
+            lruVitalFile.close()
+            self.numEvictions += 1
+        vitalFile = VitalFile(filename, mode)
+        vitalFile.open()
+        self.files[filename] = vitalFile
+        self.numOpens += 1
+        return vitalFile
+
+    def close(self, filename: str):
+        vitalFile = self.files.pop(filename, None)
+        if vitalFile is not None:
+            vitalFile.close()
+
+    def closeAll(self):
+        while len(self.files) > 0:
+            self.files.popitem(last=False)[1].close()
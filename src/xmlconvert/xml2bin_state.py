@@ -25,6 +25,12 @@ SOFTWARE.
 import os
 import datetime
 from myutil import parsetime
+from .interval_index import IntervalIndex
+from typing import List
+
+EPOCH = datetime.datetime(1970, 1, 1)
+# channel_superset_mode: start a new file if a channel is absent for longer than this (see getChannelAbsentSecs)
+DEFAULT_CHANNEL_SPLIT_THRESHOLD_SEC = 300
 
 
 class Xml2BinState:
@@ -35,6 +41,10 @@ class Xml2BinState:
     xmlStartTm = None
     xmlEndTm = None
     timestampTm = ""
+    # time already converted, for each channel set (see skip_overlapped_segments)
+    channelSet2IntervalIndex = {}
+    # end of the last data of each channel (see channel_superset_mode)
+    channelLastSeenDt = {}
 
     def __init__(self):
         self.lastBinFilename = ""
@@ -43,6 +53,8 @@ class Xml2BinState:
         self.xmlStartTm = None
         self.xmlEndTm = None
         self.timestampTm = None
+        self.channelSet2IntervalIndex = {}
+        self.channelLastSeenDt = {}
 
     def freeXmlBinState(self):
         self.lastBinFilename = ""
@@ -51,6 +63,8 @@ class Xml2BinState:
         self.xmlStartTm = None
         self.xmlEndTm = None
         self.timestampTm = None
+        self.channelSet2IntervalIndex = {}
+        self.channelLastSeenDt = {}
 
     def setLastBinFilename(self, fn: str):
         self.lastBinFilename = fn
@@ -82,3 +96,29 @@ class Xml2BinState:
     def setXmlStartEndTm(self, startTimeStr: str, endTimeStr: str):
         self.xmlStartTm = parsetime(startTimeStr)
         self.xmlEndTm = parsetime(endTimeStr)
+
+    # return seconds at the beginning of segment (startDt, numSecs) already converted for the channels
+    def getConvertedSecs(self, labels: List[str], startDt: datetime.datetime, numSecs: float):
+        intervalIndex = self.channelSet2IntervalIndex.get(tuple(labels))
+        if intervalIndex is None:
+            return 0.0
+        start = (startDt - EPOCH).total_seconds()
+        return intervalIndex.coveredFrom(start, start + numSecs)
+
+    def addConvertedSegment(self, labels: List[str], startDt: datetime.datetime, numSecs: float):
+        key = tuple(labels)
+        if key not in self.channelSet2IntervalIndex:
+            self.channelSet2IntervalIndex[key] = IntervalIndex()
+        start = (startDt - EPOCH).total_seconds()
+        self.channelSet2IntervalIndex[key].add(start, start + numSecs)
+
+    def setChannelsSeen(self, labels: List[str], endDt: datetime.datetime):
+        for label in labels:
+            self.channelLastSeenDt[label] = endDt
+
+    # return seconds between the end of the last data of channel and dt
+    def getChannelAbsentSecs(self, label: str, dt: datetime.datetime):
+        lastSeenDt = self.channelLastSeenDt.get(label)
+        if lastSeenDt is None:
+            return 0.0
+        return max((dt - lastSeenDt).total_seconds(), 0.0)
@@ -0,0 +1,119 @@
+"""
+MIT License
+
+Copyright (c) 2019 UCSF Hu Lab
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import io
+import bz2
+import gzip
+import lzma
+import tarfile
+import zipfile
+
+XML_EXT = ".xml"
+# compressed XML files (e.g. "11-30-08-000Z.xml.gz") are decompressed as they are parsed
+COMPRESSED_XML_EXTS = {".gz": gzip, ".bz2": bz2, ".xz": lzma}
+# read buffer of XML input (decompressed data, or the file)
+XML_INPUT_BUFFER_SIZE = 1024 * 1024
+# archives of XML files, given as input directory (-d)
+ZIP_ARCHIVE_EXTS = [".zip"]
+TAR_ARCHIVE_EXTS = [".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz"]
+
+
+class XmlInputStream:
+    """
+    (binary, read only) stream of an XML file in an archive, named as the archive member
+    """
+    name = ""
+
+    def __init__(self, f: io.BufferedIOBase, name: str):
+        self.f = f
+        self.name = name
+
+    def read(self, size: int = -1):
+        return self.f.read(size)
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def isCompressedXmlFn(fn: str):
+    fn = str(fn).lower()
+    return any(fn.endswith(XML_EXT + ext) for ext in COMPRESSED_XML_EXTS)
+
+
+# XML file, compressed or not
+def isXmlInputFn(fn: str):
+    return str(fn).lower().endswith(XML_EXT) or isCompressedXmlFn(fn)
+
+
+# filename without the directory and the .xml (and compression) extension
+def getXmlStem(fn: str):
+    name = str(fn).replace("\\", "/").rsplit("/", 1)[-1]
+    lowerName = name.lower()
+    for ext in [XML_EXT + ext for ext in COMPRESSED_XML_EXTS] + [XML_EXT]:
+        if lowerName.endswith(ext):
+            return name[:-len(ext)]
+    return name.rsplit(".", 1)[0] if "." in name else name
+
+
+# open an XML file (binary, read only), decompressed if .xml.gz, .xml.bz2 or .xml.xz.  With fileobj, fn is only
+# used for its extension (e.g. the name of an archive member)
+def openXmlInput(fn: str, bufferSize: int = XML_INPUT_BUFFER_SIZE, fileobj: io.BufferedIOBase = None):
+    fn = str(fn)
+    if isCompressedXmlFn(fn):
+        module = COMPRESSED_XML_EXTS[fn[fn.rindex("."):].lower()]
+        return io.BufferedReader(module.open(fileobj if fileobj is not None else fn, "rb"), buffer_size=bufferSize)
+    if fileobj is not None:
+        return fileobj
+    return open(fn, "rb", buffering=bufferSize)
+
+
+def isXmlArchiveFn(fn: str):
+    lowerFn = str(fn).lower()
+    return any(lowerFn.endswith(ext) for ext in ZIP_ARCHIVE_EXTS + TAR_ARCHIVE_EXTS)
+
+
+# yield a stream of each XML file (compressed or not) of a zip or tar archive, in name order, without extracting them.
+# A stream is closed when the next one is yielded.  A compressed tar archive is decompressed once to list its members,
+# and once more to read them if they are in name order in the archive (otherwise, from its start for each member
+# before the previous one)
+def iterArchiveXmlInputs(fn: str, bufferSize: int = XML_INPUT_BUFFER_SIZE):
+    lowerFn = str(fn).lower()
+    if any(lowerFn.endswith(ext) for ext in ZIP_ARCHIVE_EXTS):
+        with zipfile.ZipFile(fn) as archive:
+            names = sorted(info.filename for info in archive.infolist() if (not info.is_dir()) and isXmlInputFn(info.filename))
+            for name in names:
+                with XmlInputStream(openXmlInput(name, bufferSize, archive.open(name)), name) as f:
+                    yield f
+    else:
+        with tarfile.open(fn, "r:*") as archive:
+            members = sorted([m for m in archive.getmembers() if m.isfile() and isXmlInputFn(m.name)], key=lambda m: m.name)
+            for member in members:
+                with XmlInputStream(openXmlInput(member.name, bufferSize, archive.extractfile(member)), member.name) as f:
+                    yield f
@@ -0,0 +1,138 @@
+"""
+MIT License
+
+Copyright (c) 2019 UCSF Hu Lab
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import io
+import xml.parsers.expat
+from xml.sax.saxutils import escape
+from xml.sax.saxutils import quoteattr
+from typing import Any
+
+# tags of the repeating blocks in GE (cpcArchive) and BedMaster (BedMasterEx) XML files
+SEGMENT_TAGS = ["measurements", "Segment"]
+READ_BUFFER_SIZE = 1 << 20
+WRITE_BUFFER_SIZE = 1 << 20
+
+
+class _StopParsing(Exception):
+    pass
+
+
+class XmlPrettyWriter:
+    """
+    Streaming pretty printer of XML files.  The input is parsed with expat in chunks and
+    written out as it goes, so memory used does not depend on the size of the file.
+    Output can be limited to the first maxSegments segments (measurements / Segment), and
+    the wave data (GE "Wave" and BedMaster "WaveformData") can be truncated to maxWaveLen chars.
+    """
+    indent = " "
+    maxSegments = -1
+    maxWaveLen = -1
+
+    def __init__(self, indent: str = " ", maxSegments: int = -1, maxWaveLen: int = -1):
+        self.indent = indent
+        self.maxSegments = maxSegments
+        self.maxWaveLen = maxWaveLen
+
+    def isWaveElement(self, name: str, attrs: Any):
+        return (name == "WaveformData") or (name == "m" and attrs.get("name") == "Wave")
+
+    def prettify(self, fn: str, outputFn: str):
+        with open(fn, "rb") as f:
+            with open(outputFn, "w", encoding="utf-8", buffering=WRITE_BUFFER_SIZE) as g:
+                return self.prettifyStream(f, g)
+
+    # pretty print segments from startSegment (that may have data in timeWindow), read with the index of
+    # segments of the file (built if needed), without reading the segments before them
+    def prettifySegments(self, fn: str, outputFn: str, startSegment: int = 0, timeWindow: Any = None):
+        from .segment_index import getSegmentIndex
+        index = getSegmentIndex(fn)
+        entries = index.select(timeWindow, startSegment, self.maxSegments)
+        with index.openDocument(entries) as f:
+            with open(outputFn, "w", encoding="utf-8", buffering=WRITE_BUFFER_SIZE) as g:
+                return self.prettifyStream(f, g)
+
+    # return number of segments written
+    def prettifyStream(self, f: io.RawIOBase, g: io.TextIOBase):
+        state = {"depth": 0, "text": [], "textLen": 0, "truncate": False, "numSegments": 0}
+        openTags = []
+        parser = xml.parsers.expat.ParserCreate()
+        parser.buffer_text = True
+
+        def flushText():
+            if len(state["text"]) > 0:
+                text = "".join(state["text"]).strip()
+                if state["truncate"] and (state["textLen"] > self.maxWaveLen):
+                    text = text[:self.maxWaveLen] + "...({0} chars)".format(state["textLen"])
+                if len(text) > 0:
+                    g.write(self.indent * state["depth"] + escape(text) + "\n")
+                state["text"] = []
+                state["textLen"] = 0
+
+        def startElement(name, attrs):
+            if name in SEGMENT_TAGS:
+                if (self.maxSegments >= 0) and (state["numSegments"] >= self.maxSegments):
+                    raise _StopParsing()
+                state["numSegments"] += 1
+            flushText()
+            attrStr = "".join(" {0}={1}".format(k, quoteattr(v)) for k, v in attrs.items())
+            g.write("{0}<{1}{2}>\n".format(self.indent * state["depth"], name, attrStr))
+            openTags.append(name)
+            state["depth"] += 1
+            state["truncate"] = (self.maxWaveLen >= 0) and self.isWaveElement(name, attrs)
+
+        def endElement(name):
+            flushText()
+            state["truncate"] = False
+            state["depth"] -= 1
+            openTags.pop()
+            g.write("{0}</{1}>\n".format(self.indent * state["depth"], name))
+
+        def characterData(data):
+            if state["truncate"]:
+                # only keep what is needed for output
+                if state["textLen"] < self.maxWaveLen:
+                    state["text"].append(data[:self.maxWaveLen - state["textLen"]])
+                state["textLen"] += len(data)
+            else:
+                state["text"].append(data)
+                state["textLen"] += len(data)
+
+        parser.StartElementHandler = startElement
+        parser.EndElementHandler = endElement
+        parser.CharacterDataHandler = characterData
+        g.write("<?xml version=\"1.0\" encoding=\"utf-8\"?>\n")
+        try:
+            while True:
+                buf = f.read(READ_BUFFER_SIZE)
+                if len(buf) == 0:
+                    parser.Parse(b"", True)
+                    break
+                parser.Parse(buf, False)
+        except _StopParsing:
+            # close the elements that are still open
+            state["text"] = []
+            while len(openTags) > 0:
+                state["depth"] -= 1
+                g.write("{0}</{1}>\n".format(self.indent * state["depth"], openTags.pop()))
+        return state["numSegments"]
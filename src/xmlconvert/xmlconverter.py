@@ -23,10 +23,29 @@ SOFTWARE.
 modules provides XML conversion to Bin file
 """
 
+import os
 import datetime
 from datetime import datetime
+from datetime import timedelta
+from pathlib import Path
 from dateutil import parser
+from myutil import dtTimestampFormat
+from myutil import getOutputFilename
+from wfio.output_file import openOutputFile
+from wfio.output_file import OUTPUT_FORMAT_ADIBIN
+from wfio.signal_stats import attachSignalStats
+from wfio.signal_stats import renameSignalStats
+from wfio.signal_stats import renameSignalStatsChannels
+from wfio.trend_file import attachTrendWriter
+from wfio.trend_file import renameTrendFile
+from wfio.trend_file import renameTrendChannels
+from .xml2bin_state import Xml2BinState
+from .xml2bin_state import DEFAULT_CHANNEL_SPLIT_THRESHOLD_SEC
+from .segment_buffer import SegmentBuffer
+from .segment_pipeline import SegmentPipeline
+from .time_window import TimeWindow
 from typing import List
+from typing import Dict
 from typing import Any
 
 WAVE_FORMAT_DOUBLE = 1
@@ -71,3 +90,292 @@ class WaveChannel:
 class XmlConverterError(BaseException):
     def __init__(self, message):
         self.message = message
+
+
+class XmlConverter:
+    """
+    Base class of the XML converters: settings, segments (decode, trim and skip) and output files.
+    Subclasses parse their XML format (convert), and provide for the wave info (a tuple) of each channel of
+    a segment:
+        getWaveFields(waveInfo): (label, hz, points, wave)
+        decodeWave(wave): samples of the wave (numpy array of int16)
+        setChannelMeta(meta, waveInfo): copy the format specific fields (e.g. range, gain) to the channel
+            metadata of the segment (optional)
+    """
+    outputDir = ""
+    outputFnExt = ""
+    outputFnPattern = ""
+    defaultSamplesPerSec = 0
+    channelPatternList = None
+    channelInfoList = None
+    ignoreGap = False
+    ignoreGapBetweenSegs = False
+    warningOnGaps = False
+    outputFnTimeFormatDict = None
+    outputFormat = OUTPUT_FORMAT_ADIBIN
+    skipOverlappedSegments = False
+    channelSupersetMode = False
+    channelSplitThresholdSec = DEFAULT_CHANNEL_SPLIT_THRESHOLD_SEC
+    decodeWorkers = 1
+    segmentPipeline = None
+    timeWindow = None
+    useSegmentIndex = False
+    writeSignalStats = False
+    trendSecs = 0.0
+    printRenamedFiles = False
+    header = None
+    headerStartDt = None
+    channels = []
+    name2Channel = {}
+    outputFileSet = set()
+    outputFileList = []
+
+    def __init__(self, outputDir: str = "", outputFnPattern: str = "", outputFnExt: str = "", defaultSamplesPerSec: int = 0,
+                 channelPatternList: List = None, channelInfoList: List = None,
+                 ignoreGap: bool = False, ignoreGapBetweenSegs: bool = False, warningOnGaps: bool = False,
+                 outputFnTimeFormatDict: Dict = None, outputFormat: str = OUTPUT_FORMAT_ADIBIN):
+        self.outputDir = outputDir
+        self.outputFnPattern = outputFnPattern
+        self.outputFnExt = outputFnExt
+        self.defaultSamplesPerSec = defaultSamplesPerSec
+        self.channelPatternList = channelPatternList
+        self.channelInfoList = channelInfoList
+        self.ignoreGap = ignoreGap
+        self.ignoreGapBetweenSegs = ignoreGapBetweenSegs
+        self.warningOnGaps = warningOnGaps
+        self.outputFnTimeFormatDict = outputFnTimeFormatDict
+        self.outputFormat = outputFormat
+        # do not share the class attributes between converters (e.g. in service mode)
+        self.outputFileSet = set()
+        self.outputFileList = []
+        self.skipOverlappedSegments = False
+        self.channelSupersetMode = False
+        self.channelSplitThresholdSec = DEFAULT_CHANNEL_SPLIT_THRESHOLD_SEC
+        self.decodeWorkers = 1
+        self.segmentPipeline = SegmentPipeline()
+        self.timeWindow = None
+        self.useSegmentIndex = False
+        self.writeSignalStats = False
+        self.trendSecs = 0.0
+
+    def clearState(self):
+        self.header = None
+        self.headerStartDt = None
+        self.channels = []
+        self.name2Channel = {}
+
+    def clearOutputFileList(self):
+        self.outputFileSet = set()
+        self.outputFileList = []
+
+    def setDefaultSamplesPerSec(self, defaultSamplesPerSec: int):
+        self.defaultSamplesPerSec = defaultSamplesPerSec
+
+    def setOutputFormat(self, outputFormat: str):
+        self.outputFormat = outputFormat
+
+    def setSkipOverlappedSegments(self, skipOverlappedSegments: bool):
+        self.skipOverlappedSegments = skipOverlappedSegments
+
+    # decode (and resample) segments in decodeWorkers threads, ahead of writing
+    def setDecodeWorkers(self, decodeWorkers: int):
+        self.decodeWorkers = decodeWorkers
+        self.segmentPipeline = SegmentPipeline(decodeWorkers)
+
+    # convert only the data in timeWindow (None: all data)
+    def setTimeWindow(self, timeWindow: TimeWindow):
+        self.timeWindow = timeWindow
+
+    # read (and parse) only the segments needed, with the index of segments (.segidx) of the XML file
+    def setUseSegmentIndex(self, useSegmentIndex: bool):
+        self.useSegmentIndex = useSegmentIndex
+
+    # write per minute statistics of the samples of each output file to a sidecar ({filename}.stats.json)
+    def setWriteSignalStats(self, writeSignalStats: bool):
+        self.writeSignalStats = writeSignalStats
+
+    # write a trend (min, max, mean of each channel per trendSecs) of each output file ({stem}.trend.adibin), 0: no trend
+    def setTrendSecs(self, trendSecs: float):
+        self.trendSecs = trendSecs
+
+    def setChannelSupersetMode(self, channelSupersetMode: bool):
+        self.channelSupersetMode = channelSupersetMode
+
+    def setChannelSplitThresholdSec(self, channelSplitThresholdSec: float):
+        self.channelSplitThresholdSec = channelSplitThresholdSec
+
+    def setChannelPatternList(self, channelPatternList: List):
+        self.channelPatternList = channelPatternList
+
+    def inChannelPatternList(self, label: str):
+        if (self.channelPatternList is None) or (len(self.channelPatternList) == 0):
+            return True
+        for p in self.channelPatternList:
+            if p.match(label) is not None:
+                return True
+        return False
+
+    def getChannelInfo(self, label: str):
+        if self.channelInfoList is not None:
+            for cSettingInfo in self.channelInfoList:
+                labelPattern = cSettingInfo.get("labelPattern")
+                if labelPattern.match(label) is not None:
+                    return cSettingInfo
+        return None
+
+    # attach the sidecars (signal statistics, trend) to an output file opened for writing, after its header is written
+    def attachSidecars(self, binFileOut: Any, filename: str):
+        if self.writeSignalStats:
+            attachSignalStats(binFileOut, filename)
+        if self.trendSecs > 0:
+            attachTrendWriter(binFileOut, filename, self.trendSecs)
+
+    def renameOutputFnWithEndtime(self, numSamples: int, tagsDict: Dict, x: Xml2BinState, filename: str):
+        # rename the file that we just closed (if filename pattern has {endtime})
+        if "{endtime}" in self.outputFnPattern:
+            fmt = self.outputFnTimeFormatDict.get("starttime", None) if (self.outputFnTimeFormatDict is not None) else None
+            tagsDict["starttime"] = dtTimestampFormat(self.headerStartDt, fmt)
+            fmt = self.outputFnTimeFormatDict.get("exetime", None) if (self.outputFnTimeFormatDict is not None) else None
+            tagsDict["exetime"] = dtTimestampFormat(x.timestampTm, fmt)
+            endDt = self.headerStartDt + timedelta(seconds=int(numSamples / self.defaultSamplesPerSec))
+            fmt = self.outputFnTimeFormatDict.get("endtime", None) if (self.outputFnTimeFormatDict is not None) else None
+            tagsDict["endtime"] = dtTimestampFormat(endDt, fmt)
+            if "tempendtime" in filename:
+                original_filename = filename
+                filename = getOutputFilename(self.outputDir, self.outputFnPattern, tagsDict, self.outputFnExt)
+                if original_filename != filename:
+                    os.rename(original_filename, filename)
+                    renameSignalStats(original_filename, filename)
+                    renameTrendFile(original_filename, filename)
+                x.lastBinFilename = filename
+            # end-if
+        # end-if
+
+    # copy the format specific fields of waveInfo (e.g. range, gain) to the channel metadata of the segment
+    def setChannelMeta(self, meta: Any, waveInfo: tuple):
+        pass
+
+    # seconds of a segment (0 if unknown), from the first channel
+    def getSegSecs(self, waveInfoList: List):
+        if len(waveInfoList) == 0:
+            return 0
+        label, hz, points, wave = self.getWaveFields(waveInfoList[0])
+        return (points / hz) if (isinstance(points, int) and hz > 0) else 0
+
+    # decode (and resample) the waves of a segment starting at segDt into seg, return (segSecs, trimSecs), or None if
+    # the segment is converted already.  Called by segmentPipeline, in a worker thread if decodeWorkers > 1
+    def decodeSegment(self, segDt: datetime, waveInfoList: List, seg: SegmentBuffer, x: Xml2BinState):
+        seg.clear()
+        segSecs = 0
+        trimSecs = 0
+        # trim the data out of time window (at the edges of the window)
+        cutSecs = 0
+        if (self.timeWindow is not None) and (segDt is not None):
+            segSecs = self.getSegSecs(waveInfoList)
+            trimSecs, keepSecs = self.timeWindow.getSegmentTrim(segDt, segSecs)
+            cutSecs = keepSecs if keepSecs < segSecs else 0
+            segSecs = keepSecs
+        # skip (or trim) data already converted, before decoding it
+        if self.skipOverlappedSegments and (not self.ignoreGap) and (len(waveInfoList) > 0):
+            if self.timeWindow is None:
+                segSecs = self.getSegSecs(waveInfoList)
+            convertedSecs = x.getConvertedSecs([self.getWaveFields(waveInfo)[0] for waveInfo in waveInfoList], segDt, segSecs)
+            if (segSecs > 0) and (convertedSecs >= segSecs):
+                return None
+            trimSecs = max(trimSecs, int(convertedSecs))
+        for waveInfo in waveInfoList:
+            label, hz, points, wave = self.getWaveFields(waveInfo)
+            wavedata = self.decodeWave(wave)
+            if cutSecs > 0:
+                wavedata = wavedata[:int(cutSecs * hz)]
+            if trimSecs > 0:
+                wavedata = wavedata[int(trimSecs * hz):]
+            meta = seg.addChannel(label, hz, wavedata)
+            meta.points = points
+            self.setChannelMeta(meta, waveInfo)
+        # channels of the same rate are resampled at once
+        seg.resample(self.defaultSamplesPerSec)
+        return segSecs, trimSecs
+
+    # keep writing to the current file if channels of seg (starting at segDt) are only temporarily absent
+    # (channel_superset_mode), return True if seg is fitted to the channels of the file (chanLabel)
+    def fitSegmentChannels(self, chanLabel: List[str], seg: SegmentBuffer, segDt: datetime, firstBinFile: bool, x: Xml2BinState):
+        fitted = False
+        if self.channelSupersetMode and (seg.numChannels > 0):
+            segLabels = seg.labels
+            segEndDt = segDt + timedelta(seconds=seg.maxNumSamples / self.defaultSamplesPerSec)
+            if (firstBinFile is False) and self.channelChanged(chanLabel, segLabels):
+                fitted = self.fitChannelSuperset(chanLabel, seg, segEndDt, x)
+                if (not fitted) and self.warningOnGaps:
+                    print("Channels changed at {0}, starting a new file".format(segDt))
+            x.setChannelsSeen(segLabels, segEndDt)
+        return fitted
+
+    # fit the channels of segment to the channels of output file, return False if a new file is needed
+    # (a channel not in the file, or a channel absent for longer than channelSplitThresholdSec)
+    def fitChannelSuperset(self, chanLabel: List[str], seg: SegmentBuffer, endDt: datetime, x: Xml2BinState):
+        presentLabels = seg.labels
+        for label in chanLabel:
+            if (label not in presentLabels) and (x.getChannelAbsentSecs(label, endDt) > self.channelSplitThresholdSec):
+                return False
+        return seg.fitChannels(chanLabel)
+
+    def renameChannels(self, print_rename_details: bool = False):
+        # progress
+        # need to support renaming of channel label
+        # also, support use of Regex for channel label, and renameTo expression
+        hasRenameTo = False
+        for cSettingInfo in self.channelInfoList:
+            renameTo = cSettingInfo.get("renameTo", "")
+            if len(renameTo) > 0:
+                hasRenameTo = True
+                break
+            # end-if
+        # end-for
+        if hasRenameTo:
+            print("Renaming channels in output files...")
+            numFilesChanged = 0
+            for fn in self.outputFileList:
+                if self.printRenamedFiles:
+                    print("processing {0}...".format(Path(fn).name))
+                updatedFile = False
+                with openOutputFile(fn, "r+", self.outputFormat) as f:
+                    f.readHeader()
+                    for c in f.channels:
+                        cSettingInfo = self.getChannelInfo(c.Title)
+                        if cSettingInfo is not None:
+                            newLabel = cSettingInfo.get("renameTo", "")
+                            if len(newLabel) > 0:
+                                filename = Path(fn).name
+                                oldLabel = c.Title
+                                c.Title = newLabel
+                                updatedFile = True
+                                if print_rename_details:
+                                    print("{0} file: {1} -> {2}".format(filename, oldLabel, newLabel))
+                    if updatedFile:
+                        f.writeHeader()
+                        renameSignalStatsChannels(fn, [c.Title for c in f.channels])
+                        renameTrendChannels(fn, [c.Title for c in f.channels])
+                        numFilesChanged += 1
+                # end-with
+            # end-for
+            if numFilesChanged == 0:
+                if print_rename_details:
+                    print("No output files's channel labels need to be changed.")
+        # end-if
+
+    def moveTempChanLabel(self, chanLabelArr: List[str], tempChanLabelArr: List[str]):
+        chanLabelArr.clear()
+        for l in tempChanLabelArr:
+            chanLabelArr.append(l)
+
+    def channelChanged(self, chanLabelArr: List[str], tempChanLabelArr: List[str]):
+        changed = False
+        if len(chanLabelArr) != len(tempChanLabelArr):
+            changed = True
+        else:
+            for l, t in zip(chanLabelArr, tempChanLabelArr):
+                if l != t:
+                    changed = True
+                    break
+        return changed
@@ -25,26 +25,32 @@ SOFTWARE.
 import os
 from pathlib import Path
 import datetime
+import functools
 from dateutil import parser
 import random
 from .xml2bin_state import Xml2BinState
+from .xmlconverter import XmlConverter
 from .xmlconverter import XmlConverterError
-from .fixsampling import fixsamplingarr
+from .segment_buffer import SegmentBuffer
+from .time_window import TimeWindow
+from .segment_index import iterXmlRoots
+from .vital_file_pool import VitalFilePool
 from myutil import parsetime
 from myutil import dtTimestampFormat
 from myutil import getOutputFilename
-from binfilepy import BinFile
 from binfilepy import CFWBINARY
 from binfilepy import CFWBCHANNEL
 from binfilepy import constant
-from vitalfilepy import VitalFile
+from wfio.output_file import openOutputFile
+from wfio.output_file import OUTPUT_FORMAT_ADIBIN
+from wfio.output_file import VITAL_FORMAT_VITAL
+from wfio.output_file import VITAL_FORMAT_COLUMNAR
+from wfio.vital_store import VitalStore
 from vitalfilepy import VITALBINARY
-import xml.etree.ElementTree as ET
-import base64
-from array import array
 import numpy as np
 import math
 from typing import List
+from typing import Iterator
 from typing import Dict
 from typing import Any
 
@@ -52,102 +58,48 @@ DEFAULT_VS_LIMIT_LOW = -999999
 DEFAULT_VS_LIMIT_HIGH = 999999
 
 
-class XmlConverterForBedMaster:
+class XmlConverterForBedMaster(XmlConverter):
     """
     This class provides XML conversion to Bin file
     """
-    outputDir = ""
-    outputFnExt = ""
-    outputFnPattern = ""
-    defaultSamplesPerSec = 0
-    channelPatternList = None
-    channelInfoList = None
-    ignoreGap = False
-    ignoreGapBetweenSegs = False
-    warningOnGaps = False
-    outputFnTimeFormatDict = None
-    header = None
-    headerStartDt = None
-    channels = []
-    name2Channel = {}
-    outputFileSet = set()
-    outputFileList = []
+    vitalFormat = VITAL_FORMAT_VITAL
+    vitalStore = None
+    vitalStoreTagsDict = None
+    vitalFilePoolSize = 0
+    vitalFilePool = None
+    printRenamedFiles = True
 
     def __init__(self, outputDir: str = "", outputFnPattern: str = "", outputFnExt: str = "", defaultSamplesPerSec: int = 0,
                  channelPatternList: List = None, channelInfoList: List = None,
                  ignoreGap: bool = False, ignoreGapBetweenSegs: bool = False, warningOnGaps: bool = False,
-                 outputFnTimeFormatDict: Dict = None):
-        self.outputDir = outputDir
-        self.outputFnPattern = outputFnPattern
-        self.outputFnExt = outputFnExt
-        self.defaultSamplesPerSec = defaultSamplesPerSec
-        self.channelPatternList = channelPatternList
-        self.channelInfoList = channelInfoList
-        self.ignoreGap = ignoreGap
-        self.ignoreGapBetweenSegs = ignoreGapBetweenSegs
-        self.warningOnGaps = warningOnGaps
-        self.outputFnTimeFormatDict = outputFnTimeFormatDict
+                 outputFnTimeFormatDict: Dict = None, outputFormat: str = OUTPUT_FORMAT_ADIBIN):
+        super().__init__(outputDir, outputFnPattern, outputFnExt, defaultSamplesPerSec, channelPatternList, channelInfoList,
+                         ignoreGap, ignoreGapBetweenSegs, warningOnGaps, outputFnTimeFormatDict, outputFormat)
+        self.vitalFormat = VITAL_FORMAT_VITAL
+        self.vitalStore = None
+        self.vitalStoreTagsDict = None
+        self.vitalFilePoolSize = 0
+        self.vitalFilePool = None
 
-    def clearState(self):
-        self.header = None
-        self.headerStartDt = None
-        self.channels = []
-        self.name2Channel = {}
+    # convert only the data (and vitals) in timeWindow (None: all data)
+    def setTimeWindow(self, timeWindow: TimeWindow):
+        self.timeWindow = timeWindow
 
-    def clearOutputFileList(self):
-        self.outputFileSet = set()
-        self.outputFileList = []
+    def setVitalFormat(self, vitalFormat: str):
+        self.vitalFormat = vitalFormat
 
-    def setDefaultSamplesPerSec(self, defaultSamplesPerSec: int):
-        self.defaultSamplesPerSec = defaultSamplesPerSec
-
-    def setChannelPatternList(self, channelPatternList: List):
-        self.channelPatternList = channelPatternList
-
-    def inChannelPatternList(self, label: str):
-        if (self.channelPatternList is None) or (len(self.channelPatternList) == 0):
-            return True
-        for p in self.channelPatternList:
-            if p.match(label) is not None:
-                return True
-        return False
-
-    def getChannelInfo(self, label: str):
-        if self.channelInfoList is not None:
-            for cSettingInfo in self.channelInfoList:
-                labelPattern = cSettingInfo.get("labelPattern")
-                if labelPattern.match(label) is not None:
-                    return cSettingInfo
-        return None
-
-    def renameOutputFnWithEndtime(self, numSamples: int, tagsDict: Dict, x: Xml2BinState, filename: str):
-        # rename the file that we just closed (if filename pattern has {endtime})
-        if "{endtime}" in self.outputFnPattern:
-            fmt = self.outputFnTimeFormatDict.get("starttime", None) if (self.outputFnTimeFormatDict is not None) else None
-            tagsDict["starttime"] = dtTimestampFormat(self.headerStartDt, fmt)
-            fmt = self.outputFnTimeFormatDict.get("exetime", None) if (self.outputFnTimeFormatDict is not None) else None
-            tagsDict["exetime"] = dtTimestampFormat(x.timestampTm, fmt)
-            endDt = self.headerStartDt + datetime.timedelta(seconds=int(numSamples / self.defaultSamplesPerSec))
-            fmt = self.outputFnTimeFormatDict.get("endtime", None) if (self.outputFnTimeFormatDict is not None) else None
-            tagsDict["endtime"] = dtTimestampFormat(endDt, fmt)
-            if "tempendtime" in filename:
-                original_filename = filename
-                filename = getOutputFilename(self.outputDir, self.outputFnPattern, tagsDict, self.outputFnExt)
-                if original_filename != filename:
-                    os.rename(original_filename, filename)
-                x.lastBinFilename = filename
-            # end-if
-        # end-if
+    # number of vital files kept open across XML files (closed in closeVitalOutput), 0 to close them after each file
+    def setVitalFilePoolSize(self, vitalFilePoolSize: int):
+        self.vitalFilePoolSize = vitalFilePoolSize
 
     # return total number of samples written
     def convert(self, xmlFile: str, tagsDict: Dict, x: Xml2BinState, print_processing_fn: bool = False):
         """
-        convert to BIN file from XML
+        convert to BIN file from XML (a file, or a binary stream parsed as it is read)
         """
         binFileOut = None
         filename = ""
         chanLabel = []
-        tempChanInfo = []
         tempChanLabel = []
         tempChanLabel2Index = {}
         startWaveTm = datetime.datetime.min
@@ -156,32 +108,30 @@ class XmlConverterForBedMaster:
         firstBinFile = True
         firstMeasurement = True
 
-        # array of parName, startTm, vitalFileOut, filename
+        # array of parName, startTm, filename
         startVitalTm = datetime.datetime.min
         vitalFileInfoArr = []
         vitalParName2Info = {}
+        # vital files are opened when written (reopened if converted before), and kept open across XML files
+        vitalFilePool = self.getVitalFilePool()
 
         # progress
         if (x.lastVitalFileInfoArr is not None) and (len(x.lastVitalFileInfoArr) > 0):
             for vinfo in x.lastVitalFileInfoArr:
-                vs_parameter = vinfo["par"]
-                vs_startTm = vinfo["startTm"]
-                vitalFilename = vinfo["filename"]
-                vitalFileOut = VitalFile(vitalFilename, "r+")
-                vitalFileOut.open()
-                vitalFileInfo = {"par": vs_parameter, "startTm": vs_startTm, "vitalFileOut": vitalFileOut, "filename": vitalFilename}
+                vitalFileInfo = {"par": vinfo["par"], "startTm": vinfo["startTm"], "filename": vinfo["filename"]}
                 vitalFileInfoArr.append(vitalFileInfo)
-                vitalParName2Info[vs_parameter] = vitalFileInfo
+                vitalParName2Info[vinfo["par"]] = vitalFileInfo
 
         xml_unit = ""
         xml_bed = ""
 
-        infilePath = Path(xmlFile)
-        if not infilePath.exists():
+        isStream = hasattr(xmlFile, "read")
+        infilePath = Path(str(getattr(xmlFile, "name", "stream"))) if isStream else Path(xmlFile)
+        if (not isStream) and (not infilePath.exists()):
             raise XmlConverterError("Cannot open file: {0}".format(xmlFile))
         else:
             if len(x.lastBinFilename) > 0:
-                binFileOut = BinFile(x.lastBinFilename, "r+")
+                binFileOut = openOutputFile(x.lastBinFilename, "r+", self.outputFormat)
                 binFileOut.open()
                 binFileOut.readHeader()
                 filename = x.lastBinFilename
@@ -204,186 +154,177 @@ class XmlConverterForBedMaster:
                 self.headerStartDt = datetime.datetime(self.header.Year, self.header.Month, self.header.Day,
                                                        self.header.Hour, self.header.Minute, second, microsecond)
                 numSamples = self.header.SamplesPerChannel
+                self.attachSidecars(binFileOut, filename)
             # end-if len(x.lastBinFilename)
             if print_processing_fn:
                 print("Processing XML file: {0}".format(infilePath.name))
-            tree = ET.parse(xmlFile)
-            root = tree.getroot()
+            roots = iterXmlRoots(xmlFile, self.useSegmentIndex, self.timeWindow)
+            root = next(roots, None)
             # print("root tag = {0}".format(root.tag))
-            if root.tag == "BedMasterEx":
-                for child1 in root:
+            if (root is not None) and (root.tag == "BedMasterEx"):
+                # parse, decode (in decodeWorkers threads) and write the segments in a pipeline
+                # segments already converted are found while writing (skip_overlapped_segments), so they are decoded in turn
+                decodeFunc = functools.partial(self.decodeWaveforms, x=x)
+                elements = self.segmentPipeline.run(self.iterRootElements(root, roots), decodeFunc, self.skipOverlappedSegments)
+                for (child1, child3, waveforms), seg, decoded in elements:
                     if child1.tag == "FileInfo":
-                        for child3 in child1:
-                            if child3.tag == "Unit":
-                                xml_unit = child3.text
-                            elif child3.tag == "Bed":
-                                xml_bed = child3.text
-                    if child1.tag == "Segment":
-                        for child3 in child1:
-                            if child3.tag == "Waveforms":
-                                collectionTime, collectionTimeUTC = self.processWaveforms(child3)
-                                collectionTimeDt = parsetime(collectionTime)
-                                tempChanInfo = []
-                                tempChanLabel = []
-                                tempChanLabel2Index = {}
-                                if self.header is None:
-                                    self.headerStartDt = collectionTimeDt
-                                    self.header = CFWBINARY()
-                                    self.header.setValue(1.0 / self.defaultSamplesPerSec, collectionTimeDt.year, collectionTimeDt.month,
-                                                         collectionTimeDt.day, collectionTimeDt.hour, collectionTimeDt.minute, collectionTimeDt.second, 0, 0)
-                                # print(collectionTime, collectionTimeUTC)
-                                idx = 0
-                                for child4 in child3:
-                                    if (child4.tag == "WaveformData"):
-                                        ID, channel, hz, points, uom, wave = self.processWaveformData(child4)
-                                        if self.inChannelPatternList(channel):
-                                            # print(channel, wave, points, pointsBytes, min_, max_, offset, gain, hz)
-                                            wavedata = self.decodeWave(wave)
-                                            # print(wavedata)
-                                            if self.defaultSamplesPerSec != hz:
-                                                wavedata = fixsamplingarr(wavedata, hz, self.defaultSamplesPerSec)
-                                            tempChanInfo.append({"label": channel, "data": wavedata, "points": points, "hz": hz, "uom": uom})
-                                            tempChanLabel.append(channel)
-                                            tempChanLabel2Index[channel] = idx
-                                            idx += 1
-                                # end-for child4
-                                if (firstBinFile is True) or (len(tempChanLabel) > 0 and self.channelChanged(chanLabel, tempChanLabel)):
-                                    if firstBinFile is False:
-                                        binFileOut.close()
-                                        binFileOut = None
-                                        # rename the file that we just closed (if filename pattern has {endtime})
-                                        self.renameOutputFnWithEndtime(numSamples, tagsDict, x, filename)
-                                        if not (x.lastBinFilename in self.outputFileSet):
-                                            self.outputFileSet.add(x.lastBinFilename)
-                                            self.outputFileList.append(x.lastBinFilename)
-                                        # reset new headerStartDt
-                                        self.headerStartDt = collectionTimeDt
-                                        self.header.setValue(1.0 / self.defaultSamplesPerSec, collectionTimeDt.year, collectionTimeDt.month,
-                                                             collectionTimeDt.day, collectionTimeDt.hour, collectionTimeDt.minute, collectionTimeDt.second, 0, 0)
-                                    firstBinFile = False
-                                    self.header.NChannels = len(tempChanInfo)
+                        for child2 in child1:
+                            if child2.tag == "Unit":
+                                xml_unit = child2.text
+                            elif child2.tag == "Bed":
+                                xml_bed = child2.text
+                    if (child3 is not None) and (child3.tag == "Waveforms"):
+                        collectionTime, collectionTimeDt, waveInfoList = waveforms
+                        tempChanLabel = []
+                        # start of data after trimming (time window, or data already converted)
+                        if decoded is not None:
+                            collectionTimeDt += datetime.timedelta(seconds=decoded[1])
+                        if self.header is None:
+                            self.headerStartDt = collectionTimeDt
+                            self.header = CFWBINARY()
+                            self.header.setValue(1.0 / self.defaultSamplesPerSec, collectionTimeDt.year, collectionTimeDt.month,
+                                                 collectionTimeDt.day, collectionTimeDt.hour, collectionTimeDt.minute, collectionTimeDt.second, 0, 0)
+                        if decoded is None:
+                            if self.warningOnGaps:
+                                print("Waveforms CollectionTime: {0} already converted, skipped".format(collectionTime))
+                            continue
+                        segSecs, trimSecs = decoded
+                        tempChanLabel = seg.labels
+                        fitted = self.fitSegmentChannels(chanLabel, seg, collectionTimeDt, firstBinFile, x)
+                        if (firstBinFile is True) or ((not fitted) and len(tempChanLabel) > 0 and self.channelChanged(chanLabel, tempChanLabel)):
+                            if firstBinFile is False:
+                                binFileOut.close()
+                                binFileOut = None
+                                # rename the file that we just closed (if filename pattern has {endtime})
+                                self.renameOutputFnWithEndtime(numSamples, tagsDict, x, filename)
+                                if not (x.lastBinFilename in self.outputFileSet):
+                                    self.outputFileSet.add(x.lastBinFilename)
+                                    self.outputFileList.append(x.lastBinFilename)
+                                # reset new headerStartDt
+                                self.headerStartDt = collectionTimeDt
+                                self.header.setValue(1.0 / self.defaultSamplesPerSec, collectionTimeDt.year, collectionTimeDt.month,
+                                                     collectionTimeDt.day, collectionTimeDt.hour, collectionTimeDt.minute, collectionTimeDt.second, 0, 0)
+                            firstBinFile = False
+                            self.header.NChannels = seg.numChannels
+                            fmt = self.outputFnTimeFormatDict.get("starttime", None) if (self.outputFnTimeFormatDict is not None) else None
+                            tagsDict["starttime"] = dtTimestampFormat(self.headerStartDt, fmt)
+                            fmt = self.outputFnTimeFormatDict.get("exetime", None) if (self.outputFnTimeFormatDict is not None) else None
+                            tagsDict["exetime"] = dtTimestampFormat(x.timestampTm, fmt)
+                            # we do not know the end at this point
+                            tagsDict["endtime"] = "tempendtime" + str(random.randint(10000, 100000))
+                            filename = getOutputFilename(self.outputDir, self.outputFnPattern, tagsDict, self.outputFnExt)
+                            x.lastBinFilename = filename
+                            binFileOut = openOutputFile(filename, "w", self.outputFormat)
+                            binFileOut.open()
+                            binFileOut.setHeader(self.header)
+                            for meta in seg.channels[:seg.numChannels]:
+                                label = meta.label
+                                cSettingInfo = self.getChannelInfo(label)
+                                if cSettingInfo is not None:
+                                    uom = cSettingInfo.get("uom", meta.uom)
+                                    rangeLow = cSettingInfo.get("rangeLow", 0)
+                                    rangeHigh = cSettingInfo.get("rangeHigh", 100)
+                                    offset = cSettingInfo.get("offset", 0)
+                                    scale = cSettingInfo.get("scale", 1)
+                                else:
+                                    uom = meta.uom
+                                    rangeLow = 0
+                                    rangeHigh = 100
+                                    offset = 0
+                                    scale = 1
+                                channel = CFWBCHANNEL()
+                                channel.setValue(label, uom, scale, offset, rangeLow, rangeHigh)
+                                binFileOut.addChannel(channel)
+                            chanData = seg.getChannelData()
+                            chanLabel = seg.labels
+                            binFileOut.writeHeader()
+                            self.attachSidecars(binFileOut, filename)
+                            firstMeasurement = False
+                            numSamples = binFileOut.writeChannelData(chanData)
+                            totalNumSamplesWritten += numSamples
+                            binFileOut.updateSamplesPerChannel(numSamples, True)
+                        elif seg.numChannels > 0:
+                            chanData = seg.getChannelData()
+                            chanLabel = seg.labels
+                            # gap handling
+                            endDt = self.headerStartDt + datetime.timedelta(seconds=int(numSamples / self.defaultSamplesPerSec))
+                            gap = collectionTimeDt - endDt
+                            actualGapInSec = int(gap.total_seconds())
+                            if (not self.ignoreGapBetweenSegs) and firstMeasurement:
+                                gapInSec = actualGapInSec
+                            elif not self.ignoreGap:
+                                gapInSec = actualGapInSec
+                            else:
+                                gapInSec = 0
+                            if self.warningOnGaps and (gapInSec != 0):
+                                print("Waveforms CollectionTime: {0} shows gap (or overlap) = {1} secs".format(collectionTime, gapInSec))
+                            firstMeasurement = False
+                            numSamplesWritten = binFileOut.writeChannelData(chanData, self.defaultSamplesPerSec, gapInSec)
+                            totalNumSamplesWritten += numSamplesWritten
+                            numSamples = numSamplesWritten + binFileOut.header.SamplesPerChannel
+                            binFileOut.header.SamplesPerChannel = numSamples
+                            self.header.SamplesPerChannel = numSamples
+                            binFileOut.updateSamplesPerChannel(numSamples, True)
+                        # end-if firstBinFile
+                        if (segSecs > 0) and (len(tempChanLabel) > 0):
+                            x.addConvertedSegment(tempChanLabel, collectionTimeDt, segSecs - trimSecs)
+                    # end-if "Waveforms"
+                    if (child3 is not None) and (child3.tag == "VitalSigns"):
+                        collectionTime, collectionTimeUTC = self.processVitalSigns(child3)
+                        collectionTimeDt = parsetime(collectionTime)
+                        vs_parameter = ""
+                        vs_time = ""
+                        vs_value = ""
+                        vs_uom = ""
+                        vs_alarmLimitLow = ""
+                        vs_alarmLimitHigh = ""
+                        for child4 in child3:
+                            if (child4.tag == "VitalSign"):
+                                vs_parameter, vs_time, vs_value, vs_uom, vs_alarmLimitLow, vs_alarmLimitHigh = self.processVitalSign(child4)
+                                # print(vs_parameter)
+                            if (vs_parameter is not None) and len(vs_parameter) > 0 and (self.vitalFormat == VITAL_FORMAT_COLUMNAR):
+                                self.addVitalToStore(vs_parameter, vs_time, vs_value, vs_uom, vs_alarmLimitLow, vs_alarmLimitHigh,
+                                                     xml_unit, xml_bed, tagsDict, x)
+                            elif (vs_parameter is not None) and len(vs_parameter) > 0:
+                                vitalFileInfo = None
+                                if vs_parameter in vitalParName2Info:
+                                    vitalFileInfo = vitalParName2Info.get(vs_parameter)
+                                else:
+                                    vs_time_dt = parsetime(vs_time)
                                     fmt = self.outputFnTimeFormatDict.get("starttime", None) if (self.outputFnTimeFormatDict is not None) else None
-                                    tagsDict["starttime"] = dtTimestampFormat(self.headerStartDt, fmt)
+                                    tagsDict["starttime"] = dtTimestampFormat(vs_time_dt, fmt)
                                     fmt = self.outputFnTimeFormatDict.get("exetime", None) if (self.outputFnTimeFormatDict is not None) else None
                                     tagsDict["exetime"] = dtTimestampFormat(x.timestampTm, fmt)
                                     # we do not know the end at this point
-                                    tagsDict["endtime"] = "tempendtime" + str(random.randint(10000, 100000))
-                                    filename = getOutputFilename(self.outputDir, self.outputFnPattern, tagsDict, self.outputFnExt)
-                                    x.lastBinFilename = filename
-                                    binFileOut = BinFile(filename, "w")
-                                    binFileOut.open()
-                                    binFileOut.setHeader(self.header)
-                                    chanData = []
-                                    chanLabel = []
-                                    for cinfo in tempChanInfo:
-                                        label = cinfo["label"]
-                                        cSettingInfo = self.getChannelInfo(label)
-                                        if cSettingInfo is not None:
-                                            uom = cSettingInfo.get("uom", cinfo.get("uom", ""))
-                                            rangeLow = cSettingInfo.get("rangeLow", 0)
-                                            rangeHigh = cSettingInfo.get("rangeHigh", 100)
-                                            offset = cSettingInfo.get("offset", 0)
-                                            scale = cSettingInfo.get("scale", 1)
-                                        else:
-                                            uom = cinfo.get("uom", "")
-                                            rangeLow = 0
-                                            rangeHigh = 100
-                                            offset = 0
-                                            scale = 1
-                                        channel = CFWBCHANNEL()
-                                        channel.setValue(label, uom, scale, offset, rangeLow, rangeHigh)
-                                        binFileOut.addChannel(channel)
-                                        chanData.append(cinfo["data"])
-                                        chanLabel.append(label)
-                                    binFileOut.writeHeader()
-                                    firstMeasurement = False
-                                    numSamples = binFileOut.writeChannelData(chanData)
-                                    totalNumSamplesWritten += numSamples
-                                    binFileOut.updateSamplesPerChannel(numSamples, True)
-                                elif len(tempChanInfo) > 0:
-                                    chanData = []
-                                    chanLabel = []
-                                    for cinfo in tempChanInfo:
-                                        label = cinfo["label"]
-                                        chanData.append(cinfo["data"])
-                                        chanLabel.append(label)
-                                    # gap handling
-                                    endDt = self.headerStartDt + datetime.timedelta(seconds=int(numSamples / self.defaultSamplesPerSec))
-                                    gap = collectionTimeDt - endDt
-                                    actualGapInSec = int(gap.total_seconds())
-                                    if (not self.ignoreGapBetweenSegs) and firstMeasurement:
-                                        gapInSec = actualGapInSec
-                                    elif not self.ignoreGap:
-                                        gapInSec = actualGapInSec
-                                    else:
-                                        gapInSec = 0
-                                    if self.warningOnGaps and (gapInSec != 0):
-                                        print("Waveforms CollectionTime: {0} shows gap (or overlap) = {1} secs".format(collectionTime, gapInSec))
-                                    firstMeasurement = False
-                                    numSamplesWritten = binFileOut.writeChannelData(chanData, self.defaultSamplesPerSec, gapInSec)
-                                    totalNumSamplesWritten += numSamplesWritten
-                                    numSamples = numSamplesWritten + binFileOut.header.SamplesPerChannel
-                                    binFileOut.header.SamplesPerChannel = numSamples
-                                    self.header.SamplesPerChannel = numSamples
-                                    binFileOut.updateSamplesPerChannel(numSamples, True)
-                                # end-if firstBinFile
-                            # end-if "measurement"
-                            if child3.tag == "VitalSigns":
-                                collectionTime, collectionTimeUTC = self.processVitalSigns(child3)
-                                collectionTimeDt = parsetime(collectionTime)
-                                vs_parameter = ""
-                                vs_time = ""
-                                vs_value = ""
-                                vs_uom = ""
-                                vs_alarmLimitLow = ""
-                                vs_alarmLimitHigh = ""
-                                for child4 in child3:
-                                    if (child4.tag == "VitalSign"):
-                                        vs_parameter, vs_time, vs_value, vs_uom, vs_alarmLimitLow, vs_alarmLimitHigh = self.processVitalSign(child4)
-                                        # print(vs_parameter)
-                                    if (vs_parameter is not None) and len(vs_parameter) > 0:
-                                        vitalFileInfo = None
-                                        if vs_parameter in vitalParName2Info:
-                                            vitalFileInfo = vitalParName2Info.get(vs_parameter)
-                                        else:
-                                            vs_time_dt = parsetime(vs_time)
-                                            fmt = self.outputFnTimeFormatDict.get("starttime", None) if (self.outputFnTimeFormatDict is not None) else None
-                                            tagsDict["starttime"] = dtTimestampFormat(vs_time_dt, fmt)
-                                            fmt = self.outputFnTimeFormatDict.get("exetime", None) if (self.outputFnTimeFormatDict is not None) else None
-                                            tagsDict["exetime"] = dtTimestampFormat(x.timestampTm, fmt)
-                                            # we do not know the end at this point
-                                            tagsDict["endtime"] = "0000"  # "tempendtime" + str(random.randint(10000, 100000))
-                                            # array of parName, startTm, vitalFileOut, filename
-                                            vitalFilename = getOutputFilename(self.outputDir, self.outputFnPattern + "_" + vs_parameter, tagsDict, "vital")
-                                            vitalFileOut = VitalFile(vitalFilename, "w")
-                                            vitalFileOut.open()
-                                            startVitalTm = vs_time_dt
-                                            vitalFileInfo = {"par": vs_parameter, "startTm": startVitalTm, "vitalFileOut": vitalFileOut, "filename": vitalFilename}
-                                            vitalFileInfoArr.append(vitalFileInfo)
-                                            vitalParName2Info[vs_parameter] = vitalFileInfo
-                                            vs_header = VITALBINARY(vs_parameter, vs_uom, xml_unit, xml_bed, startVitalTm.year, startVitalTm.month, startVitalTm.day, startVitalTm.hour, startVitalTm.minute, startVitalTm.second)
-                                            vitalFileOut.setHeader(vs_header)
-                                            vitalFileOut.writeHeader()
-                                        if vitalFileInfo is not None:
-                                            vs_value_num = DEFAULT_VS_LIMIT_LOW
-                                            try:
-                                                vs_value_num = float(vs_value)
-                                            except:
-                                                pass
-                                            vs_time_dt = parsetime(vs_time)
-                                            vs_offset_num = (vs_time_dt - vitalFileInfo["startTm"]).total_seconds()
-                                            vs_low_num = DEFAULT_VS_LIMIT_LOW
-                                            try:
-                                                vs_low_num = float(vs_alarmLimitLow)
-                                            except:
-                                                pass
-                                            vs_high_num = DEFAULT_VS_LIMIT_HIGH
-                                            try:
-                                                vs_high_num = float(vs_alarmLimitHigh)
-                                            except:
-                                                pass
-                                            vitalFileOut = vitalFileInfo["vitalFileOut"]
-                                            vitalFileOut.writeVitalData(vs_value_num, vs_offset_num, vs_low_num, vs_high_num)
+                                    tagsDict["endtime"] = "0000"  # "tempendtime" + str(random.randint(10000, 100000))
+                                    # array of parName, startTm, filename
+                                    vitalFilename = getOutputFilename(self.outputDir, self.outputFnPattern + "_" + vs_parameter, tagsDict, "vital")
+                                    startVitalTm = vs_time_dt
+                                    vitalFileInfo = {"par": vs_parameter, "startTm": startVitalTm, "filename": vitalFilename}
+                                    vitalFileInfoArr.append(vitalFileInfo)
+                                    vitalParName2Info[vs_parameter] = vitalFileInfo
+                                    vs_header = VITALBINARY(vs_parameter, vs_uom, xml_unit, xml_bed, startVitalTm.year, startVitalTm.month, startVitalTm.day, startVitalTm.hour, startVitalTm.minute, startVitalTm.second)
+                                    vitalFilePool.create(vitalFilename, vs_header)
+                                if vitalFileInfo is not None:
+                                    vs_value_num = DEFAULT_VS_LIMIT_LOW
+                                    try:
+                                        vs_value_num = float(vs_value)
+                                    except:
+                                        pass
+                                    vs_time_dt = parsetime(vs_time)
+                                    vs_offset_num = (vs_time_dt - vitalFileInfo["startTm"]).total_seconds()
+                                    vs_low_num = DEFAULT_VS_LIMIT_LOW
+                                    try:
+                                        vs_low_num = float(vs_alarmLimitLow)
+                                    except:
+                                        pass
+                                    vs_high_num = DEFAULT_VS_LIMIT_HIGH
+                                    try:
+                                        vs_high_num = float(vs_alarmLimitHigh)
+                                    except:
+                                        pass
+                                    vitalFileOut = vitalFilePool.get(vitalFileInfo["filename"])
+                                    vitalFileOut.writeVitalData(vs_value_num, vs_offset_num, vs_low_num, vs_high_num)
                 # end-for child1
             # end-if root
         # end-if
@@ -396,54 +337,114 @@ class XmlConverterForBedMaster:
                 self.outputFileSet.add(x.lastBinFilename)
                 self.outputFileList.append(x.lastBinFilename)
         for vf in vitalFileInfoArr:
-            vitalFileOut = vf["vitalFileOut"]
-            if vitalFileOut is not None:
-                vitalFileOut.close()
-                vf["vitalFileOut"] = None
             x.addOrUpdateLastVitalFileInfo(vf["par"], vf["startTm"], vf["filename"])
+        if self.vitalFilePoolSize <= 0:
+            vitalFilePool.closeAll()
 
         return totalNumSamplesWritten
 
-    def renameChannels(self, print_rename_details: bool = False):
-        # progress
-        # need to support renaming of channel label
-        # also, support use of Regex for channel label, and renameTo expression
-        hasRenameTo = False
-        for cSettingInfo in self.channelInfoList:
-            renameTo = cSettingInfo.get("renameTo", "")
-            if len(renameTo) > 0:
-                hasRenameTo = True
-                break
-            # end-if
-        # end-for
-        if hasRenameTo:
-            print("Renaming channels in output files...")
-            numFilesChanged = 0
-            for fn in self.outputFileList:
-                print("processing {0}...".format(Path(fn).name))
-                updatedFile = False
-                with BinFile(fn, "r+") as f:
-                    f.readHeader()
-                    for c in f.channels:
-                        cSettingInfo = self.getChannelInfo(c.Title)
-                        if cSettingInfo is not None:
-                            newLabel = cSettingInfo.get("renameTo", "")
-                            if len(newLabel) > 0:
-                                filename = Path(fn).name
-                                oldLabel = c.Title
-                                c.Title = newLabel
-                                updatedFile = True
-                                if print_rename_details:
-                                    print("{0} file: {1} -> {2}".format(filename, oldLabel, newLabel))
-                    if updatedFile:
-                        f.writeHeader()
-                        numFilesChanged += 1
-                # end-with
-            # end-for
-            if numFilesChanged == 0:
-                if print_rename_details:
-                    print("No output files's channel labels need to be changed.")
-        # end-if
+    # parser stage of the pipeline, for the root elements of the file (more than one with useSegmentIndex)
+    def iterRootElements(self, root: object, roots: Iterator):
+        yield from self.iterElements(root)
+        for root in roots:
+            yield from self.iterElements(root)
+
+    # parser stage of the pipeline: yield (child1, child3, waveforms) for FileInfo and each element of segments,
+    # with waveforms (collectionTime, collectionTimeDt, waveInfoList) for Waveforms
+    def iterElements(self, root: object):
+        for child1 in root:
+            if child1.tag == "FileInfo":
+                yield child1, None, None
+            if child1.tag == "Segment":
+                for child3 in child1:
+                    waveforms = None
+                    if child3.tag == "Waveforms":
+                        collectionTime, collectionTimeUTC = self.processWaveforms(child3)
+                        # print(collectionTime, collectionTimeUTC)
+                        waveInfoList = []
+                        for child4 in child3:
+                            if (child4.tag == "WaveformData"):
+                                waveInfo = self.processWaveformData(child4)
+                                if self.inChannelPatternList(waveInfo[1]):
+                                    waveInfoList.append(waveInfo)
+                        # end-for child4
+                        waveforms = (collectionTime, parsetime(collectionTime), waveInfoList)
+                        # skip segments out of time window, before decoding
+                        if (self.timeWindow is not None) and (waveforms[1] is not None) and \
+                                (not self.timeWindow.overlaps(waveforms[1], self.getSegSecs(waveInfoList))):
+                            continue
+                    elif (child3.tag == "VitalSigns") and (self.timeWindow is not None):
+                        collectionTimeDt = parsetime(self.processVitalSigns(child3)[0])
+                        if (collectionTimeDt is not None) and (not self.timeWindow.contains(collectionTimeDt)):
+                            continue
+                    yield child1, child3, waveforms
+
+    # decode (and resample) the waves of Waveforms into seg, see decodeSegment
+    def decodeWaveforms(self, item: tuple, seg: SegmentBuffer, x: Xml2BinState):
+        child1, child3, waveforms = item
+        if waveforms is None:
+            seg.clear()
+            return None
+        collectionTime, collectionTimeDt, waveInfoList = waveforms
+        return self.decodeSegment(collectionTimeDt, waveInfoList, seg, x)
+
+    def getWaveFields(self, waveInfo: tuple):
+        ID, channel, hz, points, uom, wave = waveInfo
+        return channel, hz, points, wave
+
+    def setChannelMeta(self, meta: Any, waveInfo: tuple):
+        meta.uom = waveInfo[4]
+
+    def addVitalToStore(self, vs_parameter: str, vs_time: str, vs_value: str, vs_uom: str, vs_alarmLimitLow: str, vs_alarmLimitHigh: str,
+                        xml_unit: str, xml_bed: str, tagsDict: Dict, x: Xml2BinState):
+        if self.vitalStore is None:
+            self.vitalStore = VitalStore()
+            self.vitalStoreTagsDict = dict(tagsDict)
+            fmt = self.outputFnTimeFormatDict.get("exetime", None) if (self.outputFnTimeFormatDict is not None) else None
+            self.vitalStoreTagsDict["exetime"] = dtTimestampFormat(x.timestampTm, fmt)
+        vs_value_num = DEFAULT_VS_LIMIT_LOW
+        try:
+            vs_value_num = float(vs_value)
+        except:
+            pass
+        vs_low_num = DEFAULT_VS_LIMIT_LOW
+        try:
+            vs_low_num = float(vs_alarmLimitLow)
+        except:
+            pass
+        vs_high_num = DEFAULT_VS_LIMIT_HIGH
+        try:
+            vs_high_num = float(vs_alarmLimitHigh)
+        except:
+            pass
+        self.vitalStore.addVital(vs_parameter, vs_uom, xml_unit, xml_bed, parsetime(vs_time), vs_value_num, vs_low_num, vs_high_num)
+
+    # vital files kept open across XML files, or (vitalFilePoolSize is 0) a pool without limit for one XML file
+    def getVitalFilePool(self):
+        if self.vitalFilePoolSize <= 0:
+            return VitalFilePool(0)
+        if self.vitalFilePool is None:
+            self.vitalFilePool = VitalFilePool(self.vitalFilePoolSize)
+        return self.vitalFilePool
+
+    # close the vital files (kept open across XML files), write the columnar vitals of this run (vital_format: columnar),
+    # return the filename of the columnar vitals
+    def closeVitalOutput(self):
+        if self.vitalFilePool is not None:
+            self.vitalFilePool.closeAll()
+            self.vitalFilePool = None
+        filename = ""
+        if (self.vitalStore is not None) and (self.vitalStore.numRecords > 0):
+            tagsDict = self.vitalStoreTagsDict
+            fmt = self.outputFnTimeFormatDict.get("starttime", None) if (self.outputFnTimeFormatDict is not None) else None
+            tagsDict["starttime"] = dtTimestampFormat(self.vitalStore.startDt, fmt)
+            fmt = self.outputFnTimeFormatDict.get("endtime", None) if (self.outputFnTimeFormatDict is not None) else None
+            tagsDict["endtime"] = dtTimestampFormat(self.vitalStore.endDt, fmt)
+            filename = getOutputFilename(self.outputDir, self.outputFnPattern + "_vitals", tagsDict, "vitals")
+            self.vitalStore.write(filename)
+        self.vitalStore = None
+        self.vitalStoreTagsDict = None
+        return filename
 
     def processWaveforms(self, e: object):
         collectionTime = e.attrib.get("CollectionTime", "")
@@ -460,13 +461,7 @@ class XmlConverterForBedMaster:
         return ID, channel, hz, points, uom, wave
 
     def decodeWave(self, x: str):
-        val_list = x.split(",")
-        a = array("h", (0,) * len(val_list))
-        i = 0
-        for v in val_list:
-            a[i] = int(v)
-            i += 1
-        return a
+        return np.fromstring(x, dtype=np.int16, sep=",")
 
     def processVitalSigns(self, e: object):
         collectionTime = e.attrib.get("CollectionTime", "")
@@ -498,19 +493,3 @@ class XmlConverterForBedMaster:
                 if child.text is not None:
                     vs_alarmLimitHigh = child.text
         return vs_parameter, vs_time, vs_value, vs_uom, vs_alarmLimitLow, vs_alarmLimitHigh
-
-    def moveTempChanLabel(self, chanLabelArr: List[str], tempChanLabelArr: List[str]):
-        chanLabelArr.clear()
-        for l in tempChanLabelArr:
-            chanLabelArr.append(l)
-
-    def channelChanged(self, chanLabelArr: List[str], tempChanLabelArr: List[str]):
-        changed = False
-        if len(chanLabelArr) != len(tempChanLabelArr):
-            changed = True
-        else:
-            for l, t in zip(chanLabelArr, tempChanLabelArr):
-                if l != t:
-                    changed = True
-                    break
-        return changed
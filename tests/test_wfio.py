@@ -0,0 +1,375 @@
+"""
+MIT License
+
+Copyright (c) 2019 UCSF Hu Lab
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import sys
+import subprocess
+import pytest
+import numpy as np
+from binfilepy import BinFile
+from binfilepy import CFWBINARY
+from binfilepy import CFWBCHANNEL
+from binfilepy import constant
+from wfio import BinReader
+from wfio import BlockCache
+from wfio import Catalog
+from wfio import extractTimeRange
+from wfio import concatFiles
+from wfio import NpyDirFile
+from wfio import loadNpyDir
+from wfio import CompressedBinFile
+from wfio import NumpyBinFile
+from wfio import VitalStore
+from wfio import loadVitalStore
+from wfio import getVitalParameter
+from wfio import SignalStats
+from wfio import loadSignalStats
+from wfio import TrendWriter
+from wfio import findBinFiles
+from wfio import ExtractError
+from wfio.trend_file import attachTrendWriter
+from array import array
+from datetime import datetime
+from datetime import timedelta
+
+
+def writeTestBinFile(fn: str, chanData: list, fs: int = 240, second: int = 8, labels: list = None, scale: float = 0.5):
+    header = CFWBINARY()
+    header.setValue(1.0 / fs, 2019, 3, 13, 11, 30, second, 0, 0)
+    header.NChannels = len(chanData)
+    with BinFile(fn, "w") as f:
+        f.setHeader(header)
+        for i in range(len(chanData)):
+            channel = CFWBCHANNEL()
+            channel.setValue(labels[i] if labels is not None else "CH{0}".format(i), "mV", scale, 1.0, 0.0, 1.0)
+            f.addChannel(channel)
+        f.writeHeader()
+        numSamples = f.writeChannelData(chanData)
+        f.updateSamplesPerChannel(numSamples, True)
+
+
+def test_binreader(tmpdir):
+    fn = os.path.join(str(tmpdir), "test.adibin")
+    ch0 = list(range(0, 1000))
+    ch1 = list(range(1000, 0, -1))
+    ch1[10] = constant.MIN_SHORT_VALUE
+    writeTestBinFile(fn, [ch0, ch1])
+    with BinReader(fn) as r:
+        assert(r.numSamples == 1000)
+        assert(r.numChannels == 2)
+        assert(r.startDt.strftime("%Y/%m/%d %H:%M:%S") == "2019/03/13 11:30:08")
+        assert(list(r.readBlock(5, 3)[:, 0]) == [5, 6, 7])
+        data = r.readScaledBlock(0, 20)
+        assert(data[0][4] == 0.5 * (4 + 1.0))
+        assert(np.isnan(data[1][10]))
+
+
+def test_blockcache(tmpdir):
+    fn = os.path.join(str(tmpdir), "test.adibin")
+    writeTestBinFile(fn, [list(range(0, 1000))])
+    with BinReader(fn) as r:
+        cache = BlockCache(r, 64, 4)
+        window = cache.getWindow(100, 200)
+        assert(window.shape == (1, 200))
+        assert(window[0][0] == 0.5 * (100 + 1.0))
+        assert(window[0][-1] == 0.5 * (299 + 1.0))
+        assert(cache.getWindow(990, 100).shape == (1, 10))
+        cache.prefetch(300, 64)
+        cache.close()
+        assert(len(cache.blocks) == 0)
+
+
+def test_catalog(tmpdir):
+    outputDir = os.path.join(str(tmpdir), "output")
+    os.mkdir(outputDir)
+    writeTestBinFile(os.path.join(outputDir, "P1_20190313113008_20190313113012.adibin"), [list(range(0, 960))])
+    writeTestBinFile(os.path.join(outputDir, "P2_20190313113008_20190313113012.adibin"), [list(range(0, 960)), list(range(0, 960))])
+    with Catalog(os.path.join(str(tmpdir), "catalog.db"), "{id1}_{starttime}_{endtime}") as catalog:
+        assert(catalog.update([outputDir]) == (2, 0, 0))
+        assert(catalog.update([outputDir]) == (0, 0, 2))
+        result = catalog.query(datetime(2019, 3, 13, 11, 30, 10), datetime(2019, 3, 13, 11, 30, 11), ["ch1"])
+        assert(len(result) == 1)
+        assert(result[0]["id1"] == "P2")
+        assert(result[0]["channels"] == ["CH0", "CH1"])
+        assert(len(catalog.query(datetime(2019, 3, 13, 11, 30, 12), None)) == 0)
+        assert(len(catalog.query(tagsDict={"id1": "P1"})) == 1)
+
+
+def test_extract_time_range(tmpdir):
+    fn1 = os.path.join(str(tmpdir), "a.adibin")
+    fn2 = os.path.join(str(tmpdir), "b.adibin")
+    out = os.path.join(str(tmpdir), "out.adibin")
+    # 11:30:08 - 11:30:10 with CH0, CH1, then 11:30:11 - 11:30:13 with CH1 only
+    writeTestBinFile(fn1, [list(range(0, 480)), list(range(1000, 1480))], fs=240, second=8)
+    writeTestBinFile(fn2, [list(range(2000, 2480))], fs=240, second=11, labels=["CH1"])
+    numSamples = extractTimeRange([fn2, fn1], out, datetime(2019, 3, 13, 11, 30, 9), datetime(2019, 3, 13, 11, 30, 12), ["ch1", "CH0"])
+    assert(numSamples == 3 * 240)
+    with BinReader(out) as r:
+        assert([c.Title for c in r.channels] == ["CH1", "CH0"])
+        data = r.readBlock(0, r.numSamples)
+        assert(list(data[0]) == [1240, 240])
+        assert(list(data[239]) == [1479, 479])
+        assert(list(data[240]) == [constant.MIN_SHORT_VALUE, constant.MIN_SHORT_VALUE])
+        assert(list(data[480]) == [2000, constant.MIN_SHORT_VALUE])
+        assert(list(data[719]) == [2239, constant.MIN_SHORT_VALUE])
+
+
+def test_concat_files(tmpdir):
+    fn1 = os.path.join(str(tmpdir), "a.adibin")
+    fn2 = os.path.join(str(tmpdir), "b.adibin")
+    fn3 = os.path.join(str(tmpdir), "c.adibin")
+    out = os.path.join(str(tmpdir), "out.adibin")
+    # 11:30:08 - 11:30:10, gap of 1 sec, 11:30:11 - 11:30:13, overlap of 1 sec, 11:30:12 - 11:30:14
+    writeTestBinFile(fn1, [list(range(0, 20)), list(range(100, 120))], fs=10, second=8)
+    writeTestBinFile(fn2, [list(range(200, 220)), list(range(300, 320))], fs=10, second=11, labels=["CH1", "CH0"])
+    writeTestBinFile(fn3, [list(range(400, 420)), list(range(500, 520))], fs=10, second=12)
+    assert(concatFiles([fn3, fn2, fn1], out, ["CH1"]) == 60)
+    with BinReader(out) as r:
+        assert(r.startDt.strftime("%H:%M:%S") == "11:30:08")
+        data = list(r.readBlock(0, r.numSamples)[:, 0])
+        assert(data[0:20] == list(range(100, 120)))
+        assert(data[20:30] == [constant.MIN_SHORT_VALUE] * 10)
+        assert(data[30:50] == list(range(200, 220)))
+        assert(data[50:60] == list(range(510, 520)))
+    # a channel with a different scale in a file cannot be copied as it is
+    fn4 = os.path.join(str(tmpdir), "d.adibin")
+    writeTestBinFile(fn4, [list(range(600, 620))], fs=10, second=15, labels=["CH1"], scale=1.0)
+    with pytest.raises(ExtractError):
+        concatFiles([fn1, fn4], os.path.join(str(tmpdir), "out2.adibin"), ["CH1"])
+    assert(not os.path.exists(os.path.join(str(tmpdir), "out2.adibin")))
+    assert(concatFiles([fn1, fn4], os.path.join(str(tmpdir), "out3.adibin"), ["CH0"]) == 90)
+
+
+def test_npy_dir_file(tmpdir):
+    fn = os.path.join(str(tmpdir), "test.npyd")
+    header = CFWBINARY()
+    header.setValue(1.0 / 10, 2019, 3, 13, 11, 30, 8, 0, 0)
+    header.NChannels = 2
+    with NpyDirFile(fn, "w") as f:
+        f.setHeader(header)
+        for label in ["I", "II"]:
+            channel = CFWBCHANNEL()
+            channel.setValue(label, "mV", 0.5, 1.0, 0.0, 1.0)
+            f.addChannel(channel)
+        f.writeHeader()
+        numSamples = f.writeChannelData([array("h", range(0, 20)), np.arange(100, 110, dtype=np.int16)])
+        f.updateSamplesPerChannel(numSamples, True)
+    with NpyDirFile(fn, "r+") as f:
+        f.readHeader()
+        # 1 sec gap, then 1 sec overlap
+        numSamples = f.header.SamplesPerChannel + f.writeChannelData([list(range(20, 30))] * 2, 10, 1)
+        numSamples += f.writeChannelData([list(range(30, 50))] * 2, 10, -1)
+        f.updateSamplesPerChannel(numSamples, True)
+    h, arrays = loadNpyDir(fn)
+    assert(h["SamplesPerChannel"] == 50)
+    assert(h["startTime"] == "2019-03-13T11:30:08")
+    assert(isinstance(arrays[0], np.memmap))
+    assert(list(arrays[0][0:20]) == list(range(0, 20)))
+    assert(list(arrays[1][10:20]) == [constant.MIN_SHORT_VALUE] * 10)
+    assert(list(arrays[1][20:30]) == [constant.MIN_SHORT_VALUE] * 10)
+    assert(list(arrays[1][30:40]) == list(range(20, 30)))
+    assert(list(arrays[1][40:50]) == list(range(40, 50)))
+    assert(list(np.load(os.path.join(fn, "ch000.npy"), mmap_mode="r")[40:50]) == list(range(40, 50)))
+
+
+def test_compressed_bin_file(tmpdir):
+    fn = os.path.join(str(tmpdir), "test.adibinz")
+    rawFn = os.path.join(str(tmpdir), "test.adibin")
+    chanData = [np.arange(0, 1000, dtype=np.int16) * 7, (np.arange(0, 1000) % 50 - 25).astype(np.int16)]
+    writeTestBinFile(rawFn, chanData, fs=10)
+    header = CFWBINARY()
+    header.setValue(1.0 / 10, 2019, 3, 13, 11, 30, 8, 0, 0)
+    header.NChannels = 2
+    with CompressedBinFile(fn, "w", "zlib", blockSize=64) as f:
+        f.setHeader(header)
+        for i in range(2):
+            channel = CFWBCHANNEL()
+            channel.setValue("CH{0}".format(i), "mV", 0.5, 1.0, 0.0, 1.0)
+            f.addChannel(channel)
+        f.writeHeader()
+        numSamples = f.writeChannelData([chanData[0][:600], chanData[1][:600]])
+        f.updateSamplesPerChannel(numSamples, True)
+    # append with lzma blocks, 1 sec gap
+    with CompressedBinFile(fn, "r+", "lzma", blockSize=100) as f:
+        f.readHeader()
+        numSamples = f.header.SamplesPerChannel + f.writeChannelData([chanData[0][600:], chanData[1][600:]], 10, 1)
+        f.updateSamplesPerChannel(numSamples, True)
+    assert(os.path.getsize(fn) < os.path.getsize(rawFn))
+    with CompressedBinFile(fn, "r") as f:
+        f.readHeader()
+        assert(f.header.SamplesPerChannel == 1010)
+        assert(f.channels[1].Title == "CH1")
+        assert(len(f.index) == 10 + 5)
+        data = f.readSamples(0, 2000)
+        assert(data.shape == (1010, 2))
+        assert(list(data[:600, 0]) == list(chanData[0][:600]))
+        assert(list(data[600:610, 1]) == [constant.MIN_SHORT_VALUE] * 10)
+        assert(list(data[610:, 1]) == list(chanData[1][600:]))
+        # random access across a block boundary
+        assert(list(f.readSamples(60, 10)[:, 0]) == list(chanData[0][60:70]))
+
+
+def test_numpy_bin_file(tmpdir):
+    # same file as BinFile, with gap, overlap, short and long channels, array('h') and numpy input
+    segments = [([array("h", range(0, 30)), array("h", range(100, 130))], 0),
+                ([np.arange(30, 60, dtype=np.int16), np.arange(130, 150, dtype=np.int16)], 1),
+                ([np.arange(60, 90, dtype=np.int16), np.arange(160, 200, dtype=np.int16)], -2)]
+    contents = []
+    for cls in [BinFile, NumpyBinFile]:
+        fn = os.path.join(str(tmpdir), "{0}.adibin".format(cls.__name__))
+        header = CFWBINARY()
+        header.setValue(1.0 / 10, 2019, 3, 13, 11, 30, 8, 0, 0)
+        header.NChannels = 2
+        with cls(fn, "w") as f:
+            f.setHeader(header)
+            for i in range(2):
+                channel = CFWBCHANNEL()
+                channel.setValue("CH{0}".format(i), "mV", 1.0, 0.0, 0.0, 1.0)
+                f.addChannel(channel)
+            f.writeHeader()
+            numSamples = 0
+            for chanData, gapInSecs in segments:
+                numSamples += f.writeChannelData(chanData, 10, gapInSecs)
+            f.updateSamplesPerChannel(numSamples, True)
+        assert(numSamples == 30 + 40 + 10)
+        with open(fn, "rb") as f:
+            contents.append(f.read())
+    assert(contents[0] == contents[1])
+
+
+def test_vital_store(tmpdir):
+    fn = os.path.join(str(tmpdir), "test.vitals")
+    store = VitalStore()
+    startDt = datetime(2019, 3, 13, 11, 30, 8)
+    for i in range(10):
+        store.addVital("HR" if i % 2 == 0 else "SPO2", "bpm", "ICU", "07", startDt + timedelta(seconds=i), 60 + i, 50, 120)
+    store.write(fn)
+    header, columns = loadVitalStore(fn)
+    assert(header["numRecords"] == 10)
+    assert(header["startTime"] == "2019-03-13T11:30:08")
+    assert([p["name"] for p in header["parameters"]] == ["HR", "SPO2"])
+    hr = getVitalParameter(header, columns, "HR")
+    assert(list(hr["offset"]) == [0, 2, 4, 6, 8])
+    assert(list(hr["value"]) == [60, 62, 64, 66, 68])
+    assert(list(getVitalParameter(header, columns, "SPO2")["high"]) == [120] * 5)
+    assert(getVitalParameter(header, columns, "RR") is None)
+    # records out of time order: the store starts at the earliest record
+    store = VitalStore()
+    for i in [5, 3, 7, 0]:
+        store.addVital("HR", "bpm", "ICU", "07", startDt + timedelta(seconds=i), 60 + i, 50, 120)
+    store.write(fn)
+    header, columns = loadVitalStore(fn)
+    assert(header["startTime"] == "2019-03-13T11:30:08")
+    assert(header["endTime"] == "2019-03-13T11:30:15")
+    hr = getVitalParameter(header, columns, "HR")
+    assert(list(hr["offset"]) == [0, 3, 5, 7])
+    assert(list(hr["value"]) == [60, 63, 65, 67])
+
+
+def test_signal_stats(tmpdir):
+    # 10 Hz, blocks of 50 and 20 secs: ramp then gap and flatline (ch0), flatline then saturation (ch1),
+    # flatline then a run (of 9) starting before the end of the first block (ch2)
+    gap = constant.MIN_SHORT_VALUE
+    block1 = np.array([np.arange(500), np.full(500, 5), np.concatenate([np.zeros(490), np.full(10, 9)])], dtype=np.int16)
+    block2 = np.array([np.concatenate([np.full(50, gap), np.full(150, 7)]),
+                       np.concatenate([np.full(100, 5), np.full(100, constant.MAX_SHORT_VALUE)]),
+                       np.concatenate([np.full(15, 9), np.arange(185)])], dtype=np.int16)
+    fn = os.path.join(str(tmpdir), "test.adibin")
+    stats = SignalStats(fn, 10.0, ["CH0", "CH1", "CH2"])
+    stats.scales = [0.5, 1.0, 1.0]
+    stats.add(block1[:, :300])
+    stats.add(block1[:, 300:])
+    stats.save()
+    # continue from the sidecar (e.g. appending to the file)
+    stats = SignalStats(fn, 10.0, ["CH0", "CH1", "CH2"]).load(fn + ".stats.json")
+    stats.add(block2)
+    stats.save()
+    result = loadSignalStats(fn + ".stats.json")
+    assert(result["channels"] == ["CH0", "CH1", "CH2"])
+    assert(result["samples"].tolist() == [[550, 600, 600], [100, 100, 100]])
+    assert(result["gapSecs"].tolist() == [[5.0, 0.0, 0.0], [0.0, 0.0, 0.0]])
+    assert(result["flatlineSecs"].tolist() == [[5.0, 60.0, 51.5], [10.0, 10.0, 0.0]])
+    assert(result["saturatedSecs"].tolist() == [[0.0, 0.0, 0.0], [0.0, 10.0, 0.0]])
+    assert((result["min"][0, 0], result["max"][0, 0], result["max"][1, 1]) == (0.0, 249.5, constant.MAX_SHORT_VALUE))
+    assert(result["mean"][1, 0] == 3.5)
+
+
+def test_trend_writer(tmpdir):
+    # 10 Hz, trend per 1.5 secs (15 samples): a whole interval of gaps and a partial one (ch0), the last
+    # interval of the first block (10 samples) is completed when the file is appended to
+    gap = constant.MIN_SHORT_VALUE
+    ch0 = np.arange(150, dtype=np.int16)
+    ch0[15:30] = gap
+    ch0[40:45] = gap
+    ch1 = np.concatenate([np.full(90, 5), np.full(10, 3), np.arange(50)]).astype(np.int16)
+    fn = os.path.join(str(tmpdir), "test.adibin")
+    header = CFWBINARY()
+    header.setValue(0.1, 2019, 3, 13, 11, 30, 8, 0, 0)
+    header.NChannels = 2
+    with NumpyBinFile(fn, "w") as f:
+        f.setHeader(header)
+        for i in range(2):
+            channel = CFWBCHANNEL()
+            channel.setValue("CH{0}".format(i), "mV", 0.5, 1.0, 0.0, 1.0)
+            f.addChannel(channel)
+        f.writeHeader()
+        attachTrendWriter(f, fn, 1.5)
+        numSamples = f.writeChannelData([ch0[:70], ch1[:70]])
+        numSamples += f.writeChannelData([ch0[70:100], ch1[70:100]])
+        f.updateSamplesPerChannel(numSamples, True)
+    trendFn = os.path.join(str(tmpdir), "test.trend.adibin")
+    with BinReader(trendFn) as r:
+        assert(r.numSamples == 7)
+    with NumpyBinFile(fn, "r+") as f:
+        f.readHeader()
+        assert(isinstance(attachTrendWriter(f, fn, 1.5), TrendWriter))
+        numSamples += f.writeChannelData([ch0[100:], ch1[100:]])
+        f.updateSamplesPerChannel(numSamples, True)
+    assert(findBinFiles([str(tmpdir)]) == [fn])
+    with BinReader(trendFn) as r:
+        assert(r.samplesPerSec == 1.0 / 1.5)
+        assert([c.Title for c in r.channels] == ["CH0_min", "CH0_max", "CH0_mean", "CH1_min", "CH1_max", "CH1_mean"])
+        assert((r.channels[2].scale, r.channels[2].offset) == (0.5, 1.0))
+        trend = r.readBlock(0, r.numSamples)
+    assert(trend.shape == (10, 6))
+    for i, x in enumerate([ch0, ch1]):
+        intervals = x.reshape((10, 15))
+        for k in range(10):
+            values = intervals[k][intervals[k] != gap]
+            expected = [values.min(), values.max(), np.rint(values.mean())] if len(values) > 0 else [gap, gap, gap]
+            assert(trend[k, 3 * i:3 * i + 3].tolist() == expected)
+    # trend files are not indexed as recordings
+    with Catalog(os.path.join(str(tmpdir), "catalog.db")) as catalog:
+        assert(catalog.update([str(tmpdir)]) == (1, 0, 0))
+        assert([r["path"] for r in catalog.query(kind="bin")] == [os.path.abspath(fn)])
+
+
+def test_lazy_imports():
+    # packages and light modules used at startup of the command line tools should not import numpy
+    code = "import sys; import wfio, xmlconvert, wfio.output_file, xmlconvert.xml2bin_state; " \
+           "sys.exit(1 if 'numpy' in sys.modules else 0)"
+    srcDir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+    assert(subprocess.run([sys.executable, "-c", code], cwd=srcDir).returncode == 0)
+    import wfio
+    assert(wfio.BinReader.__name__ == "BinReader")
@@ -0,0 +1,137 @@
+"""
+MIT License
+
+Copyright (c) 2019 UCSF Hu Lab
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import sys
+import json
+from concurrent.futures import ThreadPoolExecutor
+from wfjobs import readJobList
+from wfjobs import JobRunner
+from wfjobs import SpoolService
+from wfjobs import moveToDir
+
+# stand-in for wfconvert: writes a file named after --id1 to -o, fails if --id1 is "BAD",
+# or fails on the first attempt if --id1 is "FLAKY"
+FAKE_CONVERT = """
+import sys, os
+args = sys.argv[1:]
+outputDir = args[args.index("-o") + 1]
+id1 = args[args.index("--id1") + 1]
+# a marker per job: FLAKY fails on its first attempt only, BAD always fails
+marker = os.path.join(os.path.dirname(os.path.dirname(outputDir)), id1 + ".marker")
+if id1 == "BAD" or (id1 == "FLAKY" and not os.path.exists(marker)):
+    open(marker, "w").close()
+    open(os.path.join(outputDir, "partial.adibin"), "w").close()
+    print("failed")
+    sys.exit(1)
+open(os.path.join(outputDir, id1 + ".adibin"), "w").write(" ".join(args))
+"""
+
+
+def test_read_job_list(tmpdir):
+    fn = os.path.join(str(tmpdir), "jobs.csv")
+    with open(fn, "w") as f:
+        f.write("file,dir,output_dir,id1,stime,etime\n")
+        f.write("a.stp,,out1,P1,1/1/2019 8:00:00 AM,1/2/2019 8:00:00 AM\n")
+        f.write(",{0},,P2,,\n".format(str(tmpdir)))
+    jobs = readJobList(fn, "default_out")
+    assert(len(jobs) == 2)
+    assert(jobs[0].file == "a.stp" and jobs[0].dir is None)
+    assert(jobs[0].stime == "1/1/2019 8:00:00 AM")
+    assert(jobs[1].dir == str(tmpdir))
+    assert(jobs[1].outputDir == "default_out")
+    assert(jobs[1].tagsDict["id1"] == "P2")
+    assert(jobs[1].etime is None)
+
+
+def test_job_runner(tmpdir):
+    outputDir = os.path.join(str(tmpdir), "out")
+    fn = os.path.join(str(tmpdir), "jobs.yaml")
+    with open(fn, "w") as f:
+        f.write("- {input: a.xml, id1: P1}\n- {input: b.xml, id1: FLAKY}\n- {input: c.xml, id1: BAD}\n- {input: d.xml, id1: P1}\n")
+    jobs = readJobList(fn, outputDir)
+    runner = JobRunner([sys.executable, "-c", FAKE_CONVERT], ["--output_format", "npy"], numWorkers=2, retries=1)
+    numFailed = runner.run(jobs)
+    assert(numFailed == 1)
+    assert([job.status for job in jobs] == ["ok", "ok", "failed", "ok"])
+    assert([job.attempts for job in jobs] == [1, 2, 2, 1])
+    assert(jobs[2].message == "failed")
+    # only output of successful attempts, and no staging directories, are left
+    assert(sorted(os.listdir(outputDir)) == ["FLAKY.adibin", "P1.adibin", "P1_1.adibin"])
+    with open(jobs[0].outputFiles[0]) as f:
+        assert(f.read().endswith("--id1 P1 --output_format npy"))
+
+
+def test_move_to_dir(tmpdir):
+    # files (and directories) of the same name moved at the same time get distinct names
+    dstDir = os.path.join(str(tmpdir), "out")
+    os.mkdir(dstDir)
+    srcs = []
+    for i in range(16):
+        srcDir = os.path.join(str(tmpdir), "staging{0}".format(i))
+        os.mkdir(srcDir)
+        srcs.append(os.path.join(srcDir, "P1.npyd" if i % 2 == 0 else "P1.adibin"))
+        if i % 2 == 0:
+            os.mkdir(srcs[-1])
+            open(os.path.join(srcs[-1], "ch0.npy"), "w").write(str(i))
+        else:
+            open(srcs[-1], "w").write(str(i))
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        dsts = list(pool.map(lambda src: moveToDir(src, dstDir), srcs))
+    assert(len(set(dsts)) == 16)
+    assert(sorted(os.listdir(dstDir))[:3] == ["P1.adibin", "P1.npyd", "P1_1.adibin"])
+    contents = []
+    for dst in dsts:
+        with open(os.path.join(dst, "ch0.npy") if os.path.isdir(dst) else dst) as f:
+            contents.append(int(f.read()))
+    assert(contents == list(range(16)))
+
+
+def test_spool_service(tmpdir):
+    spoolDir = str(tmpdir)
+    requests = [{"file": "a.xml", "output_dir": "out", "id1": "P1"}, {"id1": "P2"}, {"command": "stop"}, {"file": "b.xml", "output_dir": "out"}]
+    for i, r in enumerate(requests):
+        with open(os.path.join(spoolDir, "r{0}.json".format(i)), "w") as f:
+            json.dump(r, f)
+    # not complete yet (no .json extension)
+    open(os.path.join(spoolDir, "r9.tmp"), "w").close()
+    handled = []
+
+    def handler(job):
+        handled.append(job.tagsDict["id1"])
+        return [os.path.join(job.outputDir, job.file + ".adibin")]
+
+    numRequests = SpoolService(spoolDir, handler, pollInterval=0.01).run()
+    assert(numRequests == 3)
+    assert(handled == ["P1"])
+    with open(os.path.join(spoolDir, "r0.result")) as f:
+        result = json.load(f)
+    assert(result["status"] == "ok")
+    assert(result["output_files"] == [os.path.join("out", "a.xml.adibin")])
+    with open(os.path.join(spoolDir, "r1.result")) as f:
+        result = json.load(f)
+    assert(result["status"] == "failed")
+    assert("specify either file or dir" in result["message"])
+    # requests after stop are left in spool directory
+    assert(sorted(os.listdir(spoolDir)) == ["r0.result", "r1.result", "r2.result", "r3.json", "r9.tmp"])
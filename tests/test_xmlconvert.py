@@ -0,0 +1,568 @@
+"""
+MIT License
+
+Copyright (c) 2019 UCSF Hu Lab
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import io
+import os
+import sys
+import bz2
+import base64
+import gzip
+import lzma
+import tarfile
+import zipfile
+import datetime
+import pytest
+import numpy as np
+from xmlconvert import XmlPrettyWriter
+from xmlconvert import Xml2BinState
+from xmlconvert import XmlConverterForGE
+from xmlconvert import XmlConverterForBedMaster
+from xmlconvert.interval_index import IntervalIndex
+from xmlconvert.time_window import TimeWindow
+from xmlconvert.time_window import prescanTimeRange
+from xmlconvert.time_window import getFnStartTime
+from xmlconvert.xml_input import isXmlInputFn
+from xmlconvert.xml_input import iterArchiveXmlInputs
+from xmlconvert.segment_index import SegmentIndex
+from xmlconvert.segment_index import getSegmentIndex
+from xmlconvert.segment_index import getSegmentIndexFn
+from xmlconvert.batch_controller import AdaptiveBatchController
+from xmlconvert.ext_stream import ExtOutputStream
+from xmlconvert.segment_index import iterStreamRoots
+from wfio import BinReader
+from wfio import loadSignalStats
+from binfilepy import constant
+
+
+def test_xml_pretty_writer():
+    src = b"<BedMasterEx><FileInfo><Unit>ICU</Unit></FileInfo>" \
+          b"<Segment><Waveforms><WaveformData Label=\"I\">1,2,3,4,5,6</WaveformData></Waveforms></Segment>" \
+          b"<Segment><Waveforms><WaveformData Label=\"II\">1,2</WaveformData></Waveforms></Segment></BedMasterEx>"
+    g = io.StringIO()
+    numSegments = XmlPrettyWriter(maxSegments=1, maxWaveLen=4).prettifyStream(io.BytesIO(src), g)
+    assert(numSegments == 1)
+    lines = g.getvalue().splitlines()
+    assert(lines[0] == "<?xml version=\"1.0\" encoding=\"utf-8\"?>")
+    assert(lines[1] == "<BedMasterEx>")
+    assert(lines[3] == "  <Unit>")
+    assert(lines[4] == "   ICU")
+    assert(lines[10] == "    1,2,...(11 chars)")
+    assert(lines[-1] == "</BedMasterEx>")
+    assert("II" not in g.getvalue())
+
+
+# samples are the sample numbers (from 11:30:00), modulo this (to fit in short)
+SAMPLE_VALUE_MODULO = 30000
+
+
+def writeBedMasterXml(fn: str, startSecond: int, numSegments: int, fs: int = 10, labelsList: list = None):
+    with open(fn, "w") as f:
+        f.write("<BedMasterEx><FileInfo><Unit>ICU</Unit><Bed>07</Bed></FileInfo>")
+        for i in range(numSegments):
+            t = datetime.datetime(2019, 3, 13, 11, 30, 0) + datetime.timedelta(seconds=startSecond + 2 * i)
+            data = ",".join([str(((startSecond + 2 * i) * fs + j) % SAMPLE_VALUE_MODULO) for j in range(2 * fs)])
+            labels = labelsList[i] if labelsList is not None else ["I"]
+            f.write("<Segment><Waveforms CollectionTime=\"{0}\">".format(t.strftime("%m/%d/%Y %I:%M:%S %p")))
+            for label in labels:
+                f.write("<WaveformData ID=\"0\" Label=\"{0}\" SampleRate=\"{1}\" Samples=\"{2}\" UOM=\"mV\">{3}</WaveformData>".format(
+                    label, fs, 2 * fs, data))
+            f.write("</Waveforms></Segment>")
+        f.write("</BedMasterEx>")
+
+
+# GE XML of the same segments (and samples) as writeBedMasterXml
+def writeGEXml(fn: str, startSecond: int, numSegments: int, fs: int = 10, labelsList: list = None):
+    startDt = datetime.datetime(2019, 3, 13, 11, 30, 0) + datetime.timedelta(seconds=startSecond)
+    with open(fn, "w") as f:
+        f.write("<cpcArchive><cpc datetime=\"{0}\" tzoffset=\"-07:00\"><device id=\"1\">".format(startDt.strftime("%Y-%m-%dT%H:%M:%S.000Z")))
+        for i in range(numSegments):
+            t = datetime.datetime(2019, 3, 13, 11, 30, 0) + datetime.timedelta(seconds=startSecond + 2 * i)
+            data = (np.arange((startSecond + 2 * i) * fs, (startSecond + 2 * i + 2) * fs) % SAMPLE_VALUE_MODULO).astype("<i2")
+            labels = labelsList[i] if labelsList is not None else ["I"]
+            f.write("<measurements><m name=\"POLLTIME\">{0}</m>".format(t.strftime("%Y-%m-%dT%H:%M:%SZ")))
+            for label in labels:
+                f.write("<mg name=\"{0}\"><m name=\"Wave\">{1}</m><m name=\"Points\">{2}</m><m name=\"PointsBytes\">2</m>"
+                        "<m name=\"Min\">-32767</m><m name=\"Max\">32767</m><m name=\"Offset\">0</m><m name=\"Gain\">1</m>"
+                        "<m name=\"Hz\">{3}</m></mg>".format(label, base64.b64encode(data.tobytes()).decode("ascii"), 2 * fs, fs))
+            f.write("</measurements>")
+        f.write("</device></cpc></cpcArchive>")
+
+
+CONVERTER_KINDS = ["ge", "bedmaster"]
+SEGMENT_TAG_BY_KIND = {"ge": "measurements", "bedmaster": "Segment"}
+
+
+def writeXml(kind: str, fn: str, startSecond: int, numSegments: int, fs: int = 10, labelsList: list = None):
+    writeFunc = writeGEXml if kind == "ge" else writeBedMasterXml
+    writeFunc(fn, startSecond, numSegments, fs, labelsList)
+
+
+# converter (10 Hz, adibin) writing to outputDir (created), and the state of the conversion
+def createConverter(kind: str, outputDir: str, outputFnPattern: str = "P1_{starttime}"):
+    os.mkdir(outputDir)
+    x = Xml2BinState()
+    x.setTimestampTm(datetime.datetime(2020, 1, 1))
+    converterClass = XmlConverterForGE if kind == "ge" else XmlConverterForBedMaster
+    return converterClass(outputDir, outputFnPattern, "adibin", 10, None, []), x
+
+
+# content of the only output file in outputDir
+def readOutputFile(outputDir: str):
+    outputFiles = os.listdir(outputDir)
+    assert(len(outputFiles) == 1)
+    with open(os.path.join(outputDir, outputFiles[0]), "rb") as f:
+        return f.read()
+
+
+def test_interval_index():
+    index = IntervalIndex()
+    index.add(10, 20)
+    index.add(30, 40)
+    index.add(20, 25)
+    assert(len(index) == 2)
+    assert(index.covers(12, 25))
+    assert(not index.covers(12, 26))
+    assert(index.coveredFrom(22, 35) == 3)
+    assert(index.coveredFrom(5, 15) == 0)
+    index.add(0, 35)
+    assert(len(index) == 1)
+    assert(index.covers(0, 40))
+
+
+@pytest.mark.parametrize("kind", CONVERTER_KINDS)
+def test_skip_overlapped_segments(tmpdir, kind):
+    # second batch overlaps the first one by 3 segments (the first of them partly)
+    batch1 = os.path.join(str(tmpdir), "batch1.xml")
+    batch2 = os.path.join(str(tmpdir), "batch2.xml")
+    writeXml(kind, batch1, 0, 5)
+    writeXml(kind, batch2, 3, 5)
+    converter, x = createConverter(kind, os.path.join(str(tmpdir), "out"))
+    outputDir = converter.outputDir
+    converter.setSkipOverlappedSegments(True)
+    for fn in [batch1, batch2]:
+        converter.clearState()
+        converter.convert(fn, {}, x)
+    outputFiles = os.listdir(outputDir)
+    assert(len(outputFiles) == 1)
+    with BinReader(os.path.join(outputDir, outputFiles[0])) as r:
+        data = r.readBlock(0, r.numSamples)
+        assert(r.numSamples == 130)
+        assert(list(data[:, 0]) == list(range(0, 130)))
+
+
+@pytest.mark.parametrize("kind", CONVERTER_KINDS)
+def test_channel_superset_mode(tmpdir, kind):
+    # lead II drops out for 2 segments (4 secs), then I drops out for 4 segments (8 secs)
+    fn = os.path.join(str(tmpdir), "segments.xml")
+    labelsList = [["I", "II"], ["I"], ["I"], ["I", "II"], ["II"], ["II"], ["II"], ["II"], ["I", "II"]]
+    writeXml(kind, fn, 0, len(labelsList), labelsList=labelsList)
+    for thresholdSec, numFiles in [(5, 3), (10, 1)]:
+        outputDir = os.path.join(str(tmpdir), "out{0}".format(thresholdSec))
+        converter, x = createConverter(kind, outputDir, "P1_{starttime}_{endtime}")
+        converter.setChannelSupersetMode(True)
+        converter.setChannelSplitThresholdSec(thresholdSec)
+        converter.convert(fn, {}, x)
+        outputFiles = sorted(os.listdir(outputDir))
+        assert(len(outputFiles) == numFiles)
+        with BinReader(os.path.join(outputDir, outputFiles[0])) as r:
+            assert([c.Title for c in r.channels] == ["I", "II"])
+            data = r.readBlock(0, r.numSamples)
+            assert(list(data[:20, 1]) == list(range(0, 20)))
+            assert(list(data[20:60, 1]) == [-32767] * 40)
+            assert(list(data[20:60, 0]) == list(range(20, 60)))
+        if numFiles == 1:
+            assert(list(data[80:160, 0]) == [-32767] * 80)
+            assert(list(data[:, 1][80:180]) == list(range(80, 180)))
+
+
+def test_segment_buffer_resample():
+    from array import array
+    import numpy as np
+    from xmlconvert.fixsampling import fixsamplingarr
+    from xmlconvert.segment_buffer import SegmentBuffer
+    rng = np.random.default_rng(0)
+    seg = SegmentBuffer(maxChannels=2, maxSamples=16)
+    for targetHz in [240, 250, 300]:
+        seg.clear()
+        waves = [(hz, rng.integers(-32767, 32767, numSamples).astype(np.int16))
+                 for hz, numSamples in [(240, 480), (125, 250), (240, 480), (125, 250), (62.5, 125)]]
+        for i, (hz, wavedata) in enumerate(waves):
+            seg.addChannel("C{0}".format(i), hz, wavedata)
+        seg.resample(targetHz)
+        for (hz, wavedata), data in zip(waves, seg.getChannelData()):
+            expected = fixsamplingarr(array("h", wavedata.tolist()), hz, targetHz) if hz != targetHz else wavedata
+            assert(list(data) == list(expected))
+    assert(not seg.fitChannels(["C4", "X", "C0"]))
+    seg.clear()
+    seg.addChannel("C0", 240, waves[0][1])
+    seg.addChannel("C4", 240, waves[4][1])
+    seg.resample(240)
+    assert(seg.fitChannels(["C4", "X", "C0"]))
+    assert(seg.labels == ["C4", "X", "C0"])
+    data = seg.getChannelData()
+    assert(len(data[1]) == max(len(data[0]), len(data[2])))
+    assert(set(data[1]) == {-32767})
+    assert(list(data[2]) == list(waves[0][1]))
+
+
+@pytest.mark.parametrize("kind", CONVERTER_KINDS)
+def test_decode_workers(tmpdir, kind):
+    fn = os.path.join(str(tmpdir), "segments.xml")
+    writeXml(kind, fn, 0, 50, fs=25)
+    contents = []
+    for decodeWorkers in [1, 4]:
+        outputDir = os.path.join(str(tmpdir), "out{0}".format(decodeWorkers))
+        converter, x = createConverter(kind, outputDir)
+        converter.setDecodeWorkers(decodeWorkers)
+        converter.convert(fn, {}, x)
+        contents.append(readOutputFile(outputDir))
+    assert(contents[0] == contents[1])
+
+
+@pytest.mark.parametrize("kind", CONVERTER_KINDS)
+def test_time_window(tmpdir, kind):
+    # files of 10 secs at 11:30:00, 11:33:20, 11:36:40 and 11:40:00, window from 11:33:23 to 11:36:45
+    fns = []
+    for startSecond in [0, 200, 400, 600]:
+        t = datetime.datetime(2019, 3, 13, 11, 30, 0) + datetime.timedelta(seconds=startSecond)
+        fn = os.path.join(str(tmpdir), t.strftime("%Y%m%d-%H%M%S") + ".xml")
+        writeXml(kind, fn, startSecond, 5)
+        fns.append(fn)
+    timeWindow = TimeWindow(datetime.datetime(2019, 3, 13, 11, 33, 23), datetime.datetime(2019, 3, 13, 11, 36, 45))
+    for fnTimeFormat in [None, "%Y%m%d-%H%M%S"]:
+        assert([timeWindow.overlapsFile(fn, fnTimeFormat) for fn in fns] == [False, True, True, False])
+    converter, x = createConverter(kind, os.path.join(str(tmpdir), "out"))
+    outputDir = converter.outputDir
+    converter.setTimeWindow(timeWindow)
+    for fn in fns[1:3]:
+        converter.clearState()
+        converter.convert(fn, {}, x)
+    outputFiles = os.listdir(outputDir)
+    assert(len(outputFiles) == 1)
+    with BinReader(os.path.join(outputDir, outputFiles[0])) as r:
+        data = r.readBlock(0, r.numSamples)
+        assert((r.header.Hour, r.header.Minute, r.header.Second) == (11, 33, 23))
+        assert(r.numSamples == 70 + 1900 + 50)
+        assert(list(data[:70, 0]) == list(range(2030, 2100)))
+        assert(list(data[-50:, 0]) == list(range(4000, 4050)))
+
+
+def test_segment_index(tmpdir):
+    fn = os.path.join(str(tmpdir), "segments.xml")
+    writeBedMasterXml(fn, 0, 20, labelsList=[["I", "II"]] * 20)
+    index = getSegmentIndex(fn)
+    assert(os.path.exists(getSegmentIndexFn(fn)))
+    assert(index.numSegments == 20)
+    assert(index.entries[0].tag == "FileInfo")
+    assert(index.entries[3].time == datetime.datetime(2019, 3, 13, 11, 30, 4))
+    assert(index.entries[3].labels == ["I", "II"])
+    with open(fn, "rb") as f:
+        f.seek(index.entries[3].offset)
+        assert(f.read(index.entries[3].length).startswith(b"<Segment>") and f.read(1) == b"<")
+    loaded = SegmentIndex(fn).load(getSegmentIndexFn(fn))
+    assert(loaded.isUpToDate())
+    assert([(e.offset, e.length, e.time) for e in loaded.entries] == [(e.offset, e.length, e.time) for e in index.entries])
+    # FileInfo, and segments that may have data in the window (the length of segments is not indexed)
+    timeWindow = TimeWindow(datetime.datetime(2019, 3, 13, 11, 31, 10), datetime.datetime(2019, 3, 13, 11, 31, 20))
+    writeBedMasterXml(fn, 0, 60)
+    index = getSegmentIndex(fn)
+    assert(index.numSegments == 60)
+    selected = [e.time for e in index.select(timeWindow) if e.isSegment()]
+    assert((selected[0], selected[-1], len(selected)) == (datetime.datetime(2019, 3, 13, 11, 30, 12), datetime.datetime(2019, 3, 13, 11, 31, 18), 34))
+    # converted with the index (only the segments needed are parsed) or not, the output is the same
+    geFn = os.path.join(str(tmpdir), "segments_ge.xml")
+    writeGEXml(geFn, 0, 60)
+    for kind, inputFn in [("bedmaster", fn), ("ge", geFn)]:
+        contents = []
+        for useSegmentIndex in [False, True]:
+            converter, x = createConverter(kind, os.path.join(str(tmpdir), "out_{0}_{1}".format(kind, useSegmentIndex)))
+            converter.setTimeWindow(timeWindow)
+            converter.setUseSegmentIndex(useSegmentIndex)
+            converter.convert(inputFn, {}, x)
+            contents.append(readOutputFile(converter.outputDir))
+        assert(contents[0] == contents[1])
+    outputFn = os.path.join(str(tmpdir), "preview.xml")
+    assert(XmlPrettyWriter(maxSegments=2).prettifySegments(fn, outputFn, startSegment=58) == 2)
+    with open(outputFn, "r") as f:
+        preview = f.read()
+    assert(("11:31:56 AM" in preview) and ("11:31:58 AM" in preview) and ("11:31:54 AM" not in preview))
+
+
+@pytest.mark.parametrize("kind", CONVERTER_KINDS)
+def test_signal_stats(tmpdir, kind):
+    # the second batch is appended to the output file of the first one (reopened and renamed)
+    batch1 = os.path.join(str(tmpdir), "batch1.xml")
+    batch2 = os.path.join(str(tmpdir), "batch2.xml")
+    writeXml(kind, batch1, 0, 5)
+    writeXml(kind, batch2, 14, 5)
+    converter, x = createConverter(kind, os.path.join(str(tmpdir), "out"), "P1_{starttime}_{endtime}")
+    outputDir = converter.outputDir
+    converter.setWriteSignalStats(True)
+    for fn in [batch1, batch2]:
+        converter.clearState()
+        converter.convert(fn, {}, x)
+    outputFiles = sorted(os.listdir(outputDir))
+    assert(len(outputFiles) == 2)
+    assert(outputFiles[1] == outputFiles[0] + ".stats.json")
+    stats = loadSignalStats(os.path.join(outputDir, outputFiles[1]))
+    with BinReader(os.path.join(outputDir, outputFiles[0])) as r:
+        assert(stats["channels"] == [c.Title for c in r.channels])
+        assert(int(stats["samples"][:, 0].sum() + stats["gapSecs"][:, 0].sum() * 10) == r.numSamples)
+    assert(stats["gapSecs"][0, 0] == 4.0)
+
+
+@pytest.mark.parametrize("kind", CONVERTER_KINDS)
+def test_trend_output(tmpdir, kind):
+    # the trend file follows the output file (renamed with {endtime}, appended to with the second batch)
+    batch1 = os.path.join(str(tmpdir), "batch1.xml")
+    batch2 = os.path.join(str(tmpdir), "batch2.xml")
+    writeXml(kind, batch1, 0, 5)
+    writeXml(kind, batch2, 14, 5)
+    converter, x = createConverter(kind, os.path.join(str(tmpdir), "out"), "P1_{starttime}_{endtime}")
+    outputDir = converter.outputDir
+    converter.setTrendSecs(3)
+    for fn in [batch1, batch2]:
+        converter.clearState()
+        converter.convert(fn, {}, x)
+    outputFiles = sorted(os.listdir(outputDir))
+    assert(len(outputFiles) == 2)
+    assert(outputFiles[1] == os.path.splitext(outputFiles[0])[0] + ".trend.adibin")
+    with BinReader(os.path.join(outputDir, outputFiles[0])) as r:
+        data = r.readBlock(0, r.numSamples)[:, 0]
+    with BinReader(os.path.join(outputDir, outputFiles[1])) as r:
+        assert([c.Title for c in r.channels] == ["I_min", "I_max", "I_mean"])
+        trend = r.readBlock(0, r.numSamples)
+    assert(trend.shape == (len(data) // 30, 3))
+    gap = constant.MIN_SHORT_VALUE
+    for k, interval in enumerate(data.reshape((-1, 30))):
+        values = interval[interval != gap]
+        assert(trend[k].tolist() == ([values.min(), values.max(), np.rint(values.mean())] if len(values) > 0 else [gap, gap, gap]))
+
+
+def test_adaptive_batch_controller():
+    controller = AdaptiveBatchController(500, 50, 20000, targetBytes=100 * 1024 * 1024, targetSecs=60, maxMemoryBytes=1024 * 1024 * 1024)
+    # small and fast batches: grows (at most 2 times per batch) up to the bound
+    assert(controller.update(10 * 1024 * 1024, 5.0, 100 * 1024 * 1024) == 1000)
+    for i in range(10):
+        controller.update(1024, 0.1)
+    assert(controller.value == 20000)
+    # the most limiting target: 400 MB (4x) and 90 secs (1.5x) -> 1/4
+    assert(controller.update(400 * 1024 * 1024, 90.0) == 5000)
+    # over the memory limit: halved when the peak grows, then kept (even if small and fast)
+    assert(controller.update(50 * 1024 * 1024, 30.0, 2048 * 1024 * 1024) == 2500)
+    assert(controller.update(50 * 1024 * 1024, 30.0, 2048 * 1024 * 1024) == 2500)
+    # empty batch (e.g. no data in the time window) grows the next one
+    assert(controller.update(0, 0.0) == 5000)
+
+
+# stand-in for StpToolkit: writes the XML file (argv[1]) to the output (argv[3], "-" for stdout) in two parts,
+# the second one once the file argv[4] exists (created by the reader)
+STAND_IN_SCRIPT = """
+import os, sys, time
+with open(sys.argv[1], "rb") as f:
+    data = f.read()
+out = sys.stdout.buffer if sys.argv[3] == "-" else open(sys.argv[3], "wb")
+half = len(data) // 2
+out.write(data[:half])
+out.flush()
+for i in range(100):
+    if os.path.exists(sys.argv[4]):
+        break
+    time.sleep(0.1)
+out.write(data[half:])
+out.close()
+"""
+
+
+@pytest.mark.parametrize("kind", CONVERTER_KINDS)
+def test_ext_output_stream(tmpdir, kind):
+    fn = os.path.join(str(tmpdir), "segments.xml")
+    writeXml(kind, fn, 0, 150)
+    segmentTag = ".//" + SEGMENT_TAG_BY_KIND[kind]
+    standInFn = os.path.join(str(tmpdir), "stand_in.py")
+    with open(standInFn, "w") as f:
+        f.write(STAND_IN_SCRIPT)
+    contents = []
+    for mode in ["file", "stdout", "fifo"]:
+        if (mode == "fifo") and (not hasattr(os, "mkfifo")):
+            continue
+        converter, x = createConverter(kind, os.path.join(str(tmpdir), "out_" + mode))
+        if mode == "file":
+            converter.convert(fn, {}, x)
+        else:
+            fifoFn = os.path.join(str(tmpdir), "segments.fifo") if mode == "fifo" else None
+            goFn = os.path.join(str(tmpdir), "go_" + mode)
+            cmd = "\"{0}\" \"{1}\" \"{2}\" -o \"{3}\" \"{4}\"".format(sys.executable, standInFn, fn, fifoFn if fifoFn is not None else "-", goFn)
+            with ExtOutputStream(cmd, fifoFn) as xmlStream:
+                assert(xmlStream.start())
+                # the first documents are parsed while the command is still writing
+                roots = iterStreamRoots(xmlStream)
+                numSegments = len(next(roots).findall(segmentTag))
+                assert((numSegments >= 64) and (xmlStream.proc.poll() is None))
+                open(goFn, "w").close()
+                assert(sum(len(root.findall(segmentTag)) for root in roots) == 150 - numSegments)
+            assert(xmlStream.returncode == 0)
+            with ExtOutputStream(cmd, fifoFn) as xmlStream:
+                assert(xmlStream.start())
+                converter.convert(xmlStream, {}, x)
+            assert(xmlStream.numBytes == os.path.getsize(fn))
+            assert((fifoFn is None) or (not os.path.exists(fifoFn)))
+        contents.append(readOutputFile(converter.outputDir))
+    assert(all(c == contents[0] for c in contents))
+
+
+@pytest.mark.parametrize("kind", CONVERTER_KINDS)
+def test_stream_roots(tmpdir, kind):
+    # several blocks of XML: every segment is in one document, whole, once
+    fn = os.path.join(str(tmpdir), "segments.xml")
+    writeXml(kind, fn, 0, 200, fs=50, labelsList=[["I", "II"]] * 200)
+    assert(os.path.getsize(fn) > 3 * 64 * 1024)
+    segmentTag = ".//" + SEGMENT_TAG_BY_KIND[kind]
+    for blockSize in [4096, 64 * 1024]:
+        with open(fn, "rb") as f:
+            segments = [seg for root in iterStreamRoots(f, blockSize) for seg in root.findall(segmentTag)]
+        assert(len(segments) == 200)
+        if kind == "ge":
+            assert(all(len(mg.findall("m")) == 8 for seg in segments for mg in seg.findall("mg")))
+        else:
+            assert(all(len(w.text.split(",")) == 100 for seg in segments for w in seg.iter("WaveformData")))
+    contents = []
+    for stream in [False, True]:
+        converter, x = createConverter(kind, os.path.join(str(tmpdir), "out{0}".format(stream)))
+        converter.setDefaultSamplesPerSec(50)
+        if stream:
+            with open(fn, "rb") as f:
+                converter.convert(f, {}, x)
+        else:
+            converter.convert(fn, {}, x)
+        contents.append(readOutputFile(converter.outputDir))
+    assert(contents[0] == contents[1])
+
+
+@pytest.mark.parametrize("kind", CONVERTER_KINDS)
+def test_compressed_xml_input(tmpdir, kind):
+    # several blocks (of the stream parser) of XML
+    fn = os.path.join(str(tmpdir), "20190313-113000.xml")
+    writeXml(kind, fn, 0, 100, fs=100, labelsList=[["I", "II"]] * 100)
+    with open(fn, "rb") as f:
+        data = f.read()
+    assert(len(data) > 2 * 64 * 1024)
+    contents = []
+    for module, ext in [(None, ""), (gzip, ".gz"), (bz2, ".bz2"), (lzma, ".xz")]:
+        inputFn = fn + ext
+        if module is not None:
+            with module.open(inputFn, "wb") as f:
+                f.write(data)
+        assert(isXmlInputFn(inputFn))
+        assert(getFnStartTime(inputFn, "%Y%m%d-%H%M%S") == datetime.datetime(2019, 3, 13, 11, 30, 0))
+        firstDt, lastDt = prescanTimeRange(inputFn)
+        assert(firstDt == datetime.datetime(2019, 3, 13, 11, 30, 0))
+        assert(lastDt == (datetime.datetime(2019, 3, 13, 11, 33, 18) if module is None else None))
+        converter, x = createConverter(kind, os.path.join(str(tmpdir), "out" + ext))
+        converter.setDefaultSamplesPerSec(100)
+        converter.convert(inputFn, {}, x)
+        contents.append(readOutputFile(converter.outputDir))
+    assert(all(c == contents[0] for c in contents))
+    assert(not isXmlInputFn(fn + ".zip"))
+
+
+@pytest.mark.parametrize("kind", CONVERTER_KINDS)
+def test_archive_xml_inputs(tmpdir, kind):
+    # members added in reverse name order, one of them compressed, converted as the extracted files (in name order)
+    fns = []
+    for i in range(3):
+        fns.append(os.path.join(str(tmpdir), "batch{0}.xml".format(i)))
+        # members of several blocks (of the stream parser)
+        writeXml(kind, fns[-1], 200 * i, 100, fs=100, labelsList=[["I", "II"]] * 100)
+        assert(os.path.getsize(fns[-1]) > 2 * 64 * 1024)
+    with open(fns[1], "rb") as f:
+        data = f.read()
+    with gzip.open(fns[1] + ".gz", "wb") as f:
+        f.write(data)
+    memberFns = [fns[0], fns[1] + ".gz", fns[2]]
+    zipFn = os.path.join(str(tmpdir), "batches.zip")
+    with zipfile.ZipFile(zipFn, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("readme.txt", "not converted")
+        for fn in reversed(memberFns):
+            archive.write(fn, "day1/" + os.path.basename(fn))
+    tarFn = os.path.join(str(tmpdir), "batches.tar.gz")
+    with tarfile.open(tarFn, "w:gz") as archive:
+        for fn in reversed(memberFns):
+            archive.add(fn, os.path.basename(fn))
+    contents = []
+    for inputs in [fns, iterArchiveXmlInputs(zipFn), iterArchiveXmlInputs(tarFn)]:
+        converter, x = createConverter(kind, os.path.join(str(tmpdir), "out{0}".format(len(contents))))
+        converter.setDefaultSamplesPerSec(100)
+        names = []
+        for xmlInput in inputs:
+            names.append(os.path.basename(getattr(xmlInput, "name", xmlInput)))
+            converter.clearState()
+            converter.convert(xmlInput, {}, x)
+        assert(names in [["batch0.xml", "batch1.xml", "batch2.xml"], ["batch0.xml", "batch1.xml.gz", "batch2.xml"]])
+        contents.append(readOutputFile(converter.outputDir))
+    assert(all(c == contents[0] for c in contents))
+
+
+def writeBedMasterVitalsXml(fn: str, startSecond: int, numSegments: int, parameters: list):
+    with open(fn, "w") as f:
+        f.write("<BedMasterEx><FileInfo><Unit>ICU</Unit><Bed>07</Bed></FileInfo>")
+        for i in range(numSegments):
+            t = (datetime.datetime(2019, 3, 13, 11, 30, 0) + datetime.timedelta(seconds=startSecond + 2 * i)).strftime("%m/%d/%Y %I:%M:%S %p")
+            f.write("<Segment><VitalSigns CollectionTime=\"{0}\">".format(t))
+            for p in parameters:
+                f.write("<VitalSign><Parameter>{0}</Parameter><Time>{1}</Time><Value UOM=\"bpm\">{2}</Value>"
+                        "<AlarmLimitLow>50</AlarmLimitLow><AlarmLimitHigh>120</AlarmLimitHigh></VitalSign>".format(p, t, 60 + i))
+            f.write("</VitalSigns></Segment>")
+        f.write("</BedMasterEx>")
+
+
+def test_vital_file_pool(tmpdir):
+    # parameters appear and disappear across files: P3 and P4 only in the first and last file
+    fns = []
+    for i, parameters in enumerate([["P0", "P1", "P2", "P3", "P4"], ["P0", "P1", "P2"], ["P0", "P4", "P3"]]):
+        fns.append(os.path.join(str(tmpdir), "vitals{0}.xml".format(i)))
+        writeBedMasterVitalsXml(fns[-1], 10 * i, 5, parameters)
+    contents = []
+    for poolSize in [0, 2, 8]:
+        outputDir = os.path.join(str(tmpdir), "out{0}".format(poolSize))
+        converter, x = createConverter("bedmaster", outputDir)
+        converter.setVitalFilePoolSize(poolSize)
+        for fn in fns:
+            converter.clearState()
+            converter.convert(fn, {}, x)
+        if poolSize > 0:
+            pool = converter.vitalFilePool
+            assert(len(pool) == min(poolSize, 5))
+            # each file opened once (kept open), or (a pool smaller than the parameters written in turn) at each write
+            assert((pool.numOpens, pool.numEvictions) == ((5, 0) if poolSize == 8 else (55, 53)))
+        converter.closeVitalOutput()
+        assert(converter.vitalFilePool is None)
+        outputFiles = sorted(os.listdir(outputDir))
+        assert(len(outputFiles) == 5)
+        content = []
+        for outputFn in outputFiles:
+            with open(os.path.join(outputDir, outputFn), "rb") as f:
+                content.append(f.read())
+        contents.append(content)
+    assert(all(c == contents[0] for c in contents))